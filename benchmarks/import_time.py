@@ -0,0 +1,105 @@
+"""
+Measures how long importing fbadhelpers modules takes in a fresh interpreter,
+and how many modules each import loads.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --output imports.json
+    python benchmarks/import_time.py --baseline imports.json
+
+With --baseline, imports loading more modules than the baseline, or running
+slower by more than --tolerance, are reported and the script exits with 1.
+"""
+import argparse
+import json as Json
+import statistics
+import subprocess
+import sys
+from typing import Mapping
+
+IMPORTS = {
+    'helpers': 'import fbadhelpers.helpers',
+    'helpers.getters': 'from fbadhelpers.helpers import get_campaign_by_id',
+    'helpers.all': 'from fbadhelpers.helpers import *',
+    'requesters': 'import fbadhelpers.requesters',
+    'records': 'import fbadhelpers.records',
+}
+
+# Prints the seconds the statement took and the number of modules it loaded
+MEASURE = '''
+import sys, time
+loaded = len(sys.modules)
+started_at = time.perf_counter()
+exec(%r)
+print(time.perf_counter() - started_at, len(sys.modules) - loaded)
+'''
+
+def measure_import(statement: str, repeat: int) -> Mapping:
+    timings = []
+    modules = None
+
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', MEASURE % statement],
+            check=True,
+            capture_output=True,
+            text=True
+        ).stdout.split()
+
+        timings.append(float(output[0]))
+        modules = int(output[1])
+
+    return {
+        'statement': statement,
+        'seconds': statistics.median(timings),
+        'modules': modules,
+    }
+
+def find_regressions(results: Mapping[str, Mapping], baseline: Mapping[str, Mapping], tolerance: float):
+    regressions = []
+
+    for name, result in results.items():
+        previous = baseline.get(name)
+
+        if not previous:
+            continue
+
+        if result['modules'] > previous['modules']:
+            regressions.append('%s: %d modules, baseline %d' % (name, result['modules'], previous['modules']))
+
+        if result['seconds'] > previous['seconds'] * (1 + tolerance):
+            regressions.append('%s: %.1fms, baseline %.1fms' % (name, result['seconds'] * 1000, previous['seconds'] * 1000))
+
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('imports', nargs='*', choices=[[], *IMPORTS], help='Imports to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per import; the median is reported')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against results written with --output')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    results = {}
+
+    for name in args.imports or IMPORTS:
+        result = results[name] = measure_import(IMPORTS[name], args.repeat)
+        print('%-20s %8.1fms %6d modules   %s' % (name, result['seconds'] * 1000, result['modules'], result['statement']))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            Json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, Json.load(file), args.tolerance)
+
+        for regression in regressions:
+            print('REGRESSION', regression)
+
+        return 1 if regressions else 0
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
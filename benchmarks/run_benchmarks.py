@@ -0,0 +1,172 @@
+"""
+Runs the helpers against a local FakeGraphServer and reports wall time, HTTP
+calls and Graph operations for each scenario.
+
+    python benchmarks/run_benchmarks.py --latency 0.05
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+
+With --baseline, scenarios making more calls than the baseline, or running
+slower by more than --tolerance, are reported and the script exits with 1.
+"""
+import argparse
+import json as Json
+import sys
+import time as Time
+from typing import Callable, Mapping
+
+from fbadhelpers.helpers.copiers import copy_ad_set, copy_campaign_trees
+from fbadhelpers.helpers.getters import get_ads_by_ids, get_ad_creatives_by_ads
+from fbadhelpers.helpers.misc.create_mirror_ads import create_mirror_ads
+from fbadhelpers.records import ApiRecord
+from fbadhelpers.requesters import BatchRequest, request_all_pages
+from fbadhelpers.testing import FakeGraphServer
+
+
+def benchmark_request_all_pages(api: ApiRecord, ids: Mapping, args) -> int:
+    rows = request_all_pages(
+        api=api,
+        next_request_builder=lambda response: {'path': response['paging']['next']},
+        path=[api.ad_account_id, 'ads'],
+        params={'fields': 'name,status', 'limit': args.page_size}
+    )
+
+    return len(rows)
+
+def benchmark_batch_request(api: ApiRecord, ids: Mapping, args) -> int:
+    batch = BatchRequest(api)
+
+    for ad_set_id in ids['adsets']:
+        batch.request(path=[ad_set_id], params={'fields': 'name,status,daily_budget'})
+
+    return len(batch.perform())
+
+def benchmark_getters(api: ApiRecord, ids: Mapping, args) -> int:
+    ads = get_ads_by_ids(api, ids['ads'], ['name', 'creative'])
+    ad_creatives = get_ad_creatives_by_ads(api, ads, ['effective_object_story_id'])
+
+    return len(ads) + len(ad_creatives)
+
+def benchmark_copy_ad_set(api: ApiRecord, ids: Mapping, args) -> int:
+    copied_ad_set_ids = copy_ad_set(
+        api,
+        ids['adsets'][0],
+        ids['campaigns'][0],
+        copies=args.copies,
+        deep_copy=False,
+        ad_set_name_generator=lambda copy: 'Copy %d' % copy
+    )
+
+    return len(copied_ad_set_ids)
+
+def benchmark_copy_campaign_trees(api: ApiRecord, ids: Mapping, args) -> int:
+    results = copy_campaign_trees(api, ids['campaigns'][:1], [api])
+
+    return len(results[api.ad_account_id].value.id_map)
+
+def benchmark_create_mirror_ads(api: ApiRecord, ids: Mapping, args) -> int:
+    mirror_ads = create_mirror_ads(
+        api,
+        ids['ads'][:args.mirror_ads],
+        ids['adsets'][:args.mirror_ad_sets]
+    )
+
+    return sum(len(ad_ids) for ad_ids in mirror_ads.values())
+
+BENCHMARKS = {
+    'request_all_pages': benchmark_request_all_pages,
+    'batch_request': benchmark_batch_request,
+    'getters': benchmark_getters,
+    'copy_ad_set': benchmark_copy_ad_set,
+    'copy_campaign_trees': benchmark_copy_campaign_trees,
+    'create_mirror_ads': benchmark_create_mirror_ads,
+}
+
+def run_benchmark(name: str, benchmark: Callable, args) -> Mapping:
+    with FakeGraphServer(
+        latency=args.latency,
+        operation_latency=args.operation_latency,
+        page_size=args.page_size
+    ) as server:
+        ids = server.seed_ad_account('act_1', campaigns=args.campaigns, ad_sets=args.ad_sets, ads=args.ads)
+        api = server.create_api('act_1')
+
+        server.reset_counters()
+        started_at = Time.perf_counter()
+        items = benchmark(api, ids, args)
+        seconds = Time.perf_counter() - started_at
+
+        return {
+            'name': name,
+            'seconds': seconds,
+            'items': items,
+            'http_calls': server.http_calls,
+            'operations': server.operations,
+            'items_per_second': items / seconds if seconds else None,
+        }
+
+def find_regressions(results: Mapping[str, Mapping], baseline: Mapping[str, Mapping], tolerance: float):
+    regressions = []
+
+    for name, result in results.items():
+        previous = baseline.get(name)
+
+        if not previous:
+            continue
+
+        if result['http_calls'] > previous['http_calls']:
+            regressions.append('%s: %d HTTP calls, baseline %d' % (name, result['http_calls'], previous['http_calls']))
+
+        if result['seconds'] > previous['seconds'] * (1 + tolerance):
+            regressions.append('%s: %.3fs, baseline %.3fs' % (name, result['seconds'], previous['seconds']))
+
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmarks', nargs='*', choices=[[], *BENCHMARKS], help='Scenarios to run (default: all)')
+    parser.add_argument('--ads', type=int, default=10000)
+    parser.add_argument('--ad-sets', type=int, default=1000)
+    parser.add_argument('--campaigns', type=int, default=20)
+    parser.add_argument('--copies', type=int, default=100)
+    parser.add_argument('--mirror-ads', type=int, default=5)
+    parser.add_argument('--mirror-ad-sets', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every HTTP call')
+    parser.add_argument('--operation-latency', type=float, default=0.001, help='Seconds added to every batch operation')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against results written with --output')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    results = {}
+
+    for name in args.benchmarks or BENCHMARKS:
+        result = results[name] = run_benchmark(name, BENCHMARKS[name], args)
+
+        print('%-20s %8.3fs %8d items %6d calls %8d operations %10.1f items/s' % (
+            name,
+            result['seconds'],
+            result['items'],
+            result['http_calls'],
+            result['operations'],
+            result['items_per_second'] or 0,
+        ))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            Json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, Json.load(file), args.tolerance)
+
+        for regression in regressions:
+            print('REGRESSION', regression)
+
+        return 1 if regressions else 0
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
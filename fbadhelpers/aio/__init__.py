@@ -0,0 +1,4 @@
+from .clients import *
+from .requesters import *
+from .helpers import *
+from .executors import *
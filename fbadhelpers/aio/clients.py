@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import hmac
+import json as Json
+from typing import Mapping, Tuple
+
+import aiohttp
+from facebookads import FacebookAdsApi
+
+from fbadhelpers.records import ApiRecord
+
+GRAPH_URL = 'https://graph.facebook.com'
+
+# Calls in flight across every account sharing an AsyncClient
+DEFAULT_CONCURRENCY = 32
+
+# Open connections kept alive by the shared pool
+DEFAULT_POOL_SIZE = 100
+
+class AsyncClient:
+    """
+    Owns the aiohttp connection pool shared by every account bound to it. Calls
+    from all bound accounts run concurrently up to the concurrency limit.
+    """
+
+    graph_url: str
+    api_version: str
+    app_secret: str
+
+    def __init__(
+            self,
+            graph_url: str = GRAPH_URL,
+            api_version: str = FacebookAdsApi.API_VERSION,
+            app_secret: str = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            timeout: float = None
+    ):
+
+        self.graph_url = graph_url.rstrip('/')
+        self.api_version = api_version
+        self.app_secret = app_secret
+
+        self._concurrency = concurrency
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def bind(self, api: ApiRecord) -> 'AsyncApiRecord':
+        return AsyncApiRecord(client=self, api=api)
+
+    async def call(self, api: ApiRecord, method: str, path: any, params: Mapping = None) -> Tuple[int, Mapping, str]:
+        session = self._get_session()
+
+        url = self.build_url(path)
+        params = encode_params(params or {})
+
+        if 'access_token=' not in url:
+            params.update(self._auth_params(api.access_token))
+
+        async with self._semaphore:
+            if method in ('GET', 'DELETE'):
+                pending_response = session.request(method, url, params=params)
+            else:
+                pending_response = session.request(method, url, data=params)
+
+            async with pending_response as response:
+                return response.status, dict(response.headers), await response.text()
+
+    def build_url(self, path: any) -> str:
+        if isinstance(path, str):
+            if path.startswith('http://') or path.startswith('https://'):
+                return path
+
+            relative_path = path.strip('/')
+        else:
+            relative_path = '/'.join(map(str, path))
+
+        return '/'.join((self.graph_url, self.api_version, relative_path))
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # The session has to be created inside the running event loop
+        if not self._session:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                headers={'User-Agent': 'fbadhelpers-aio'}
+            )
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+
+        return self._session
+
+    def _auth_params(self, access_token: str) -> Mapping[str, str]:
+        params = {'access_token': access_token}
+
+        if self.app_secret:
+            params['appsecret_proof'] = hmac.new(
+                self.app_secret.encode('utf-8'),
+                msg=access_token.encode('utf-8'),
+                digestmod=hashlib.sha256
+            ).hexdigest()
+
+        return params
+
+class AsyncApiRecord(ApiRecord):
+    """
+    An ApiRecord whose requests go through an AsyncClient. It shares the
+    governor, cache and coalescer of the record it was bound from, but paces
+    SDK calls made through its objects with a service of its own, leaving the
+    bound record's service as it was.
+    """
+
+    client: AsyncClient
+
+    def __init__(self, client: AsyncClient, api: ApiRecord):
+        super().__init__(
+            service=api.service,
+            access_token=api.access_token,
+            business_id=api.business_id,
+            ad_account_id=api.ad_account_id,
+            timezone=api.timezone,
+            namespace=api.namespace,
+            governor=api.governor,
+            cache=api.cache,
+            coalescer=api.coalescer
+        )
+
+        self.client = client
+
+def encode_params(params: Mapping) -> Mapping[str, str]:
+    # Mirrors how the SDK encodes top level parameters
+    encoded = {}
+
+    for param, value in params.items():
+        if isinstance(value, (Mapping, list, tuple, bool)):
+            encoded[param] = Json.dumps(value, sort_keys=True, separators=(',', ':'))
+        else:
+            encoded[param] = str(value)
+
+    return encoded
@@ -0,0 +1,36 @@
+import asyncio
+from typing import Callable, Mapping, Sequence, Awaitable
+
+from fbadhelpers.aio.clients import AsyncApiRecord
+from fbadhelpers.executors import DEFAULT_FAN_OUT_WORKERS, assert_unique_ad_accounts
+from fbadhelpers.records import FanOutResult
+from fbadhelpers.types import TAdAccountId
+
+
+async def fan_out(
+        apis: Sequence[AsyncApiRecord],
+        helper: Callable[..., Awaitable],
+        args: Sequence = (),
+        kwargs: Mapping = None,
+        max_concurrency: int = DEFAULT_FAN_OUT_WORKERS
+) -> Mapping[TAdAccountId, FanOutResult]:
+    """
+    Awaits helper(api, *args, **kwargs) for every api, at most max_concurrency at
+    once, and collects a result or error per ad account. Each ad account may
+    appear once, as results are keyed by it.
+    """
+    apis = list(apis)
+    assert_unique_ad_accounts(apis)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(api: AsyncApiRecord) -> FanOutResult:
+        async with semaphore:
+            try:
+                return FanOutResult(api=api, value=await helper(api, *args, **(kwargs or {})))
+            except Exception as error:
+                return FanOutResult(api=api, error=error)
+
+    results = await asyncio.gather(*[run(api) for api in apis])
+
+    return {result.api.ad_account_id: result for result in results}
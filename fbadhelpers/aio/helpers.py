@@ -0,0 +1,202 @@
+from typing import Iterable, Mapping, Sequence, Callable
+from urllib.parse import quote
+
+from facebookads.adobjects.ad import Ad
+from facebookads.adobjects.adcreative import AdCreative
+from facebookads.adobjects.adset import AdSet
+from facebookads.adobjects.campaign import Campaign
+
+from fbadhelpers.aio.clients import AsyncApiRecord
+from fbadhelpers.aio.requesters import AsyncBatchRequest, request, request_by_ids, request_all_pages_from_response
+from fbadhelpers.helpers.misc.create_mirror_ads import build_mirror_ad_creative_configs, build_mirror_ad_config
+from fbadhelpers.types import TCampaignId, TAdSetId, TAdId
+
+# Async counterparts of the helpers in fbadhelpers.helpers. They take an
+# AsyncApiRecord (see AsyncClient.bind) and otherwise share their signatures.
+
+async def get_recent_campaigns(api: AsyncApiRecord, count: int = 10) -> Sequence[Campaign]:
+    response = await request(api, path=[api.ad_account_id, 'campaigns'], params={
+        'fields': _join_fields([
+            Campaign.Field.id,
+            Campaign.Field.name,
+        ]),
+        'limit': count,
+    })
+
+    return [_to_object(Campaign, api, campaign) for campaign in response['data'][:count]]
+
+async def get_campaign_by_id(api: AsyncApiRecord, campaign_id: TCampaignId, fields: Iterable[str] = None) -> Campaign:
+    response = await request(api, path=[campaign_id], params={
+        'fields': _join_fields(fields or [
+            Campaign.Field.name,
+            Campaign.Field.status,
+            Campaign.Field.start_time,
+            Campaign.Field.stop_time,
+            Campaign.Field.spend_cap,
+        ])
+    })
+
+    return _to_object(Campaign, api, response)
+
+async def get_ad_set_by_id(api: AsyncApiRecord, ad_set_id: TAdSetId, fields: Iterable[str] = None) -> AdSet:
+    response = await request(api, path=[ad_set_id], params={'fields': _join_fields(fields)} if fields else None)
+
+    return _to_object(AdSet, api, response)
+
+async def get_ad_sets_by_campaign_id(api: AsyncApiRecord, campaign_id: TCampaignId, fields: Iterable[str] = None) -> Sequence[AdSet]:
+    response = await request(api, path=[campaign_id, 'adsets'], params={
+        'fields': _join_fields(fields or [
+            AdSet.Field.id,
+            AdSet.Field.name,
+            AdSet.Field.status,
+            AdSet.Field.start_time,
+            AdSet.Field.end_time,
+        ])
+    })
+
+    ad_sets = await request_all_pages_from_response(api, response)
+
+    return [_to_object(AdSet, api, ad_set) for ad_set in ad_sets]
+
+async def get_ads_by_ids(api: AsyncApiRecord, ids: Sequence[TAdId], fields: Iterable[str] = None) -> Sequence[Ad]:
+    return await request_by_ids(api, ids, fields)
+
+async def get_ad_creatives_by_ads(api: AsyncApiRecord, ads: Sequence[Ad], fields: Iterable[str] = None) -> Sequence[AdCreative]:
+    ad_creative_ids = []
+    for ad in ads:
+        if Ad.Field.creative not in ad:
+            raise RuntimeError('Each ad must contain a creative id to look up a story id')
+
+        ad_creative_ids.append(ad[Ad.Field.creative]['id'])
+
+    return await request_by_ids(api, ad_creative_ids, fields)
+
+async def get_ads_by_ad_set_id(api: AsyncApiRecord, ad_set_id: TAdSetId, fields: Sequence[str] = None) -> Sequence[Ad]:
+    response = await request(api, path=[ad_set_id, 'ads'], params={'fields': _join_fields(fields)} if fields else None)
+    ads = await request_all_pages_from_response(api, response)
+
+    return [_to_object(Ad, api, ad) for ad in ads]
+
+async def get_ad_ids_by_ad_set_id(api: AsyncApiRecord, ad_set_id: TAdSetId):
+    ads = await get_ads_by_ad_set_id(api, ad_set_id, [
+        Ad.Field.id
+    ])
+
+    return [ad[Ad.Field.id] for ad in ads]
+
+async def update_ad_sets_by_ids_from_config(
+        api: AsyncApiRecord,
+        ad_set_ids: Sequence[TAdSetId],
+        ad_set_config: Mapping[str, any]
+) -> Sequence[bool]:
+
+    batch = AsyncBatchRequest(api)
+
+    for ad_set_id in ad_set_ids:
+        batch.request(path=[ad_set_id], params=ad_set_config, method='POST')
+
+    return await batch.perform()
+
+async def copy_ad_set(
+        api: AsyncApiRecord,
+        ad_set_id: TAdSetId,
+        under_campaign_id: TCampaignId,
+        copies: int = 1,
+        deep_copy: bool = True,
+        ad_set_name_generator: Callable[[int], str] = None
+) -> Sequence[TAdSetId]:
+
+    batch = AsyncBatchRequest(api)
+
+    for copy in range(copies):
+        batch.request(
+            path=f'/{quote(ad_set_id)}/copies',
+            params={
+                'campaign_id': under_campaign_id,
+                'deep_copy': deep_copy,
+                'rename_options': {
+                    'rename_suffix': ''
+                },
+                'status_option': 'PAUSED'
+            },
+            method='POST'
+        )
+
+    responses = await batch.perform()
+
+    new_ad_set_ids = [response['copied_adset_id'] for response in responses]
+
+    if ad_set_name_generator:
+        rename_batch = AsyncBatchRequest(api)
+
+        for index, new_ad_set_id in enumerate(new_ad_set_ids):
+            rename_batch.request(
+                path=[new_ad_set_id],
+                params={
+                    AdSet.Field.name: ad_set_name_generator(index)
+                },
+                method='POST'
+            )
+
+        await rename_batch.perform()
+
+    return new_ad_set_ids
+
+async def create_mirror_ads(
+        api: AsyncApiRecord,
+        source_ad_ids: Sequence[TAdId],
+        under_ad_set_ids: Sequence[TAdSetId],
+        ad_name_generator: Callable[[Ad, TAdSetId], str] = None
+) -> Mapping[TAdSetId, Sequence[TAdId]]:
+
+    source_ads = await get_ads_by_ids(api, source_ad_ids, [
+        Ad.Field.name,
+        Ad.Field.creative
+    ])
+
+    source_ad_creatives = await get_ad_creatives_by_ads(api, source_ads, [
+        AdCreative.Field.effective_object_story_id,
+        AdCreative.Field.instagram_actor_id,
+    ])
+
+    ad_creative_configs, config_indexes = build_mirror_ad_creative_configs(source_ad_creatives)
+
+    creative_batch = AsyncBatchRequest(api)
+
+    for ad_creative_config in ad_creative_configs:
+        creative_batch.request(path=[api.ad_account_id, 'adcreatives'], params=ad_creative_config, method='POST')
+
+    created_ad_creatives = await creative_batch.perform()
+    new_ad_creatives = [created_ad_creatives[config_index] for config_index in config_indexes]
+
+    ad_batch = AsyncBatchRequest(api)
+
+    for ad_set_id in under_ad_set_ids:
+        for index, ad_creative in enumerate(new_ad_creatives):
+            ad_batch.request(
+                path=[api.ad_account_id, 'ads'],
+                params=build_mirror_ad_config(
+                    source_ad=source_ads[index],
+                    ad_creative_id=ad_creative[AdCreative.Field.id],
+                    under_ad_set_id=ad_set_id,
+                    ad_name_generator=ad_name_generator
+                ),
+                method='POST'
+            )
+
+    new_ads = await ad_batch.perform()
+    ads_per_ad_set = len(source_ads)
+
+    return {
+        ad_set_id: new_ads[index * ads_per_ad_set:(index + 1) * ads_per_ad_set]
+        for index, ad_set_id in enumerate(under_ad_set_ids)
+    }
+
+def _join_fields(fields: Iterable[str]) -> str:
+    return ','.join(fields or [])
+
+def _to_object(object_class, api: AsyncApiRecord, data: Mapping):
+    sdk_object = object_class(fbid=data.get('id'), api=api.service)
+    sdk_object._set_data(data)
+
+    return sdk_object
@@ -0,0 +1,469 @@
+import asyncio
+import copy
+from typing import Mapping, Iterable, Sequence, Callable, List, Tuple, AsyncIterator, Awaitable
+from urllib.parse import urlencode, quote
+
+from facebookads.api import FacebookRequest, FacebookResponse
+
+from fbadhelpers.aio.clients import AsyncApiRecord, encode_params
+from fbadhelpers.caching import object_id_from_path
+from fbadhelpers.records import BatchOutcome
+from fbadhelpers.requesters import MAX_BATCH_SIZE, MAX_IDS_PER_REQUEST, DEFAULT_MAX_RETRIES, \
+    DEFAULT_RETRY_BACKOFF, is_transient_failure, start_request_event, finish_request_event
+
+
+async def request(api: AsyncApiRecord, path: any = None, params: Mapping = None, method: str = 'GET'):
+    await _wait_for_governor(api)
+
+    event = start_request_event('request', api, payload=params, method=method, path=path or [])
+
+    try:
+        status, headers, body = await api.client.call(api, method, path or [], params or {})
+    except Exception as error:
+        # Connection errors, timeouts and the like still close the event
+        finish_request_event(event, error=error)
+        raise
+
+    api.governor.observe(headers)
+
+    response = FacebookResponse(
+        body=body,
+        http_status=status,
+        headers=headers,
+        call={
+            'method': method,
+            'path': api.client.build_url(path or []),
+            'params': params or {},
+        }
+    )
+
+    finish_request_event(
+        event,
+        headers=headers,
+        status=status,
+        error_code=response.error().api_error_code() if response.is_failure() else None,
+        response_size=len(body or '')
+    )
+
+    if response.is_failure():
+        raise response.error()
+
+    if method != 'GET' and api.cache:
+        api.cache.invalidate(object_id_from_path(path or []))
+
+    return response.json()
+
+class _AsyncBatchOperation:
+    method: str
+    path: any
+    params: Mapping
+
+    def __init__(self, method: str, path: any, params: Mapping):
+        self.method = method
+        self.path = path
+        self.params = params
+
+    @classmethod
+    def from_facebook_request(cls, facebook_request: FacebookRequest) -> '_AsyncBatchOperation':
+        params = copy.deepcopy(facebook_request._params)
+
+        if facebook_request._fields:
+            params['fields'] = ','.join(facebook_request._fields)
+
+        return cls(
+            method=facebook_request._method,
+            path=facebook_request._path,
+            params=params
+        )
+
+    def to_batch_call(self) -> Mapping:
+        if isinstance(self.path, str):
+            relative_url = self.path
+        else:
+            relative_url = '/'.join(map(str, self.path))
+
+        call = {
+            'method': self.method,
+            'relative_url': relative_url,
+        }
+
+        if self.params:
+            encoded = urlencode(encode_params(self.params), quote_via=quote)
+
+            if self.method == 'GET':
+                call['relative_url'] += '?' + encoded
+            else:
+                call['body'] = encoded
+
+        return call
+
+    def describe(self):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'params': self.params,
+        }
+
+class AsyncBatchRequest:
+    _api: AsyncApiRecord
+    _operations: List[_AsyncBatchOperation]
+    _max_batch_size: int
+    _max_retries: int
+    _retry_backoff: float
+
+    def __init__(
+            self,
+            api: AsyncApiRecord,
+            max_batch_size: int = MAX_BATCH_SIZE,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+            retry_backoff: float = DEFAULT_RETRY_BACKOFF
+        ):
+
+        assert 0 < max_batch_size <= MAX_BATCH_SIZE, 'Batch size must be between 1 and %d' % MAX_BATCH_SIZE
+        assert max_retries >= 0, 'Retries cannot be negative'
+
+        self._api = api
+        self._operations = []
+        self._max_batch_size = max_batch_size
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+
+    def __len__(self):
+        return len(self._operations)
+
+    def request(self, path: any = None, params: Mapping = None, method: str = 'GET'):
+        self._operations.append(_AsyncBatchOperation(
+            method=method,
+            path=path or [],
+            params=params or {}
+        ))
+
+    def add_facebook_request(self, facebook_request: FacebookRequest):
+        self._operations.append(_AsyncBatchOperation.from_facebook_request(facebook_request))
+
+    async def perform(self):
+        operations = self._operations
+        outcomes = await self.perform_outcomes()
+
+        failures = [outcome for outcome in outcomes if not outcome.success]
+
+        if len(failures):
+            raise Exception('Failed to execute request fully', {
+                'requests': [operation.describe() for operation in operations],
+                'failures': [outcome.response for outcome in failures]
+            })
+
+        return [outcome.response for outcome in outcomes]
+
+    async def perform_outcomes(self) -> Sequence[BatchOutcome]:
+        operations = self._operations
+        self._operations = []
+
+        outcomes = [None] * len(operations)
+        pending = list(range(len(operations)))
+        attempt = 0
+
+        while pending:
+            if attempt:
+                await asyncio.sleep(self._retry_backoff * 2 ** (attempt - 1))
+
+            attempt += 1
+            retry = []
+
+            results = await self._execute_operations([operations[index] for index in pending], attempt)
+
+            for index, (is_success, response) in zip(pending, results):
+                status = response.status() if response else None
+                body = response.json() if response else None
+
+                outcomes[index] = BatchOutcome(
+                    success=is_success,
+                    status=status,
+                    response=body,
+                    attempts=attempt
+                )
+
+                if not is_success and attempt <= self._max_retries and is_transient_failure(status, body):
+                    retry.append(index)
+
+            pending = retry
+
+        if self._api.cache:
+            self._api.cache.invalidate(*[
+                object_id_from_path(operation.path)
+                for operation in operations
+                if operation.method != 'GET'
+            ])
+
+        return outcomes
+
+    @classmethod
+    async def perform_from_facebook_requests(cls, api: AsyncApiRecord, facebook_requests: Iterable[FacebookRequest], **kwargs):
+        batch = cls(api, **kwargs)
+
+        for facebook_request in facebook_requests:
+            batch.add_facebook_request(facebook_request)
+
+        return await batch.perform()
+
+    async def _execute_operations(self, operations: Sequence[_AsyncBatchOperation], attempt: int = 1) -> List[Tuple[bool, FacebookResponse]]:
+        chunks = [
+            operations[offset:offset + self._max_batch_size]
+            for offset in range(0, len(operations), self._max_batch_size)
+        ]
+
+        # Concurrency is bounded by the client shared between all accounts
+        chunk_results = await asyncio.gather(*[self._execute_chunk(chunk, attempt) for chunk in chunks])
+
+        return [result for results in chunk_results for result in results]
+
+    async def _execute_chunk(self, operations: Sequence[_AsyncBatchOperation], attempt: int = 1) -> List[Tuple[bool, FacebookResponse]]:
+        await _wait_for_governor(self._api)
+
+        batch_calls = [operation.to_batch_call() for operation in operations]
+
+        event = start_request_event(
+            'batch',
+            self._api,
+            payload=batch_calls,
+            method='POST',
+            path=[],
+            attempt=attempt,
+            operations=len(operations)
+        )
+
+        try:
+            status, headers, body = await self._api.client.call(self._api, 'POST', [], {'batch': batch_calls})
+        except Exception as error:
+            finish_request_event(event, error=error, failures=len(operations))
+
+            # Like the unanswered operations of a batch call, these fail without a
+            # response, which is retried as transient
+            return [(False, None)] * len(operations)
+
+        self._api.governor.observe(headers)
+
+        batch_response = FacebookResponse(body=body, http_status=status, headers=headers)
+
+        if batch_response.is_failure():
+            finish_request_event(
+                event,
+                headers=headers,
+                status=status,
+                error_code=batch_response.error().api_error_code(),
+                response_size=len(body or ''),
+                failures=len(operations)
+            )
+
+            # The batch call itself failed, so every operation shares its error
+            return [(False, batch_response)] * len(operations)
+
+        responses = []
+
+        for index, inner_response in enumerate(batch_response.json()):
+            # Operations without an answer are reported as failures with no response
+            if not inner_response:
+                responses.append((False, None))
+                continue
+
+            response = FacebookResponse(
+                body=inner_response.get('body'),
+                http_status=inner_response.get('code'),
+                headers=inner_response.get('headers'),
+                call=operations[index].describe()
+            )
+
+            self._api.governor.observe(response.headers())
+            responses.append((response.is_success(), response))
+
+        finish_request_event(
+            event,
+            headers=headers,
+            status=status,
+            response_size=len(body or ''),
+            failures=sum(1 for is_success, _ in responses if not is_success)
+        )
+
+        return responses
+
+async def request_by_ids(
+        api: AsyncApiRecord,
+        ids: Sequence[str],
+        fields: Iterable[str] = None,
+        max_ids: int = MAX_IDS_PER_REQUEST
+) -> Sequence[Mapping]:
+
+    assert 0 < max_ids <= MAX_IDS_PER_REQUEST, 'IDs per request must be between 1 and %d' % MAX_IDS_PER_REQUEST
+
+    unique_ids = [str(id) for id in dict.fromkeys(ids)]
+
+    if not unique_ids:
+        return []
+
+    params = {'fields': ','.join(fields)} if fields else {}
+    batch = AsyncBatchRequest(api)
+
+    for offset in range(0, len(unique_ids), max_ids):
+        batch.request(path='', params={
+            **params,
+            'ids': ','.join(unique_ids[offset:offset + max_ids]),
+        })
+
+    objects = {}
+
+    for response in await batch.perform():
+        objects.update(response)
+
+    missing_ids = [id for id in unique_ids if id not in objects]
+
+    if missing_ids:
+        raise Exception('Objects missing from response', {'ids': missing_ids})
+
+    return [objects[str(id)] for id in ids]
+
+async def request_all_pages(api: AsyncApiRecord, next_request_builder, path: any = None, params: Mapping = None, sleep: float = 0.0, method: str = 'GET'):
+    return [row async for row in iterate_rows(iterate_pages(
+        api=api,
+        next_request_builder=next_request_builder,
+        path=path,
+        params=params,
+        sleep=sleep,
+        method=method
+    ))]
+
+async def request_all_pages_from_response(api: AsyncApiRecord, response: any, sleep: float = 0.0):
+    return [row async for row in iterate_rows(iterate_pages_from_response(api=api, response=response, sleep=sleep))]
+
+def iterate_pages(
+        api: AsyncApiRecord,
+        next_request_builder: Callable[[Mapping], Mapping],
+        path: any = None,
+        params: Mapping = None,
+        sleep: float = 0.0,
+        method: str = 'GET',
+        after: str = None,
+        prefetch: bool = False
+) -> AsyncIterator[Mapping]:
+
+    params = dict(params or {})
+
+    if after:
+        params['after'] = after
+
+    async def fetch_first():
+        return await request(api=api, path=path, params=params, method=method)
+
+    async def fetch_next(response):
+        return await request(**{
+            'api': api,
+            **next_request_builder(response),
+        })
+
+    return _walk_pages(
+        _observe_page_fetches(api, path, fetch_first),
+        _observe_page_fetches(api, path, fetch_next),
+        sleep,
+        prefetch
+    )
+
+def iterate_pages_from_response(api: AsyncApiRecord, response: any, sleep: float = 0.0, prefetch: bool = False) -> AsyncIterator[Mapping]:
+    async def fetch_first():
+        return response
+
+    next_url = response.get('paging', {}).get('next')
+
+    return _walk_pages(
+        fetch_first,
+        _observe_page_fetches(api, next_url, _fetch_next_page_builder(api)),
+        sleep,
+        prefetch
+    )
+
+def iterate_pages_from_url(api: AsyncApiRecord, url: str, sleep: float = 0.0, prefetch: bool = False) -> AsyncIterator[Mapping]:
+    async def fetch_first():
+        return await request(api=api, path=url)
+
+    return _walk_pages(
+        _observe_page_fetches(api, url, fetch_first),
+        _observe_page_fetches(api, url, _fetch_next_page_builder(api)),
+        sleep,
+        prefetch
+    )
+
+async def iterate_rows(pages: AsyncIterator[Mapping]) -> AsyncIterator[any]:
+    async for page in pages:
+        for row in page['data']:
+            yield row
+
+async def _wait_for_governor(api: AsyncApiRecord):
+    delay = api.governor.delay()
+
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+def _fetch_next_page_builder(api: AsyncApiRecord):
+    async def fetch_next(response):
+        return await request(
+            api=api,
+            path=response['paging']['next']
+        )
+
+    return fetch_next
+
+def _observe_page_fetches(api: AsyncApiRecord, path: any, fetch: Callable[..., Awaitable[Mapping]]) -> Callable[..., Awaitable[Mapping]]:
+    async def observed_fetch(*args):
+        event = start_request_event('page', api, method='GET', path=path)
+
+        try:
+            page = await fetch(*args)
+        except Exception as error:
+            finish_request_event(event, error=error)
+            raise
+
+        finish_request_event(event, rows=len(page.get('data') or []))
+
+        return page
+
+    return observed_fetch
+
+async def _fetch_page_after_sleep(fetch_next: Callable[[Mapping], Awaitable[Mapping]], response: Mapping, sleep: float):
+    await asyncio.sleep(sleep)
+    return await fetch_next(response)
+
+async def _walk_pages(
+        fetch_first: Callable[[], Awaitable[Mapping]],
+        fetch_next: Callable[[Mapping], Awaitable[Mapping]],
+        sleep: float,
+        prefetch: bool
+) -> AsyncIterator[Mapping]:
+
+    response = await fetch_first()
+
+    assert 'data' in response, 'No data available from response'
+    assert 'paging' in response, 'No paging data available from response'
+
+    next_response = None
+
+    try:
+        while True:
+            has_next = 'next' in response['paging']
+
+            if has_next and prefetch:
+                next_response = asyncio.ensure_future(_fetch_page_after_sleep(fetch_next, response, sleep))
+
+            yield response
+
+            if not has_next:
+                return
+
+            if next_response:
+                response = await next_response
+                next_response = None
+            else:
+                response = await _fetch_page_after_sleep(fetch_next, response, sleep)
+
+            assert 'data' in response, 'No data available from paginated response'
+            assert 'paging' in response, 'No paging data available from paginated response'
+    finally:
+        if next_response:
+            next_response.cancel()
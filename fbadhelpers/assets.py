@@ -0,0 +1,105 @@
+import hashlib
+import json as Json
+import mmap
+import os
+import sqlite3
+import threading
+import time as Time
+from typing import Mapping
+
+from fbadhelpers.types import TAdAccountId
+
+VIDEO_EXTENSIONS = frozenset(['.mp4', '.mov', '.m4v', '.avi', '.mkv', '.wmv', '.webm', '.3gp', '.mpeg', '.mpg'])
+
+
+class AssetIndex:
+    """
+    Remembers, per ad account, what each uploaded image or video was uploaded
+    as, by the sha256 of its content, in a sqlite file. Also keeps the state of
+    unfinished chunked video uploads so they can pick up where they stopped.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS assets (
+                    ad_account_id TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    handle TEXT NOT NULL,
+                    uploaded_at REAL NOT NULL,
+                    PRIMARY KEY (ad_account_id, sha256)
+                )
+            ''')
+
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS video_uploads (
+                    ad_account_id TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    session TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (ad_account_id, sha256)
+                )
+            ''')
+
+    def get(self, ad_account_id: TAdAccountId, sha256: str) -> Mapping[str, str]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT handle FROM assets WHERE ad_account_id = ? AND sha256 = ?',
+                (ad_account_id, sha256)
+            ).fetchone()
+
+        return Json.loads(row[0]) if row else None
+
+    def put(self, ad_account_id: TAdAccountId, sha256: str, kind: str, handle: Mapping[str, str]):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO assets (ad_account_id, sha256, kind, handle, uploaded_at) VALUES (?, ?, ?, ?, ?)',
+                (ad_account_id, sha256, kind, Json.dumps(handle), Time.time())
+            )
+
+    def forget(self, ad_account_id: TAdAccountId, sha256: str):
+        """
+        Drops what an asset was uploaded as, e.g. after it was deleted from the
+        ad account, so the next upload sends it again.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM assets WHERE ad_account_id = ? AND sha256 = ?', (ad_account_id, sha256))
+
+    def get_video_upload(self, ad_account_id: TAdAccountId, sha256: str) -> Mapping:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT session FROM video_uploads WHERE ad_account_id = ? AND sha256 = ?',
+                (ad_account_id, sha256)
+            ).fetchone()
+
+        return Json.loads(row[0]) if row else None
+
+    def save_video_upload(self, ad_account_id: TAdAccountId, sha256: str, session: Mapping):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO video_uploads (ad_account_id, sha256, session, updated_at) VALUES (?, ?, ?, ?)',
+                (ad_account_id, sha256, Json.dumps(session), Time.time())
+            )
+
+    def forget_video_upload(self, ad_account_id: TAdAccountId, sha256: str):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM video_uploads WHERE ad_account_id = ? AND sha256 = ?', (ad_account_id, sha256))
+
+    def close(self):
+        self._connection.close()
+
+def hash_file(path: str) -> str:
+    with open(path, 'rb') as file:
+        # mmap can't map empty files
+        if os.fstat(file.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return hashlib.sha256(content).hexdigest()
+
+def get_asset_kind(path: str) -> str:
+    return 'video' if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS else 'image'
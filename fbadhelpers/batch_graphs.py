@@ -0,0 +1,359 @@
+import re
+import time as Time
+from typing import Mapping, Sequence, List
+
+from fbadhelpers.journals import Journal
+from fbadhelpers.records import ApiRecord, BatchOutcome
+from fbadhelpers.requesters import BatchRequest, MAX_BATCH_SIZE, DEFAULT_BATCH_CONCURRENCY, DEFAULT_MAX_RETRIES, \
+    DEFAULT_RETRY_BACKOFF, is_transient_failure
+
+# https://developers.facebook.com/docs/graph-api/batch-requests#operations
+
+
+class BatchResultRef:
+    node: 'BatchNode'
+    json_path: str
+
+    def __init__(self, node: 'BatchNode', json_path: str):
+        self.node = node
+        self.json_path = json_path
+
+    def render(self) -> str:
+        return '{result=%s:%s}' % (self.node.name, self.json_path)
+
+class BatchNode:
+    index: int
+    name: str
+    method: str
+    path: any
+    params: Mapping
+    key: str
+    dependencies: Sequence['BatchNode']
+
+    def __init__(self, index: int, method: str, path: any, params: Mapping, key: str = None):
+        self.index = index
+        self.name = 'op%d' % index
+        self.method = method
+        self.path = path
+        self.params = params
+        self.key = key
+        self.dependencies = _find_dependencies(path, params)
+
+    def ref(self, json_path: str = '$.id') -> BatchResultRef:
+        return BatchResultRef(self, json_path)
+
+class BatchGraph:
+    """
+    Builds batch operations that depend on each other's results. Pass a node's
+    ref() anywhere in a later request's path or params and the graph compiles
+    the requests into as few batch calls as possible: dependents share a batch
+    call with what they depend on (using Graph's {result=name:$.path}
+    references) while it has room, and otherwise run in a following round with
+    the referenced value filled in locally.
+
+    Requests failing transiently are retried, with backoff, in later rounds
+    along with the requests depending on them; results of requests that
+    succeeded are filled in locally.
+
+    With a journal, requests given a key are recorded under `job` as they
+    complete, and a later graph for the same job answers them from the journal
+    instead of sending them again.
+    """
+
+    _api: ApiRecord
+    _nodes: List[BatchNode]
+    _max_batch_size: int
+    _max_workers: int
+    _max_retries: int
+    _retry_backoff: float
+    _journal: Journal
+    _job: str
+
+    def __init__(
+            self,
+            api: ApiRecord,
+            max_batch_size: int = MAX_BATCH_SIZE,
+            max_workers: int = DEFAULT_BATCH_CONCURRENCY,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+            retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+            journal: Journal = None,
+            job: str = None
+        ):
+
+        assert not journal or job, 'Journaled graphs need a job name'
+        assert max_retries >= 0, 'Retries cannot be negative'
+
+        self._api = api
+        self._nodes = []
+        self._max_batch_size = max_batch_size
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._journal = journal
+        self._job = job
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def request(self, path: any = None, params: Mapping = None, method: str = 'GET', key: str = None) -> BatchNode:
+        node = BatchNode(
+            index=len(self._nodes),
+            method=method,
+            path=path or [],
+            params=params or {},
+            key=key
+        )
+
+        self._nodes.append(node)
+
+        return node
+
+    def perform(self):
+        outcomes = self.perform_outcomes()
+
+        failures = [outcome for outcome in outcomes if not outcome.success]
+
+        if len(failures):
+            raise Exception('Failed to execute request fully', {
+                'failures': [outcome.response for outcome in failures]
+            })
+
+        return [outcome.response for outcome in outcomes]
+
+    def perform_outcomes(self) -> Sequence[BatchOutcome]:
+        outcomes = [None] * len(self._nodes)
+
+        if self._journal:
+            completed = self._journal.get_completed(self._job, [node.key for node in self._nodes if node.key])
+
+            for node in self._nodes:
+                if node.key in completed:
+                    outcomes[node.index] = BatchOutcome(success=True, status=200, response=completed[node.key], attempts=0)
+
+        # Attempts made by earlier tries of retried requests
+        previous_attempts = [0] * len(self._nodes)
+        retry = 0
+
+        while True:
+            for chunks in self._plan(outcomes):
+                # Journaled jobs send a few batch calls at a time so progress is
+                # recorded as it is made rather than once per round
+                group_size = self._max_workers if self._journal else len(chunks)
+
+                for offset in range(0, len(chunks), group_size):
+                    self._perform_chunks(chunks[offset:offset + group_size], outcomes)
+
+            if retry == self._max_retries or not self._reset_retryable(outcomes, previous_attempts):
+                break
+
+            Time.sleep(self._retry_backoff * 2 ** retry)
+            retry += 1
+
+        for node in self._nodes:
+            outcomes[node.index].attempts += previous_attempts[node.index]
+
+        return outcomes
+
+    def _perform_chunks(self, chunks: Sequence[Sequence[BatchNode]], outcomes: List[BatchOutcome]):
+        # Operations referencing each other can't be retried independently, so
+        # retries happen a round at a time in perform_outcomes instead
+        batch = BatchRequest(
+            self._api,
+            max_batch_size=self._max_batch_size,
+            max_workers=self._max_workers,
+            max_retries=0
+        )
+
+        queued = []
+
+        for chunk in chunks:
+            chunk_indexes = {node.index for node in chunk}
+            referenced = {
+                dependency.index
+                for node in chunk
+                for dependency in node.dependencies
+            }
+
+            for node in chunk:
+                failed_dependencies = [
+                    dependency for dependency in node.dependencies
+                    if dependency.index not in chunk_indexes and not outcomes[dependency.index].success
+                ]
+
+                if failed_dependencies:
+                    outcomes[node.index] = _dependency_failure(failed_dependencies)
+                    continue
+
+                batch.request(
+                    path=_render(node.path, chunk_indexes, outcomes),
+                    params=_render(node.params, chunk_indexes, outcomes),
+                    method=node.method,
+                    name=node.name if node.index in referenced else None
+                )
+
+                queued.append(node)
+
+            batch.end_chunk()
+
+        keys = [node.key for node in queued if node.key]
+
+        if self._journal and keys:
+            self._journal.plan(self._job, keys)
+
+        for node, outcome in zip(queued, batch.perform_outcomes()):
+            outcomes[node.index] = outcome
+
+        if self._journal and keys:
+            self._journal.complete(self._job, {
+                node.key: outcomes[node.index].response
+                for node in queued
+                if node.key and outcomes[node.index].success
+            })
+
+    def _reset_retryable(self, outcomes: List[BatchOutcome], previous_attempts: List[int]) -> bool:
+        """
+        Clears the outcomes of requests that failed transiently, and of the
+        requests depending on them, so the next plan sends them again.
+        Returns whether any were cleared.
+        """
+        reset = set()
+
+        # Requests only reference earlier ones, so dependencies are seen first
+        for node in self._nodes:
+            outcome = outcomes[node.index]
+
+            if outcome.success:
+                continue
+
+            # Dependency failures are never sent, so they have no attempts of their own
+            if (
+                (outcome.attempts and is_transient_failure(outcome.status, outcome.response))
+                or any(dependency.index in reset for dependency in node.dependencies)
+            ):
+                reset.add(node.index)
+                previous_attempts[node.index] += outcome.attempts
+                outcomes[node.index] = None
+
+        return bool(reset)
+
+    def _plan(self, outcomes: Sequence[BatchOutcome]) -> Sequence[Sequence[Sequence[BatchNode]]]:
+        """
+        Returns rounds of batch calls, each a list of chunks of nodes that don't
+        have an outcome yet. Rounds run one after another and the chunks of a
+        round run concurrently.
+        """
+        rounds = []
+        placements = {}
+
+        def place(node: BatchNode, round_index: int, chunk_index: int = None):
+            while len(rounds) <= round_index:
+                rounds.append([])
+
+            chunks = rounds[round_index]
+
+            if chunk_index is None:
+                if not chunks or len(chunks[-1]) == self._max_batch_size:
+                    chunks.append([])
+
+                chunk_index = len(chunks) - 1
+
+            chunks[chunk_index].append(node)
+            placements[node.index] = (round_index, chunk_index)
+
+        for node in self._nodes:
+            if outcomes[node.index]:
+                continue
+
+            # Dependencies answered from the journal are resolved locally
+            dependency_placements = {
+                placements[dependency.index]
+                for dependency in node.dependencies
+                if dependency.index in placements
+            }
+
+            if not dependency_placements:
+                place(node, 0)
+                continue
+
+            if len(dependency_placements) == 1:
+                round_index, chunk_index = next(iter(dependency_placements))
+
+                if len(rounds[round_index][chunk_index]) < self._max_batch_size:
+                    place(node, round_index, chunk_index)
+                    continue
+
+            place(node, max(round_index for round_index, _ in dependency_placements) + 1)
+
+        return rounds
+
+def resolve_json_path(document: any, json_path: str) -> any:
+    """
+    Evaluates the subset of JSONPath Graph supports in batch references: $.a.b,
+    $.data.0.id, $.data[0].id and $.data.*.id (which joins matches with commas).
+    """
+    tokens = [token for token in re.split(r'\.|\[|\]', json_path.lstrip('$')) if token]
+    values = [document]
+
+    for token in tokens:
+        next_values = []
+
+        for value in values:
+            if token == '*':
+                next_values.extend(value.values() if isinstance(value, Mapping) else value)
+            elif isinstance(value, list):
+                next_values.append(value[int(token)])
+            else:
+                next_values.append(value[token])
+
+        values = next_values
+
+    if '*' in tokens:
+        return ','.join(str(value) for value in values)
+
+    return values[0]
+
+def _find_dependencies(*values: any) -> Sequence[BatchNode]:
+    dependencies = {}
+
+    def visit(value: any):
+        if isinstance(value, BatchResultRef):
+            dependencies[value.node.index] = value.node
+        elif isinstance(value, Mapping):
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                visit(item)
+
+    for value in values:
+        visit(value)
+
+    return list(dependencies.values())
+
+def _render(value: any, chunk_indexes: set, outcomes: Sequence[BatchOutcome]) -> any:
+    if isinstance(value, BatchResultRef):
+        if value.node.index in chunk_indexes:
+            return value.render()
+
+        return resolve_json_path(outcomes[value.node.index].response, value.json_path)
+
+    if isinstance(value, Mapping):
+        return {key: _render(item, chunk_indexes, outcomes) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [_render(item, chunk_indexes, outcomes) for item in value]
+
+    return value
+
+def _dependency_failure(dependencies: Sequence[BatchNode]) -> BatchOutcome:
+    return BatchOutcome(
+        success=False,
+        status=None,
+        response={
+            'error': {
+                'message': 'Dependent operation failed',
+                'dependencies': [dependency.name for dependency in dependencies],
+            }
+        },
+        attempts=0
+    )
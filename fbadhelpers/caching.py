@@ -0,0 +1,172 @@
+import json as Json
+import sqlite3
+import threading
+import time as Time
+from collections import OrderedDict
+from typing import Mapping, Iterable
+
+# Seconds a cached object is served before it has to be fetched again
+DEFAULT_CACHE_TTL = 300.0
+
+# Objects kept before the least recently used ones are evicted
+DEFAULT_CACHE_SIZE = 10000
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, object_id: str) -> Mapping:
+        with self._lock:
+            entry = self._entries.get(object_id)
+
+            if entry is not None:
+                self._entries.move_to_end(object_id)
+
+            return entry
+
+    def set(self, object_id: str, entry: Mapping):
+        with self._lock:
+            self._entries[object_id] = entry
+            self._entries.move_to_end(object_id)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, object_id: str):
+        with self._lock:
+            self._entries.pop(object_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SqliteCacheBackend:
+    def __init__(self, path: str, max_entries: int = DEFAULT_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS objects (
+                    object_id TEXT PRIMARY KEY,
+                    entry TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+
+            self._connection.execute('CREATE INDEX IF NOT EXISTS objects_accessed_at ON objects (accessed_at)')
+
+    def get(self, object_id: str) -> Mapping:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT entry FROM objects WHERE object_id = ?',
+                (object_id,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._connection.execute(
+                'UPDATE objects SET accessed_at = ? WHERE object_id = ?',
+                (Time.time(), object_id)
+            )
+
+            return Json.loads(row[0])
+
+    def set(self, object_id: str, entry: Mapping):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO objects (object_id, entry, accessed_at) VALUES (?, ?, ?)',
+                (object_id, Json.dumps(entry), Time.time())
+            )
+
+            self._connection.execute('''
+                DELETE FROM objects WHERE object_id IN (
+                    SELECT object_id FROM objects ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self._max_entries,))
+
+    def delete(self, object_id: str):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM objects WHERE object_id = ?', (object_id,))
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM objects')
+
+class ObjectCache:
+    """
+    Caches Graph objects by ID along with the fields they were fetched with. A
+    lookup is answered when every requested field was fetched within the TTL,
+    so a request for a subset of fields is served from a cached superset.
+    """
+
+    ttl: float
+
+    def __init__(self, backend: any = None, ttl: float = DEFAULT_CACHE_TTL):
+        self._backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+
+    def get(self, object_id: str, fields: Iterable[str]) -> Mapping:
+        entry = self._get_fresh_entry(object_id)
+
+        if entry is None or not set(fields) <= set(entry['fields']):
+            return None
+
+        data = entry['data']
+
+        return {
+            field: data[field]
+            for field in ['id', *fields]
+            if field in data
+        }
+
+    def set(self, object_id: str, fields: Iterable[str], data: Mapping):
+        fields = list(fields)
+        entry = self._get_fresh_entry(object_id)
+
+        if entry is not None:
+            # Merged fields expire with the older of the two fetches
+            fields = list(set(entry['fields']) | set(fields))
+            data = {**entry['data'], **data}
+            stored_at = entry['stored_at']
+        else:
+            stored_at = Time.time()
+
+        self._backend.set(object_id, {
+            'fields': fields,
+            'data': data,
+            'stored_at': stored_at,
+        })
+
+    def invalidate(self, *object_ids: str):
+        for object_id in object_ids:
+            if object_id:
+                self._backend.delete(str(object_id))
+
+    def clear(self):
+        self._backend.clear()
+
+    def _get_fresh_entry(self, object_id: str) -> Mapping:
+        entry = self._backend.get(object_id)
+
+        if entry is None:
+            return None
+
+        if Time.time() - entry['stored_at'] > self.ttl:
+            self._backend.delete(object_id)
+            return None
+
+        return entry
+
+def object_id_from_path(path: any) -> str:
+    if isinstance(path, str):
+        tokens = path.split('?')[0].strip('/').split('/')
+    else:
+        tokens = [str(token) for token in path]
+
+    return tokens[0] if tokens and tokens[0] else None
@@ -0,0 +1,138 @@
+import copy
+import threading
+import time as Time
+from concurrent.futures import Future
+from typing import Callable, Hashable, Mapping, Sequence
+
+# Seconds single-ID reads wait for others to join them in one bulk fetch, when
+# another fetch for the same key is already running
+DEFAULT_COALESCING_WINDOW = 0.005
+
+
+class RequestCoalescer:
+    """
+    Shares reads between threads using the same ApiRecord. single_flight()
+    runs one fetch per key at a time and hands its result to every caller that
+    asked for the same key meanwhile; fetch_by_id() fetches an ID right away
+    when nothing else is being fetched for its key, and otherwise gathers the
+    IDs asked for within `window` seconds and fetches them together.
+    Callers get their own copy of shared results.
+    """
+
+    window: float
+
+    def __init__(self, window: float = DEFAULT_COALESCING_WINDOW):
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._pending_ids = {}
+        self._fetching = {}
+
+    def single_flight(self, key: Hashable, fetch: Callable[[], any]) -> any:
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+
+            if is_leader:
+                future = self._in_flight[key] = Future()
+
+        if is_leader:
+            try:
+                result = fetch()
+            except BaseException as error:
+                self._settle(self._in_flight, key, future, error=error)
+                raise
+
+            self._settle(self._in_flight, key, future, result=result)
+
+            return result
+
+        return copy.deepcopy(future.result())
+
+    def fetch_by_id(
+            self,
+            object_id: str,
+            key: Hashable,
+            fetch_many: Callable[[Sequence[str]], Sequence[Mapping]],
+            fetch_one: Callable[[str], Mapping]
+    ) -> Mapping:
+        """
+        Returns the object fetched for `object_id`, either by a fetch_many(ids)
+        call shared with the other IDs requested under `key` around the same
+        time, or by fetch_one(object_id) when it's requested alone. An ID that
+        fails is fetched alone, so its caller gets the error fetch_one raises.
+        """
+        with self._lock:
+            futures = self._pending_ids.get(key)
+            is_leader = futures is None
+
+            if is_leader:
+                futures = self._pending_ids[key] = {}
+
+            future = futures.get(object_id)
+
+            if future is None:
+                future = futures[object_id] = Future()
+
+            # With no fetch running for the key, there's nothing to wait for
+            is_busy = self._fetching.get(key, 0) > 0
+
+        if is_leader:
+            if is_busy:
+                Time.sleep(self.window)
+
+            with self._lock:
+                futures = self._pending_ids.pop(key)
+                self._fetching[key] = self._fetching.get(key, 0) + 1
+
+            try:
+                self._resolve_ids(futures, fetch_many, fetch_one)
+            finally:
+                with self._lock:
+                    self._fetching[key] -= 1
+
+                    if not self._fetching[key]:
+                        del self._fetching[key]
+
+        return copy.deepcopy(future.result())
+
+    def _resolve_ids(
+            self,
+            futures: Mapping[str, Future],
+            fetch_many: Callable[[Sequence[str]], Sequence[Mapping]],
+            fetch_one: Callable[[str], Mapping]
+    ):
+        object_ids = list(futures)
+
+        if len(object_ids) == 1:
+            self._resolve_id(object_ids[0], futures[object_ids[0]], fetch_one)
+            return
+
+        try:
+            results = fetch_many(object_ids)
+        except Exception:
+            # One bad ID fails the whole bulk fetch, so only its caller should see an error
+            for object_id in object_ids:
+                self._resolve_id(object_id, futures[object_id], fetch_one)
+
+            return
+
+        for object_id, result in zip(object_ids, results):
+            futures[object_id].set_result(result)
+
+    def _resolve_id(self, object_id: str, future: Future, fetch_one: Callable[[str], Mapping]):
+        try:
+            future.set_result(fetch_one(object_id))
+        except BaseException as error:
+            future.set_exception(error)
+
+    def _settle(self, futures: dict, key: Hashable, future: Future, result: any = None, error: BaseException = None):
+        # Later callers start a fresh fetch rather than reuse a settled one
+        with self._lock:
+            futures.pop(key, None)
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
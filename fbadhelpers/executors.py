@@ -0,0 +1,160 @@
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, wait
+from typing import Callable, Mapping, Sequence
+
+from fbadhelpers.records import ApiRecord, FanOutResult
+from fbadhelpers.types import TAdAccountId
+
+DEFAULT_FAN_OUT_WORKERS = 8
+
+# Helpers running at once for a single ad account
+DEFAULT_PER_ACCOUNT_CONCURRENCY = 1
+
+# How long idle workers wait before checking whether a throttled account is ready again
+THROTTLED_RECHECK_INTERVAL = 0.05
+
+
+class FanOutExecutor:
+    """
+    Runs helpers for many ad accounts on a bounded pool of threads. Accounts take
+    turns: workers pick the next account in round-robin order that has work, is
+    below its concurrency budget and isn't being held back by its RateGovernor,
+    so a busy or throttled account can't starve the others.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_FAN_OUT_WORKERS, per_account_concurrency: int = DEFAULT_PER_ACCOUNT_CONCURRENCY):
+        assert max_workers > 0, 'At least one worker is required'
+        assert per_account_concurrency > 0, 'Accounts must be allowed at least one helper at a time'
+
+        self._per_account_concurrency = per_account_concurrency
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._apis = {}
+        self._in_flight = {}
+        self._order = deque()
+        self._shutdown = False
+
+        self._workers = [
+            threading.Thread(target=self._work, name='fbadhelpers-fan-out-%d' % index, daemon=True)
+            for index in range(max_workers)
+        ]
+
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def submit(self, api: ApiRecord, helper: Callable, *args, **kwargs) -> Future:
+        future = Future()
+
+        with self._condition:
+            assert not self._shutdown, 'Cannot submit to an executor that has been shut down'
+
+            key = api.ad_account_id
+
+            if key not in self._queues:
+                self._queues[key] = deque()
+                self._in_flight[key] = 0
+                self._order.append(key)
+
+            self._apis[key] = api
+            self._queues[key].append((future, api, helper, args, kwargs))
+            self._condition.notify()
+
+        return future
+
+    def map(self, apis: Sequence[ApiRecord], helper: Callable, args: Sequence = (), kwargs: Mapping = None) -> Mapping[TAdAccountId, FanOutResult]:
+        """
+        Runs helper(api, *args, **kwargs) for every api and collects a result or
+        error per ad account. Each ad account may appear once, as results are
+        keyed by it.
+        """
+        apis = list(apis)
+        assert_unique_ad_accounts(apis)
+
+        futures = {
+            api.ad_account_id: (api, self.submit(api, helper, *args, **(kwargs or {})))
+            for api in apis
+        }
+
+        wait([future for _, future in futures.values()])
+
+        results = {}
+
+        for ad_account_id, (api, future) in futures.items():
+            error = future.exception()
+            results[ad_account_id] = FanOutResult(api=api, value=None if error else future.result(), error=error)
+
+        return results
+
+    def shutdown(self, wait: bool = True):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                task = self._next_task()
+
+                while task is None:
+                    if self._shutdown and not any(self._queues.values()):
+                        return
+
+                    # Throttled accounts don't notify when they become ready again
+                    self._condition.wait(THROTTLED_RECHECK_INTERVAL if any(self._queues.values()) else None)
+                    task = self._next_task()
+
+            key, (future, api, helper, args, kwargs) = task
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(helper(api, *args, **kwargs))
+                except BaseException as error:
+                    future.set_exception(error)
+
+            with self._condition:
+                self._in_flight[key] -= 1
+                self._condition.notify_all()
+
+    def _next_task(self):
+        for _ in range(len(self._order)):
+            key = self._order[0]
+            self._order.rotate(-1)
+
+            if (
+                self._queues[key]
+                and self._in_flight[key] < self._per_account_concurrency
+                and self._apis[key].governor.ready_in() <= 0
+            ):
+                self._in_flight[key] += 1
+                return key, self._queues[key].popleft()
+
+        return None
+
+def assert_unique_ad_accounts(apis: Sequence[ApiRecord]):
+    counts = Counter(api.ad_account_id for api in apis)
+    duplicates = sorted(id for id, count in counts.items() if count > 1)
+
+    assert not duplicates, 'Ad accounts must appear once: %s' % ', '.join(duplicates)
+
+def fan_out(
+        apis: Sequence[ApiRecord],
+        helper: Callable,
+        args: Sequence = (),
+        kwargs: Mapping = None,
+        max_workers: int = DEFAULT_FAN_OUT_WORKERS,
+        per_account_concurrency: int = DEFAULT_PER_ACCOUNT_CONCURRENCY
+) -> Mapping[TAdAccountId, FanOutResult]:
+
+    with FanOutExecutor(max_workers=max_workers, per_account_concurrency=per_account_concurrency) as executor:
+        return executor.map(apis, helper, args=args, kwargs=kwargs)
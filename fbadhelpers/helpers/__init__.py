@@ -1,6 +1,116 @@
-from .initializers import *
-from .getters import *
-from .creators import *
-from .updaters import *
-from .copiers import *
-from .misc import *
+"""
+Helpers and the SDK object classes they work with are imported on first use,
+so `import fbadhelpers.helpers` stays cheap for short-lived processes.
+`from fbadhelpers.helpers import *` still loads everything.
+"""
+import importlib
+
+_SUBMODULES = ('initializers', 'getters', 'insights', 'snapshots', 'creators', 'uploaders', 'updaters', 'copiers', 'misc')
+
+_EXPORTS = {
+    'initializers': [
+        'create_api', 'create_app_api', 'with_ad_account', 'ApiClient', 'DEFAULT_POOL_SIZE',
+    ],
+    'getters': [
+        'get_recent_campaigns', 'get_campaign_by_id', 'get_ad_set_by_id', 'get_ad_set_fields',
+        'get_ad_sets_by_campaign_id', 'get_ads_by_ad_set_id', 'get_ad_ids_by_ad_set_id', 'get_ads_by_ids',
+        'get_ad_creatives_by_ads', 'iterate_edge', 'iterate_ad_sets_by_campaign_id', 'iterate_ads_by_ad_set_id',
+        'iterate_ad_ids_by_ad_set_id', 'DEFAULT_LISTING_LIMIT',
+    ],
+    'insights': [
+        'collect_insights', 'iterate_insights_pages', 'iterate_insights_rows', 'flatten_insights_row',
+        'ColumnarRows', 'InsightsSlice', 'DEFAULT_PAGE_LIMIT', 'DEFAULT_POLL_INTERVAL',
+        'DEFAULT_MAX_POLL_INTERVAL', 'DEFAULT_MAX_RUNNING_REPORTS', 'REPORT_COMPLETED',
+        'REPORT_FAILED_STATUSES', 'TOO_MUCH_DATA_ERROR_SUBCODES', 'NUMERIC_INSIGHTS_FIELDS',
+        'INSIGHTS_DIMENSION_FIELDS', 'get_numeric_insights_fields',
+    ],
+    'snapshots': [
+        'AccountSnapshot', 'sync_account_snapshot', 'sync_account_snapshot_file', 'SNAPSHOT_FIELDS',
+        'SNAPSHOT_PARENT_FIELDS', 'SNAPSHOT_EDGES', 'ALL_EFFECTIVE_STATUSES', 'REMOVED_STATUSES',
+        'DEFAULT_SNAPSHOT_PAGE_LIMIT', 'SYNC_OVERLAP',
+    ],
+    'creators': [
+        'create_campaign', 'create_campaigns', 'create_ad_set_from_config', 'create_ad_sets_from_configs',
+        'create_campaigns_with_ad_sets', 'validate_campaign_config', 'validate_ad_set_config',
+        'CAMPAIGN_INDEX_FIELD',
+    ],
+    'uploaders': [
+        'upload_assets', 'upload_image', 'upload_video', 'DEFAULT_UPLOAD_CONCURRENCY',
+    ],
+    'updaters': [
+        'update_ad_sets_by_ids_from_config', 'update_ad_sets_by_ids_from_config_diff',
+        'update_objects_by_ids_from_config_diff', 'diff_objects_from_config', 'values_match', 'UpdateReport',
+        'GRAPH_DEFAULTED_KEYS',
+    ],
+    'copiers': [
+        'copy_ad_set', 'copy_campaign_trees', 'copy_campaign_trees_into', 'read_campaign_trees', 'CampaignTreeCopy',
+        'CAMPAIGN_TREE_FIELDS', 'CAMPAIGN_TREE_EDGES', 'DEFAULT_TREE_PAGE_LIMIT', 'DEFAULT_TREES_PER_REQUEST',
+    ],
+    'misc': [
+        'create_mirror_ads', 'build_mirror_ad_config', 'build_mirror_ad_creative_configs',
+    ],
+}
+
+# Names the star imports used to re-export from elsewhere
+_REEXPORTS = {
+    'facebookads.api': ['FacebookAdsApi'],
+    'facebookads.session': ['FacebookSession'],
+    'facebookads.exceptions': ['FacebookRequestError'],
+    'facebookads.adobjects.ad': ['Ad'],
+    'facebookads.adobjects.adaccount': ['AdAccount'],
+    'facebookads.adobjects.adcreative': ['AdCreative'],
+    'facebookads.adobjects.adset': ['AdSet'],
+    'facebookads.adobjects.campaign': ['Campaign'],
+    'fbadhelpers.assets': ['AssetIndex'],
+    'fbadhelpers.batch_graphs': ['BatchGraph'],
+    'fbadhelpers.executors': ['fan_out', 'DEFAULT_FAN_OUT_WORKERS'],
+    'fbadhelpers.caching': ['ObjectCache'],
+    'fbadhelpers.coalescing': ['RequestCoalescer'],
+    'fbadhelpers.journals': ['Journal'],
+    'fbadhelpers.records': ['ApiRecord', 'BatchOutcome', 'FanOutResult', 'UploadedAsset', 'project'],
+    'fbadhelpers.requesters': [
+        'BatchRequest', 'DEFAULT_BATCH_CONCURRENCY', 'request', 'request_by_ids', 'iterate_pages',
+        'iterate_pages_from_response', 'iterate_rows', 'expand_edge', 'iterate_expanded_edge',
+    ],
+    'fbadhelpers.throttling': ['RateGovernor'],
+    'fbadhelpers.types': [
+        'TAccessToken', 'TBusinessId', 'TAdAccountId', 'TCampaignId', 'TAdSetId', 'TAdId', 'TStoryId',
+    ],
+}
+
+_MODULES_BY_NAME = {
+    **{name: __name__ + '.' + submodule for submodule, names in _EXPORTS.items() for name in names},
+    **{name: module for module, names in _REEXPORTS.items() for name in names},
+}
+
+__all__ = list(_MODULES_BY_NAME)
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(__name__ + '.' + name)
+
+    if name in _MODULES_BY_NAME:
+        value = getattr(importlib.import_module(_MODULES_BY_NAME[name]), name)
+    elif name.startswith('__'):
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    else:
+        value = _find_in_submodules(name)
+
+    # Later lookups of the name skip __getattr__
+    globals()[name] = value
+
+    return value
+
+def __dir__():
+    return sorted([*globals(), *_SUBMODULES, *_MODULES_BY_NAME])
+
+def _find_in_submodules(name: str):
+    # Anything else the submodules happen to import, as the star imports exposed it:
+    # the last submodule having the name wins
+    for submodule in reversed(_SUBMODULES):
+        module = importlib.import_module(__name__ + '.' + submodule)
+
+        if hasattr(module, name):
+            return getattr(module, name)
+
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
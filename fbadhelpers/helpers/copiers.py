@@ -1,35 +1,106 @@
 from typing import Iterable, Mapping, Sequence, Callable
 from urllib.parse import quote
 
-from facebookads import FacebookAdsApi
 from facebookads.adobjects.ad import Ad
-from facebookads.adobjects.adaccount import AdAccount
 from facebookads.adobjects.adcreative import AdCreative
 from facebookads.adobjects.adset import AdSet
 from facebookads.adobjects.campaign import Campaign
 
-from fbadhelpers.records import ApiRecord
-from fbadhelpers.requesters import BatchRequest, request
+from fbadhelpers.batch_graphs import BatchGraph
+from fbadhelpers.executors import fan_out, DEFAULT_FAN_OUT_WORKERS
+from fbadhelpers.journals import Journal
+from fbadhelpers.records import ApiRecord, BatchOutcome, FanOutResult
+from fbadhelpers.requesters import BatchRequest, DEFAULT_BATCH_CONCURRENCY, request, expand_edge, \
+    iterate_expanded_edge, is_too_much_data_failure
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId, \
     TCampaignId, TAdSetId, TAdId, TStoryId
 
+# Fields read from a campaign tree and set on its copies
+CAMPAIGN_TREE_FIELDS = {
+    'campaign': [
+        Campaign.Field.name,
+        Campaign.Field.objective,
+        Campaign.Field.status,
+        Campaign.Field.buying_type,
+        Campaign.Field.spend_cap,
+    ],
+    'adset': [
+        AdSet.Field.name,
+        AdSet.Field.status,
+        AdSet.Field.daily_budget,
+        AdSet.Field.lifetime_budget,
+        AdSet.Field.billing_event,
+        AdSet.Field.optimization_goal,
+        AdSet.Field.bid_amount,
+        AdSet.Field.is_autobid,
+        AdSet.Field.targeting,
+        AdSet.Field.start_time,
+        AdSet.Field.end_time,
+        AdSet.Field.promoted_object,
+        AdSet.Field.pacing_type,
+        AdSet.Field.attribution_spec,
+        AdSet.Field.destination_type,
+    ],
+    'ad': [
+        Ad.Field.name,
+        Ad.Field.status,
+        Ad.Field.tracking_specs,
+    ],
+    'adcreative': [
+        AdCreative.Field.name,
+        AdCreative.Field.title,
+        AdCreative.Field.body,
+        AdCreative.Field.object_story_spec,
+        AdCreative.Field.object_story_id,
+        AdCreative.Field.url_tags,
+        AdCreative.Field.call_to_action_type,
+        AdCreative.Field.instagram_actor_id,
+        AdCreative.Field.image_hash,
+        AdCreative.Field.video_id,
+        AdCreative.Field.link_url,
+        AdCreative.Field.object_url,
+    ],
+}
+
+CAMPAIGN_TREE_EDGES = {
+    'campaign': 'campaigns',
+    'adset': 'adsets',
+    'ad': 'ads',
+    'adcreative': 'adcreatives',
+}
+
+DEFAULT_TREE_PAGE_LIMIT = 100
+
+# Campaigns whose trees are read by one ?ids= call; a whole tree per campaign
+# is a lot of data, and calls asking for too much of it fail
+DEFAULT_TREES_PER_REQUEST = 5
+
 def copy_ad_set(
         api: ApiRecord,
         ad_set_id: TAdSetId,
         under_campaign_id: TCampaignId,
         copies: int = 1,
         deep_copy: bool = True,
-        ad_set_name_generator: Callable[[int], str] = None
+        ad_set_name_generator: Callable[[int], str] = None,
+        journal: Journal = None
 ) -> Sequence[TAdSetId]:
+    """
+    With a journal, rerunning a copy of the same ad set into the same campaign
+    only makes the copies (and renames) that didn't complete before, and
+    returns the IDs of all of them.
+    """
 
     # The Python Marketing SDK does not support copies yet, so we will have to roll
     # our own
     # https://github.com/facebook/facebook-python-ads-sdk/issues/363
 
-    batch = BatchRequest(api)
+    # Each copy and its rename go out in the same batch call, with the rename
+    # referencing the copy's result
+    graph = BatchGraph(api, journal=journal, job='copy_ad_set:%s:%s' % (ad_set_id, under_campaign_id))
+    copy_nodes = []
 
     for copy in range(copies):
-        batch.request(
+        copy_node = graph.request(
             path=f'/{quote(ad_set_id)}/copies',
             params={
                 'campaign_id': under_campaign_id,
@@ -39,25 +110,247 @@ def copy_ad_set(
                 },
                 'status_option': 'PAUSED'
             },
-            method='POST'
+            method='POST',
+            key='copy:%d' % copy
         )
 
-    responses = batch.perform()
+        copy_nodes.append(copy_node)
 
-    new_ad_set_ids = [response['copied_adset_id'] for response in responses]
-
-    if ad_set_name_generator:
-        rename_requests = []
-        for index, new_ad_set_id in enumerate(new_ad_set_ids):
-            rename_requests.append(
-                AdSet(fbid=new_ad_set_id, api=api.service).api_update(
-                    params={
-                        AdSet.Field.name: ad_set_name_generator(index)
-                    },
-                    pending=True
-                )
+        if ad_set_name_generator:
+            graph.request(
+                path=[copy_node.ref('$.copied_adset_id')],
+                params={
+                    AdSet.Field.name: ad_set_name_generator(copy)
+                },
+                method='POST',
+                key='rename:%d' % copy
             )
 
-        BatchRequest.perform_from_facebook_requests(api, rename_requests)
+    responses = graph.perform()
+
+    return [responses[copy_node.index]['copied_adset_id'] for copy_node in copy_nodes]
+
+class CampaignTreeCopy:
+    """
+    The outcome of copying campaign trees into one ad account: the ID of every
+    copy by the ID of the object it was copied from, and the outcome of every
+    create that failed, also by source ID. Objects under a failed create fail
+    with it.
+    """
+
+    ad_account_id: TAdAccountId
+    id_map: Mapping[str, str]
+    failures: Mapping[str, BatchOutcome]
+
+    def __init__(self, ad_account_id: TAdAccountId, id_map: Mapping[str, str], failures: Mapping[str, BatchOutcome]):
+        self.ad_account_id = ad_account_id
+        self.id_map = id_map
+        self.failures = failures
+
+    @property
+    def success(self) -> bool:
+        return not self.failures
+
+def copy_campaign_trees(
+        api: ApiRecord,
+        campaign_ids: Sequence[TCampaignId],
+        target_apis: Sequence[ApiRecord],
+        name_templates: Mapping[str, str] = None,
+        campaign_status: str = Campaign.Status.paused,
+        page_limit: int = DEFAULT_TREE_PAGE_LIMIT,
+        max_workers: int = DEFAULT_FAN_OUT_WORKERS,
+        journal: Journal = None
+) -> Mapping[TAdAccountId, FanOutResult]:
+    """
+    Copies whole campaigns, with their ad sets, ads and ad creatives, from the
+    ad account of `api` into the ad account of every target API. The source
+    trees are read once and every target gets its copies through its own
+    BatchGraph, with the targets run concurrently. Each target's FanOutResult
+    holds a CampaignTreeCopy.
+
+    name_templates may hold a str.format template per type ('campaign',
+    'adset', 'ad', 'adcreative') naming the copies, given the source `name`,
+    `source_id`, `type` and target `ad_account_id`. Copied campaigns get
+    `campaign_status` (paused by default) so nothing runs before it's checked.
+
+    Creatives are copied as read; images are referenced by hash, and hashes
+    only work in the account the image was uploaded to, so upload them to the
+    targets first (see upload_assets).
+    """
+    trees = read_campaign_trees(api, campaign_ids, page_limit)
+
+    return fan_out(
+        target_apis,
+        copy_campaign_trees_into,
+        args=(trees,),
+        kwargs={
+            'name_templates': name_templates,
+            'campaign_status': campaign_status,
+            'journal': journal,
+        },
+        max_workers=max_workers
+    )
+
+def read_campaign_trees(
+        api: ApiRecord,
+        campaign_ids: Sequence[TCampaignId],
+        page_limit: int = DEFAULT_TREE_PAGE_LIMIT,
+        trees_per_request: int = DEFAULT_TREES_PER_REQUEST
+) -> Sequence[Mapping]:
+    """
+    Reads campaigns with their ad sets, ads and ads' creatives nested under
+    them, expanding the whole tree in as few calls as nested field expansion
+    and paging allow. Campaigns are read `trees_per_request` at a time, and
+    fewer when Graph asks to reduce the amount of data.
+    """
+    ad_fields = [
+        *CAMPAIGN_TREE_FIELDS['ad'],
+        expand_edge(Ad.Field.creative, CAMPAIGN_TREE_FIELDS['adcreative']),
+    ]
+    ad_set_fields = [*CAMPAIGN_TREE_FIELDS['adset'], expand_edge(CAMPAIGN_TREE_EDGES['ad'], ad_fields, page_limit)]
+    campaign_fields = [*CAMPAIGN_TREE_FIELDS['campaign'], expand_edge(CAMPAIGN_TREE_EDGES['adset'], ad_set_fields, page_limit)]
+
+    campaigns = _read_objects_in_groups(api, campaign_ids, campaign_fields, trees_per_request)
+
+    for campaign in campaigns:
+        campaign['adsets'] = list(iterate_expanded_edge(api, campaign.get('adsets')))
+
+        for ad_set in campaign['adsets']:
+            ad_set['ads'] = list(iterate_expanded_edge(api, ad_set.get('ads')))
+
+    return campaigns
+
+def copy_campaign_trees_into(
+        api: ApiRecord,
+        trees: Sequence[Mapping],
+        name_templates: Mapping[str, str] = None,
+        campaign_status: str = Campaign.Status.paused,
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY,
+        journal: Journal = None
+) -> CampaignTreeCopy:
+    """
+    Creates copies of trees read by read_campaign_trees in the ad account of
+    `api`. Creatives shared by several ads are copied once.
+    """
+    graph = BatchGraph(
+        api,
+        max_workers=max_workers,
+        journal=journal,
+        job='copy_campaign_trees:%s:%s' % (','.join(campaign['id'] for campaign in trees), api.ad_account_id)
+    )
+
+    nodes = {}
+
+    def create(object_type: str, source: Mapping, params: Mapping):
+        nodes[source['id']] = graph.request(
+            path=[api.ad_account_id, CAMPAIGN_TREE_EDGES[object_type]],
+            params={
+                **_copy_fields(object_type, source),
+                **_name_copy(object_type, source, api, name_templates),
+                **params,
+            },
+            method='POST',
+            key='%s:%s' % (object_type, source['id'])
+        )
+
+    # Creatives have no parents, so they can all go out in the first round
+    for campaign in trees:
+        for ad_set in campaign['adsets']:
+            for ad in ad_set['ads']:
+                creative = ad.get(Ad.Field.creative)
+
+                if creative and creative['id'] not in nodes:
+                    create('adcreative', creative, {})
+
+    # Each campaign is followed by its ad sets and each ad set by its ads, so
+    # they share batch calls where they fit
+    for campaign in trees:
+        create('campaign', campaign, {Campaign.Field.status: campaign_status} if campaign_status else {})
+
+        for ad_set in campaign['adsets']:
+            create('adset', ad_set, {AdSet.Field.campaign_id: nodes[campaign['id']].ref()})
+
+            for ad in ad_set['ads']:
+                create('ad', ad, {
+                    Ad.Field.adset_id: nodes[ad_set['id']].ref(),
+                    Ad.Field.creative: {'creative_id': nodes[ad[Ad.Field.creative]['id']].ref()},
+                })
+
+    outcomes = graph.perform_outcomes()
+
+    id_map = {}
+    failures = {}
+
+    for source_id, node in nodes.items():
+        outcome = outcomes[node.index]
+
+        if outcome.success:
+            id_map[source_id] = outcome.response['id']
+        else:
+            failures[source_id] = outcome
+
+    return CampaignTreeCopy(api.ad_account_id, id_map, failures)
+
+def _copy_fields(object_type: str, source: Mapping) -> Mapping:
+    fields = {
+        field: source[field]
+        for field in CAMPAIGN_TREE_FIELDS[object_type]
+        if source.get(field) is not None
+    }
+
+    # Graph reports the post it created from a story spec as object_story_id,
+    # but takes only one of them on create
+    if AdCreative.Field.object_story_spec in fields:
+        fields.pop(AdCreative.Field.object_story_id, None)
+
+    return fields
+
+def _name_copy(object_type: str, source: Mapping, api: ApiRecord, name_templates: Mapping[str, str]) -> Mapping:
+    template = (name_templates or {}).get(object_type)
+
+    if not template or source.get('name') is None:
+        return {}
+
+    return {
+        'name': template.format(
+            name=source['name'],
+            source_id=source['id'],
+            type=object_type,
+            ad_account_id=api.ad_account_id
+        ),
+    }
+
+def _read_objects_in_groups(api: ApiRecord, ids: Sequence[str], fields: Sequence[str], group_size: int) -> Sequence[Mapping]:
+    unique_ids = [str(id) for id in dict.fromkeys(ids)]
+    groups = [unique_ids[offset:offset + group_size] for offset in range(0, len(unique_ids), group_size)]
+    objects = {}
+
+    while groups:
+        batch = BatchRequest(api)
+
+        for group in groups:
+            batch.request(path='', params={
+                'fields': ','.join(fields),
+                'ids': ','.join(group),
+            })
+
+        retried_groups = []
+
+        for group, outcome in zip(groups, batch.perform_outcomes()):
+            if outcome.success:
+                objects.update(outcome.response)
+            elif len(group) > 1 and is_too_much_data_failure(outcome.response):
+                # Such failures aren't retried as they are, so halves are read in
+                # the next round, and halved again if still too large
+                retried_groups += [group[:len(group) // 2], group[len(group) // 2:]]
+            else:
+                raise Exception('Failed to read objects', {'ids': group, 'failure': outcome.response})
+
+        groups = retried_groups
+
+    missing_ids = [id for id in unique_ids if id not in objects]
+
+    if missing_ids:
+        raise Exception('Objects missing from response', {'ids': missing_ids})
 
-    return new_ad_set_ids
+    return [objects[str(id)] for id in ids]
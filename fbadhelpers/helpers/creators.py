@@ -1,16 +1,14 @@
-from typing import Iterable, Mapping, Sequence, Callable
+from typing import Iterable, Mapping, Sequence, Callable, Tuple
 from urllib.parse import quote
 
-from facebookads import FacebookAdsApi
 from facebookads.adobjects.ad import Ad
-from facebookads.adobjects.adaccount import AdAccount
-from facebookads.adobjects.adcreative import AdCreative
 from facebookads.adobjects.adset import AdSet
 from facebookads.adobjects.campaign import Campaign
-from fbadhelpers.helpers import with_ad_account
 
-from fbadhelpers.records import ApiRecord
-from fbadhelpers.requesters import BatchRequest, request
+from fbadhelpers.batch_graphs import BatchGraph
+from fbadhelpers.helpers.initializers import with_ad_account
+from fbadhelpers.records import ApiRecord, BatchOutcome
+from fbadhelpers.requesters import BatchRequest, DEFAULT_BATCH_CONCURRENCY, request
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId, \
     TCampaignId, TAdSetId, TAdId, TStoryId
 
@@ -26,7 +24,7 @@ def create_campaign(api: ApiRecord, name: str, objective: str, is_active: bool =
     #
     # return campaign.remote_create()
 
-    return with_ad_account(api).create_campaign(
+    campaign = with_ad_account(api).create_campaign(
         params={
             Campaign.Field.name: name,
             Campaign.Field.objective: objective,
@@ -34,7 +32,190 @@ def create_campaign(api: ApiRecord, name: str, objective: str, is_active: bool =
         }
     )
 
+    if api.cache:
+        api.cache.invalidate(api.ad_account_id)
+
+    return campaign
+
 def create_ad_set_from_config(api: ApiRecord, ad_set_config: Mapping[str, any]) -> AdSet:
     ad_set = AdSet(parent_id=api.ad_account_id, api=api.service)
     ad_set.update(ad_set_config)
-    return ad_set.remote_create()
+    ad_set = ad_set.remote_create()
+
+    if api.cache:
+        api.cache.invalidate(api.ad_account_id, ad_set_config.get(AdSet.Field.campaign_id))
+
+    return ad_set
+
+# Ad set configs passed along with campaign configs may point to their campaign
+# by its index among those configs rather than by campaign_id
+CAMPAIGN_INDEX_FIELD = 'campaign_index'
+
+def create_campaigns(
+        api: ApiRecord,
+        campaign_configs: Sequence[Mapping[str, any]],
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY
+) -> Sequence[BatchOutcome]:
+
+    campaign_outcomes, _ = create_campaigns_with_ad_sets(api, campaign_configs, [], max_workers)
+    return campaign_outcomes
+
+def create_ad_sets_from_configs(
+        api: ApiRecord,
+        ad_set_configs: Sequence[Mapping[str, any]],
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY
+) -> Sequence[BatchOutcome]:
+
+    _, ad_set_outcomes = create_campaigns_with_ad_sets(api, [], ad_set_configs, max_workers)
+    return ad_set_outcomes
+
+def create_campaigns_with_ad_sets(
+        api: ApiRecord,
+        campaign_configs: Sequence[Mapping[str, any]],
+        ad_set_configs: Sequence[Mapping[str, any]],
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY
+) -> Tuple[Sequence[BatchOutcome], Sequence[BatchOutcome]]:
+    """
+    Creates campaigns and ad sets through concurrent batch calls and returns
+    one outcome per config, in input order; created IDs are in
+    outcome.response['id']. Configs failing local validation are not sent.
+    Ad sets may set campaign_index instead of campaign_id to go under a
+    campaign created by the same call, and fail if that campaign does.
+    Campaigns default to paused, like create_campaign.
+    """
+    graph = BatchGraph(api, max_workers=max_workers)
+
+    campaign_outcomes = [None] * len(campaign_configs)
+    campaign_nodes = {}
+
+    for index, campaign_config in enumerate(campaign_configs):
+        errors = validate_campaign_config(campaign_config)
+
+        if errors:
+            campaign_outcomes[index] = _invalid_config(errors)
+            continue
+
+        campaign_nodes[index] = graph.request(
+            path=[api.ad_account_id, 'campaigns'],
+            params={
+                Campaign.Field.status: Campaign.Status.paused,
+                **campaign_config,
+            },
+            method='POST'
+        )
+
+    ad_set_outcomes = [None] * len(ad_set_configs)
+    ad_set_nodes = {}
+
+    for index, ad_set_config in enumerate(ad_set_configs):
+        errors = validate_ad_set_config(ad_set_config, campaign_count=len(campaign_configs))
+        campaign_index = ad_set_config.get(CAMPAIGN_INDEX_FIELD)
+
+        if not errors and campaign_index is not None and campaign_index not in campaign_nodes:
+            errors = ['Campaign %d has an invalid config' % campaign_index]
+
+        if errors:
+            ad_set_outcomes[index] = _invalid_config(errors)
+            continue
+
+        params = {field: value for field, value in ad_set_config.items() if field != CAMPAIGN_INDEX_FIELD}
+
+        if campaign_index is not None:
+            params[AdSet.Field.campaign_id] = campaign_nodes[campaign_index].ref()
+
+        ad_set_nodes[index] = graph.request(
+            path=[api.ad_account_id, 'adsets'],
+            params=params,
+            method='POST'
+        )
+
+    outcomes = graph.perform_outcomes() if len(graph) else []
+
+    for index, node in campaign_nodes.items():
+        campaign_outcomes[index] = outcomes[node.index]
+
+    for index, node in ad_set_nodes.items():
+        ad_set_outcomes[index] = outcomes[node.index]
+
+    if api.cache:
+        api.cache.invalidate(*{
+            ad_set_config.get(AdSet.Field.campaign_id)
+            for ad_set_config in ad_set_configs
+        })
+
+    return campaign_outcomes, ad_set_outcomes
+
+def validate_campaign_config(campaign_config: Mapping[str, any]) -> Sequence[str]:
+    errors = _find_unknown_fields(campaign_config, Campaign.Field)
+
+    for field in (Campaign.Field.name, Campaign.Field.objective):
+        if not campaign_config.get(field):
+            errors.append('%s is required' % field)
+
+    errors += _check_constant(campaign_config, Campaign.Field.objective, Campaign.Objective)
+    errors += _check_constant(campaign_config, Campaign.Field.status, Campaign.Status)
+
+    return errors
+
+def validate_ad_set_config(ad_set_config: Mapping[str, any], campaign_count: int = 0) -> Sequence[str]:
+    """
+    Catches the mistakes Graph would otherwise reject one call at a time:
+    unknown or missing fields, unknown enum values and conflicting budgets.
+    """
+    errors = _find_unknown_fields(ad_set_config, AdSet.Field, [CAMPAIGN_INDEX_FIELD] if campaign_count else [])
+
+    for field in (AdSet.Field.name, AdSet.Field.billing_event, AdSet.Field.optimization_goal, AdSet.Field.targeting):
+        if not ad_set_config.get(field):
+            errors.append('%s is required' % field)
+
+    campaign_index = ad_set_config.get(CAMPAIGN_INDEX_FIELD)
+
+    if not ad_set_config.get(AdSet.Field.campaign_id) and campaign_index is None:
+        errors.append('%s is required' % AdSet.Field.campaign_id)
+    elif campaign_index is not None and not (isinstance(campaign_index, int) and 0 <= campaign_index < campaign_count):
+        errors.append('%s must be the index of a campaign config' % CAMPAIGN_INDEX_FIELD)
+
+    if ad_set_config.get(AdSet.Field.daily_budget) and ad_set_config.get(AdSet.Field.lifetime_budget):
+        errors.append('Only one of %s and %s can be set' % (AdSet.Field.daily_budget, AdSet.Field.lifetime_budget))
+
+    if ad_set_config.get(AdSet.Field.lifetime_budget) and not ad_set_config.get(AdSet.Field.end_time):
+        errors.append('%s is required with a %s' % (AdSet.Field.end_time, AdSet.Field.lifetime_budget))
+
+    errors += _check_constant(ad_set_config, AdSet.Field.billing_event, AdSet.BillingEvent)
+    errors += _check_constant(ad_set_config, AdSet.Field.optimization_goal, AdSet.OptimizationGoal)
+    errors += _check_constant(ad_set_config, AdSet.Field.status, AdSet.Status)
+
+    return errors
+
+def _find_unknown_fields(config: Mapping[str, any], field_class: type, extra_fields: Sequence[str] = ()) -> Sequence[str]:
+    fields = set(_get_constants(field_class)) | set(extra_fields)
+
+    return ['Unknown field %s' % field for field in config if field not in fields]
+
+def _check_constant(config: Mapping[str, any], field: str, constant_class: type) -> Sequence[str]:
+    value = config.get(field)
+
+    if value is None or value in _get_constants(constant_class):
+        return []
+
+    return ['Unknown %s %s' % (field, value)]
+
+def _get_constants(constant_class: type) -> Sequence[str]:
+    return [
+        value
+        for attribute, value in vars(constant_class).items()
+        if not attribute.startswith('__') # Filter internal attributes
+    ]
+
+def _invalid_config(errors: Sequence[str]) -> BatchOutcome:
+    return BatchOutcome(
+        success=False,
+        status=None,
+        response={
+            'error': {
+                'message': 'Invalid config',
+                'validation_errors': errors,
+            }
+        },
+        attempts=0
+    )
@@ -1,16 +1,14 @@
-from typing import Iterable, Mapping, Sequence, Callable
+from typing import Iterable, Iterator, Mapping, Sequence, Callable
 from urllib.parse import quote
 
-from facebookads import FacebookAdsApi
 from facebookads.adobjects.ad import Ad
-from facebookads.adobjects.adaccount import AdAccount
 from facebookads.adobjects.adcreative import AdCreative
 from facebookads.adobjects.adset import AdSet
 from facebookads.adobjects.campaign import Campaign
-from fbadhelpers.helpers import with_ad_account
 
-from fbadhelpers.records import ApiRecord
-from fbadhelpers.requesters import BatchRequest, request
+from fbadhelpers.helpers.initializers import with_ad_account
+from fbadhelpers.records import ApiRecord, project
+from fbadhelpers.requesters import BatchRequest, request, request_by_ids, iterate_pages, iterate_rows
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId, \
     TCampaignId, TAdSetId, TAdId, TStoryId
 
@@ -26,18 +24,20 @@ def get_recent_campaigns(api: ApiRecord, count: int = 10) -> Sequence[Campaign]:
     return ad_sets[:count]
 
 def get_campaign_by_id(api: ApiRecord, campaign_id: TCampaignId, fields: Iterable[str] = None) -> Campaign:
-    return Campaign(fbid=campaign_id, api=api.service).api_get(
-        fields=fields or [
-            Campaign.Field.name,
-            Campaign.Field.status,
-            Campaign.Field.start_time,
-            Campaign.Field.stop_time,
-            Campaign.Field.spend_cap,
-        ]
-    )
+    return _get_object_by_id(api, Campaign, campaign_id, fields or [
+        Campaign.Field.name,
+        Campaign.Field.status,
+        Campaign.Field.start_time,
+        Campaign.Field.stop_time,
+        Campaign.Field.spend_cap,
+    ])
 
 def get_ad_set_by_id(api: ApiRecord, ad_set_id: TAdSetId, fields: Iterable[str] = None) -> AdSet:
-    return AdSet(ad_set_id, api=api.service).api_get(fields=fields)
+    if not fields:
+        # Graph picks the fields, so there's nothing to key a cache entry on
+        return AdSet(ad_set_id, api=api.service).api_get(fields=fields)
+
+    return _get_object_by_id(api, AdSet, ad_set_id, fields)
 
 def get_ad_sets_by_campaign_id(api: ApiRecord, campaign_id: TCampaignId, fields: Iterable[str] = None) -> Sequence[AdSet]:
     ad_sets = Campaign(fbid=campaign_id, api=api.service).get_ad_sets(
@@ -52,15 +52,78 @@ def get_ad_sets_by_campaign_id(api: ApiRecord, campaign_id: TCampaignId, fields:
 
     return [ad_set for ad_set in ad_sets] # Force all ad sets to be fetched
 
-def get_ads_by_ids(api: ApiRecord, ids: Sequence[TAdId], fields: Iterable[str] = None) -> Sequence[Ad]:
-    requests = []
-    for id in ids:
-        requests.append(AdCreative(fbid=id, api=api.service).api_get(
-            fields=fields or [],
-            pending=True
-        ))
+# Rows asked for per page by the streaming listings
+DEFAULT_LISTING_LIMIT = 500
+
+def iterate_ad_sets_by_campaign_id(
+        api: ApiRecord,
+        campaign_id: TCampaignId,
+        fields: Sequence[str] = None,
+        limit: int = DEFAULT_LISTING_LIMIT,
+        object_class: type = None
+) -> Iterator[tuple]:
+
+    return iterate_edge(api, campaign_id, 'adsets', fields or [
+        AdSet.Field.name,
+        AdSet.Field.status,
+        AdSet.Field.start_time,
+        AdSet.Field.end_time,
+    ], limit, object_class)
+
+def iterate_ads_by_ad_set_id(
+        api: ApiRecord,
+        ad_set_id: TAdSetId,
+        fields: Sequence[str] = None,
+        limit: int = DEFAULT_LISTING_LIMIT,
+        object_class: type = None
+) -> Iterator[tuple]:
+
+    return iterate_edge(api, ad_set_id, 'ads', fields or [
+        Ad.Field.name,
+        Ad.Field.status,
+    ], limit, object_class)
+
+def iterate_ad_ids_by_ad_set_id(api: ApiRecord, ad_set_id: TAdSetId, limit: int = DEFAULT_LISTING_LIMIT) -> Iterator[TAdId]:
+    for ad in iterate_edge(api, ad_set_id, 'ads', [], limit):
+        yield ad.id
+
+def iterate_edge(
+        api: ApiRecord,
+        parent_id: str,
+        edge: str,
+        fields: Sequence[str],
+        limit: int = DEFAULT_LISTING_LIMIT,
+        object_class: type = None
+) -> Iterator[tuple]:
+    """
+    Streams the objects of an edge page by page (fetching the next page while
+    the current one is consumed) as namedtuples of `id` plus the requested
+    fields, with None for fields Graph left out. Pass an SDK class such as
+    AdSet as `object_class` to get SDK objects instead.
+    """
+    fields = [AdSet.Field.id, *[field for field in fields if field != AdSet.Field.id]]
+
+    pages = iterate_pages(
+        api=api,
+        next_request_builder=lambda response: {'path': response['paging']['next']},
+        path=[parent_id, edge],
+        params={
+            'fields': ','.join(fields),
+            'limit': limit,
+        },
+        prefetch=True
+    )
+
+    for row in iterate_rows(pages):
+        if object_class:
+            sdk_object = object_class(fbid=row['id'], api=api.service)
+            sdk_object._set_data(row)
+            yield sdk_object
+        else:
+            yield project(fields, row)
 
-    return BatchRequest.perform_from_facebook_requests(api, requests)
+def get_ads_by_ids(api: ApiRecord, ids: Sequence[TAdId], fields: Iterable[str] = None) -> Sequence[Ad]:
+    return _get_objects_by_ids(api, ids, fields)
 
 def get_ad_creatives_by_ads(api: ApiRecord, ads: Sequence[Ad], fields: Iterable[str] = None) -> Sequence[AdCreative]:
     ad_creative_ids = []
@@ -70,28 +133,19 @@ def get_ad_creatives_by_ads(api: ApiRecord, ads: Sequence[Ad], fields: Iterable[
 
         ad_creative_ids.append(ad[Ad.Field.creative]['id'])
 
-    requests = []
-    for ad_creative_id in ad_creative_ids:
-        requests.append(AdCreative(fbid=ad_creative_id, api=api.service).api_get(
-            fields=fields or [],
-            pending=True
-        ))
-
-    return BatchRequest.perform_from_facebook_requests(api, requests)
+    return _get_objects_by_ids(api, ad_creative_ids, fields)
 
 def get_ads_by_ad_set_id(api: ApiRecord, ad_set_id: TAdSetId, fields: Sequence[str] = None) -> Sequence[Ad]:
     return AdSet(fbid=ad_set_id, api=api.service).get_ads(
         fields=fields or []
     )
 
-def get_ad_ids_by_ad_set_id(api: ApiRecord, ad_set_id: TAdSetId):
-    ad_sets = get_ads_by_ad_set_id(api, ad_set_id, [
-        AdSet.Field.id
-    ])
-
-    return [ad_set[AdSet.Field.id] for ad_set in ad_sets]
+def get_ad_ids_by_ad_set_id(api: ApiRecord, ad_set_id: TAdSetId) -> Sequence[TAdId]:
+    return list(iterate_ad_ids_by_ad_set_id(api, ad_set_id))
 
 def get_ad_set_fields() -> Sequence[str]:
+    # Every field is expensive to fetch and parse for many ad sets; prefer
+    # asking for just the fields needed
     return [
         field
         for attribute, field in AdSet.Field.__dict__.items()
@@ -99,3 +153,63 @@ def get_ad_set_fields() -> Sequence[str]:
            and not field == AdSet.Field.execution_options # Not supported
            and not field == AdSet.Field.redownload # Not supported
     ]
+
+def _get_object_by_id(api: ApiRecord, object_class, object_id: str, fields: Iterable[str]):
+    fields = list(fields)
+    cached = api.cache.get(object_id, fields) if api.cache else None
+
+    if cached is not None:
+        sdk_object = object_class(fbid=object_id, api=api.service)
+        sdk_object._set_data(cached)
+        return sdk_object
+
+    if api.coalescer:
+        # Single object reads made around the same time are fetched together with ?ids=
+        data = api.coalescer.fetch_by_id(
+            object_id,
+            ('ids', api.ad_account_id, api.access_token, tuple(fields)),
+            lambda ids: request_by_ids(api, ids, fields),
+            lambda id: object_class(fbid=id, api=api.service).api_get(fields=fields).export_all_data()
+        )
+
+        sdk_object = object_class(fbid=object_id, api=api.service)
+        sdk_object._set_data(data)
+    else:
+        sdk_object = object_class(fbid=object_id, api=api.service).api_get(fields=fields)
+
+    if api.cache:
+        api.cache.set(object_id, fields, sdk_object.export_all_data())
+
+    return sdk_object
+
+def _get_objects_by_ids(api: ApiRecord, ids: Sequence[str], fields: Iterable[str]) -> Sequence[Mapping]:
+    fields = list(fields or [])
+    use_cache = api.cache and fields
+
+    objects = {}
+
+    if use_cache:
+        for id in ids:
+            cached = api.cache.get(id, fields)
+
+            if cached is not None:
+                objects[id] = cached
+
+    # Each missing object is fetched once, however many times it was asked for
+    missing_ids = list(dict.fromkeys(id for id in ids if id not in objects))
+
+    if api.coalescer:
+        responses = api.coalescer.single_flight(
+            ('ids', api.ad_account_id, api.access_token, tuple(missing_ids), tuple(fields)),
+            lambda: request_by_ids(api, missing_ids, fields)
+        )
+    else:
+        responses = request_by_ids(api, missing_ids, fields)
+
+    for id, response in zip(missing_ids, responses):
+        objects[id] = response
+
+        if use_cache:
+            api.cache.set(id, fields, response)
+
+    return [objects[id] for id in ids]
@@ -1,14 +1,15 @@
 from typing import Iterable, Mapping, Sequence, Callable
 from urllib.parse import quote
 
+import requests
+from requests.adapters import HTTPAdapter
 from facebookads import FacebookAdsApi
-from facebookads.adobjects.ad import Ad
-from facebookads.adobjects.adaccount import AdAccount
-from facebookads.adobjects.adcreative import AdCreative
-from facebookads.adobjects.adset import AdSet
-from facebookads.adobjects.campaign import Campaign
+from facebookads.session import FacebookSession
 
+from fbadhelpers.caching import ObjectCache
+from fbadhelpers.coalescing import RequestCoalescer
 from fbadhelpers.records import ApiRecord
+from fbadhelpers.throttling import RateGovernor
 from fbadhelpers.requesters import BatchRequest, request
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId, \
     TCampaignId, TAdSetId, TAdId, TStoryId
@@ -52,4 +53,124 @@ def create_app_api(
     )
 
 def with_ad_account(api: ApiRecord):
+    # AdAccount is the largest SDK object module, so it's only loaded once needed
+    from facebookads.adobjects.adaccount import AdAccount
+
     return AdAccount(fbid=api.ad_account_id, api=api.service)
+
+# Keep-alive connections an ApiClient holds open to the Graph API
+DEFAULT_POOL_SIZE = 50
+
+class ApiClient:
+    """
+    Shares one pooled, keep-alive HTTP session between any number of ApiRecords.
+    Unlike create_api, creating records doesn't touch FacebookAdsApi's process
+    wide default, so many accounts can be used safely from one process.
+    """
+
+    def __init__(
+            self,
+            app_id: str = None,
+            app_secret: str = None,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            gzip: bool = True,
+            timeout: float = None,
+            api_version: str = None,
+            proxies: Mapping[str, str] = None
+    ):
+
+        self._app_id = app_id
+        self._app_secret = app_secret
+        self._timeout = timeout
+        self._api_version = api_version
+        self._proxies = proxies
+
+        self._session = requests.Session()
+        self._session.headers['Accept-Encoding'] = 'gzip, deflate' if gzip else 'identity'
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def create_api(
+            self,
+            access_token: TAccessToken,
+            business_id: TBusinessId,
+            ad_account_id: TAdAccountId,
+            timezone: str,
+            namespace: str,
+            governor: RateGovernor = None,
+            cache: ObjectCache = None,
+            coalescer: RequestCoalescer = None
+    ) -> ApiRecord:
+
+        session = _PooledFacebookSession(
+            session=self._session,
+            app_id=self._app_id,
+            app_secret=self._app_secret,
+            access_token=access_token,
+            proxies=self._proxies,
+            timeout=self._timeout
+        )
+
+        return ApiRecord(
+            service=FacebookAdsApi(session, api_version=self._api_version),
+            access_token=access_token,
+            business_id=business_id,
+            ad_account_id='act_' + str(ad_account_id),
+            timezone=timezone,
+            namespace=namespace,
+            governor=governor,
+            cache=cache,
+            coalescer=coalescer
+        )
+
+    def close(self):
+        self._session.close()
+
+class _PooledFacebookSession(FacebookSession):
+    # FacebookSession opens a new requests session per instance, so this sets up
+    # the same attributes around the client's shared one instead
+    def __init__(
+            self,
+            session: requests.Session,
+            app_id: str,
+            app_secret: str,
+            access_token: TAccessToken,
+            proxies: Mapping[str, str],
+            timeout: float
+    ):
+
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.access_token = access_token
+        self.proxies = proxies
+        self.timeout = timeout
+
+        params = {
+            'access_token': access_token
+        }
+
+        if app_secret:
+            params['appsecret_proof'] = self._gen_appsecret_proof()
+
+        self.requests = _TokenBoundSession(session, params, proxies)
+
+class _TokenBoundSession:
+    # Adds one account's credentials to requests made through a shared session
+    def __init__(self, session: requests.Session, params: Mapping[str, str], proxies: Mapping[str, str] = None):
+        self._session = session
+        self._params = params
+        self._proxies = proxies
+
+    def request(self, method: str, url: str, params: Mapping = None, **kwargs):
+        if self._proxies:
+            kwargs.setdefault('proxies', self._proxies)
+
+        return self._session.request(method, url, params={**self._params, **(params or {})}, **kwargs)
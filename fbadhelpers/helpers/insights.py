@@ -0,0 +1,354 @@
+import math
+import time as Time
+from array import array
+from collections import deque
+from datetime import date, timedelta
+from typing import Iterable, Mapping, Sequence, Iterator, List, Tuple
+
+from facebookads.exceptions import FacebookRequestError
+
+from fbadhelpers.records import ApiRecord
+from fbadhelpers.requesters import BatchRequest, request, iterate_pages
+
+# https://developers.facebook.com/docs/marketing-api/insights/best-practices#asynchronous
+
+# Report runs kept in flight at once across all accounts
+DEFAULT_MAX_RUNNING_REPORTS = 10
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_MAX_POLL_INTERVAL = 30.0
+
+DEFAULT_PAGE_LIMIT = 500
+
+# Subcodes Facebook uses to say a query covers too much data to run
+TOO_MUCH_DATA_ERROR_SUBCODES = frozenset([1487534, 1504033])
+
+# Metrics kept as numbers. Everything else (IDs, names, dates, breakdowns) is
+# kept as returned, even when it looks numeric like a campaign named "2019"
+NUMERIC_INSIGHTS_FIELDS = frozenset([
+    'impressions', 'reach', 'frequency', 'clicks', 'unique_clicks', 'inline_link_clicks',
+    'unique_inline_link_clicks', 'outbound_clicks', 'unique_outbound_clicks', 'spend', 'social_spend',
+    'cpc', 'cpm', 'cpp', 'ctr', 'unique_ctr', 'inline_link_click_ctr', 'outbound_clicks_ctr',
+    'cost_per_inline_link_click', 'cost_per_unique_click', 'cost_per_unique_inline_link_click',
+    'cost_per_outbound_click', 'cost_per_10_sec_video_view', 'actions', 'unique_actions', 'action_values',
+    'cost_per_action_type', 'cost_per_unique_action_type', 'website_ctr', 'total_actions',
+    'total_unique_actions', 'total_action_value', 'social_clicks', 'social_impressions', 'social_reach',
+    'call_to_action_clicks', 'canvas_avg_view_percent', 'canvas_avg_view_time', 'estimated_ad_recallers',
+    'estimated_ad_recall_rate', 'cost_per_estimated_ad_recallers', 'video_10_sec_watched_actions',
+    'video_30_sec_watched_actions', 'video_p25_watched_actions', 'video_p50_watched_actions',
+    'video_p75_watched_actions', 'video_p95_watched_actions', 'video_p100_watched_actions',
+    'video_avg_percent_watched_actions', 'video_avg_time_watched_actions', 'purchase_roas',
+    'website_purchase_roas', 'mobile_app_purchase_roas',
+])
+
+# Requested fields that are never metrics
+INSIGHTS_DIMENSION_FIELDS = frozenset([
+    'account_currency', 'buying_type', 'objective', 'date_start', 'date_stop', 'created_time',
+    'updated_time', 'attribution_setting', 'optimization_goal', 'action_type', 'relevance_score',
+])
+
+REPORT_COMPLETED = 'Job Completed'
+REPORT_FAILED_STATUSES = frozenset(['Job Failed', 'Job Skipped'])
+
+
+class InsightsSlice:
+    api: ApiRecord
+    since: date
+    until: date
+    report_run_id: str
+
+    def __init__(self, api: ApiRecord, since: date, until: date):
+        self.api = api
+        self.since = since
+        self.until = until
+        self.report_run_id = None
+
+    @property
+    def days(self) -> int:
+        return (self.until - self.since).days + 1
+
+    def split(self) -> Sequence['InsightsSlice']:
+        middle = self.since + timedelta(days=self.days // 2 - 1)
+
+        return [
+            InsightsSlice(self.api, self.since, middle),
+            InsightsSlice(self.api, middle + timedelta(days=1), self.until),
+        ]
+
+class ColumnarRows:
+    """
+    Stores flat insights rows column by column. Numeric metrics are kept in
+    arrays of doubles (NaN where a row has no value) and repeated strings are
+    shared, so large pulls don't keep a dict per row. Columns are numeric when
+    their field, or the field they were flattened from, is in `numeric_fields`;
+    all other columns keep values exactly as returned.
+    """
+
+    def __init__(self, numeric_fields: Iterable[str] = NUMERIC_INSIGHTS_FIELDS):
+        self._numeric_fields = frozenset(numeric_fields)
+        self._columns = {}
+        self._strings = {}
+        self._length = 0
+
+        # Values of numeric columns that aren't numbers, by column and row index
+        self._exceptions = {}
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self) -> Iterator[Mapping]:
+        for index in range(self._length):
+            yield self.row(index)
+
+    @property
+    def columns(self) -> Sequence[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> Sequence[any]:
+        return self._columns[name]
+
+    def row(self, index: int) -> Mapping:
+        row = {}
+
+        for name, values in self._columns.items():
+            value = self._exceptions.get(name, {}).get(index, values[index])
+
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+
+            row[name] = value
+
+        return row
+
+    def append(self, row: Mapping):
+        for name, value in row.items():
+            if name not in self._columns:
+                self._columns[name] = self._new_column(name)
+
+            values = self._columns[name]
+
+            if isinstance(values, array):
+                number = _to_number(value)
+                values.append(math.nan if number is None else number)
+
+                if number is None and value is not None:
+                    self._exceptions.setdefault(name, {})[self._length] = value
+            else:
+                values.append(self._strings.setdefault(value, value) if isinstance(value, str) else value)
+
+        self._length += 1
+
+        # Columns this row didn't have a value for
+        for values in self._columns.values():
+            if len(values) < self._length:
+                values.append(math.nan if isinstance(values, array) else None)
+
+    def extend(self, rows: Iterable[Mapping]):
+        for row in rows:
+            self.append(row)
+
+    def is_numeric(self, name: str) -> bool:
+        # Flattened action columns like actions.link_click are typed by their field
+        return name in self._numeric_fields or name.split('.', 1)[0] in self._numeric_fields
+
+    def _new_column(self, name: str):
+        if self.is_numeric(name):
+            return array('d', [math.nan] * self._length)
+
+        return [None] * self._length
+
+def get_numeric_insights_fields(params: Mapping) -> frozenset:
+    """
+    The known metrics plus the requested fields that aren't IDs, names,
+    breakdowns or other dimensions, so newly added metrics are numeric too.
+    """
+    fields = params.get('fields') or []
+    breakdowns = params.get('breakdowns') or []
+
+    if isinstance(fields, str):
+        fields = fields.split(',')
+
+    if isinstance(breakdowns, str):
+        breakdowns = breakdowns.split(',')
+
+    requested_metrics = [
+        field
+        for field in fields
+        if field not in breakdowns
+        and field not in INSIGHTS_DIMENSION_FIELDS
+        and not field.endswith(('_id', '_name'))
+    ]
+
+    return NUMERIC_INSIGHTS_FIELDS | frozenset(requested_metrics)
+
+def iterate_insights_pages(
+        apis: Sequence[ApiRecord],
+        params: Mapping,
+        since: date,
+        until: date,
+        slice_days: int = None,
+        max_running_reports: int = DEFAULT_MAX_RUNNING_REPORTS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        page_limit: int = DEFAULT_PAGE_LIMIT
+) -> Iterator[ColumnarRows]:
+    """
+    Runs async insights reports on each ad account in `apis` between `since` and
+    `until` (inclusive), optionally sliced into `slice_days` long ranges, and
+    yields each page of results as it is read. Params are the usual /insights
+    params (fields, level, breakdowns, ...). Slices Facebook rejects as too large
+    are split in half and rerun.
+    """
+    pending = deque(
+        InsightsSlice(api, slice_since, slice_until)
+        for api in apis
+        for slice_since, slice_until in _split_date_range(since, until, slice_days)
+    )
+
+    running = []
+    interval = poll_interval
+    numeric_fields = get_numeric_insights_fields(params)
+
+    while pending or running:
+        while pending and len(running) < max_running_reports:
+            insights_slice = pending.popleft()
+
+            try:
+                insights_slice.report_run_id = _submit_report(insights_slice, params)
+            except FacebookRequestError as error:
+                if error.api_error_subcode() not in TOO_MUCH_DATA_ERROR_SUBCODES or insights_slice.days == 1:
+                    raise
+
+                pending.extendleft(reversed(insights_slice.split()))
+                continue
+
+            running.append(insights_slice)
+
+        if not running:
+            continue
+
+        Time.sleep(interval)
+
+        completed, failed = _poll_reports(running)
+        running = [insights_slice for insights_slice in running if insights_slice not in completed + failed]
+
+        for insights_slice in failed:
+            if insights_slice.days == 1:
+                raise Exception('Insights report failed', {
+                    'report_run_id': insights_slice.report_run_id,
+                    'ad_account_id': insights_slice.api.ad_account_id,
+                    'date': insights_slice.since.isoformat(),
+                })
+
+            # Async reports mostly fail for being too large, so retry as two halves
+            pending.extendleft(reversed(insights_slice.split()))
+
+        # Poll less often while nothing finishes, and quickly again once something does
+        interval = poll_interval if completed or failed else min(interval * 1.5, max_poll_interval)
+
+        for insights_slice in completed:
+            pages = iterate_pages(
+                api=insights_slice.api,
+                next_request_builder=lambda response: {'path': response['paging']['next']},
+                path=[insights_slice.report_run_id, 'insights'],
+                params={'limit': page_limit},
+                prefetch=True
+            )
+
+            for page in pages:
+                rows = ColumnarRows(numeric_fields)
+                rows.extend(flatten_insights_row(row) for row in page['data'])
+                yield rows
+
+def iterate_insights_rows(apis: Sequence[ApiRecord], params: Mapping, since: date, until: date, **kwargs) -> Iterator[Mapping]:
+    for page in iterate_insights_pages(apis, params, since, until, **kwargs):
+        yield from page
+
+def collect_insights(apis: Sequence[ApiRecord], params: Mapping, since: date, until: date, **kwargs) -> ColumnarRows:
+    rows = ColumnarRows(get_numeric_insights_fields(params))
+    rows.extend(iterate_insights_rows(apis, params, since, until, **kwargs))
+
+    return rows
+
+def flatten_insights_row(row: Mapping) -> Mapping:
+    """
+    Flattens nested insights values: action lists become `<field>.<action_type>`
+    columns and nested objects become `<field>.<key>` columns.
+    """
+    flat = {}
+
+    for name, value in row.items():
+        if isinstance(value, list) and all(isinstance(item, Mapping) and 'action_type' in item for item in value):
+            for item in value:
+                flat['%s.%s' % (name, item['action_type'])] = item.get('value')
+        elif isinstance(value, Mapping):
+            for key, item in flatten_insights_row(value).items():
+                flat['%s.%s' % (name, key)] = item
+        else:
+            flat[name] = value
+
+    return flat
+
+def _submit_report(insights_slice: InsightsSlice, params: Mapping) -> str:
+    response = request(
+        api=insights_slice.api,
+        path=[insights_slice.api.ad_account_id, 'insights'],
+        params={
+            **params,
+            'time_range': {
+                'since': insights_slice.since.isoformat(),
+                'until': insights_slice.until.isoformat(),
+            },
+        },
+        method='POST'
+    )
+
+    return response['report_run_id']
+
+def _poll_reports(running: Sequence[InsightsSlice]) -> Tuple[List[InsightsSlice], List[InsightsSlice]]:
+    completed = []
+    failed = []
+
+    slices_by_api = {}
+    for insights_slice in running:
+        slices_by_api.setdefault(insights_slice.api, []).append(insights_slice)
+
+    for api, insights_slices in slices_by_api.items():
+        batch = BatchRequest(api)
+
+        for insights_slice in insights_slices:
+            batch.request(path=[insights_slice.report_run_id], params={
+                'fields': 'async_status,async_percent_completion',
+            })
+
+        for insights_slice, report_run in zip(insights_slices, batch.perform()):
+            if report_run['async_status'] == REPORT_COMPLETED and report_run.get('async_percent_completion') == 100:
+                completed.append(insights_slice)
+            elif report_run['async_status'] in REPORT_FAILED_STATUSES:
+                failed.append(insights_slice)
+
+    return completed, failed
+
+def _split_date_range(since: date, until: date, slice_days: int = None) -> Iterator[Tuple[date, date]]:
+    if not slice_days:
+        yield since, until
+        return
+
+    slice_since = since
+
+    while slice_since <= until:
+        slice_until = min(slice_since + timedelta(days=slice_days - 1), until)
+        yield slice_since, slice_until
+        slice_since = slice_until + timedelta(days=1)
+
+def _to_number(value: any) -> float:
+    if isinstance(value, bool) or value is None:
+        return None
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -1,14 +1,15 @@
-from typing import Iterable, Mapping, Sequence, Callable
+import json as Json
+from typing import Iterable, Mapping, Sequence, Callable, Tuple
 
-from facebookads import FacebookAdsApi
 from facebookads.adobjects.ad import Ad
-from facebookads.adobjects.adaccount import AdAccount
 from facebookads.adobjects.adcreative import AdCreative
-from facebookads.adobjects.adset import AdSet
-from facebookads.adobjects.campaign import Campaign
 
+from fbadhelpers.batch_graphs import BatchGraph
+from fbadhelpers.helpers.getters import get_ads_by_ids, get_ad_creatives_by_ads
+from fbadhelpers.helpers.initializers import with_ad_account
+from fbadhelpers.journals import Journal
 from fbadhelpers.records import ApiRecord
-from fbadhelpers.requesters import BatchRequest, request
+from fbadhelpers.requesters import BatchRequest, DEFAULT_BATCH_CONCURRENCY, request
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId, \
     TCampaignId, TAdSetId, TAdId, TStoryId
 
@@ -16,8 +17,15 @@ def create_mirror_ads(
         api: ApiRecord,
         source_ad_ids: Sequence[TAdId],
         under_ad_set_ids: Sequence[TAdSetId],
-        ad_name_generator: Callable[[Ad, TAdSetId], str] = None
+        ad_name_generator: Callable[[Ad, TAdSetId], str] = None,
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY,
+        journal: Journal = None
 ) -> Mapping[TAdSetId, Sequence[TAdId]]:
+    """
+    With a journal, creatives and ads that were already created for the ad
+    account by an earlier (possibly interrupted) run are reused rather than
+    created again.
+    """
 
     source_ads = get_ads_by_ids(api, source_ad_ids, [
         Ad.Field.name,
@@ -29,33 +37,59 @@ def create_mirror_ads(
         AdCreative.Field.instagram_actor_id,
     ])
 
-    mirrored_ad_mapping = {}
+    ad_creative_configs, config_indexes = build_mirror_ad_creative_configs(source_ad_creatives)
 
-    for ad_set_id in under_ad_set_ids:
-        new_ad_creatives = _create_mirror_ad_creatives(
-            api=api,
-            source_ads=source_ads,
-            source_ad_creatives=source_ad_creatives
-        )
+    # Creatives are identical for every ad set, so each distinct one is created
+    # once and shared by all of the ads mirrored from it. Ads reference their
+    # creative's result, so the first ads share a batch call with the creatives
+    # and the rest follow as full concurrent batches.
+    graph = BatchGraph(api, max_workers=max_workers, journal=journal, job='create_mirror_ads:%s' % api.ad_account_id)
 
-        new_ads = _create_mirror_ads_from_creatives(
-            api=api,
-            source_ads=source_ads,
-            new_ad_creatives=new_ad_creatives,
-            under_ad_set_id=ad_set_id,
-            ad_name_generator=ad_name_generator
+    ad_creative_nodes = [
+        graph.request(
+            path=[api.ad_account_id, 'adcreatives'],
+            params=ad_creative_config,
+            method='POST',
+            key='creative:' + Json.dumps(ad_creative_config, sort_keys=True)
         )
+        for ad_creative_config in ad_creative_configs
+    ]
 
-        mirrored_ad_mapping[ad_set_id] = new_ads
-
-    return mirrored_ad_mapping
-
-def _create_mirror_ad_creatives(api: ApiRecord, source_ads: Sequence[Ad], source_ad_creatives: Sequence[AdCreative]):
-    new_ad_creative_requests = []
-
-    for index, source_ad in enumerate(source_ads):
-        source_ad_creative = source_ad_creatives[index]
+    ad_nodes_by_ad_set = {}
 
+    for ad_set_id in under_ad_set_ids:
+        ad_nodes_by_ad_set[ad_set_id] = [
+            graph.request(
+                path=[api.ad_account_id, 'ads'],
+                params=build_mirror_ad_config(
+                    source_ad=source_ad,
+                    ad_creative_id=ad_creative_nodes[config_indexes[index]].ref(),
+                    under_ad_set_id=ad_set_id,
+                    ad_name_generator=ad_name_generator
+                ),
+                method='POST',
+                key='ad:%s:%d:%s' % (ad_set_id, index, source_ad[Ad.Field.id])
+            )
+            for index, source_ad in enumerate(source_ads)
+        ]
+
+    responses = graph.perform()
+
+    return {
+        ad_set_id: [responses[ad_node.index] for ad_node in ad_nodes]
+        for ad_set_id, ad_nodes in ad_nodes_by_ad_set.items()
+    }
+
+def build_mirror_ad_creative_configs(source_ad_creatives: Sequence[AdCreative]) -> Tuple[Sequence[Mapping], Sequence[int]]:
+    """
+    Returns the distinct creative configs needed to mirror the given creatives,
+    along with the index of the config each source creative maps to.
+    """
+    configs = []
+    config_indexes = []
+    indexes_by_key = {}
+
+    for source_ad_creative in source_ad_creatives:
         ad_creative_config = {
             AdCreative.Field.object_story_id: source_ad_creative[AdCreative.Field.effective_object_story_id],
         }
@@ -63,43 +97,30 @@ def _create_mirror_ad_creatives(api: ApiRecord, source_ads: Sequence[Ad], source
         if (AdCreative.Field.instagram_actor_id in source_ad_creative):
             ad_creative_config[AdCreative.Field.instagram_actor_id] = source_ad_creative[AdCreative.Field.instagram_actor_id]
 
-        new_ad_creative_requests.append(with_ad_account(api).create_ad_creative(
-            params=ad_creative_config,
-            pending=True
-        ))
+        key = tuple(sorted(ad_creative_config.items()))
 
-    return BatchRequest.perform_from_facebook_requests(
-        api,
-        new_ad_creative_requests
-    )
+        if key not in indexes_by_key:
+            indexes_by_key[key] = len(configs)
+            configs.append(ad_creative_config)
 
-def _create_mirror_ads_from_creatives(
-        api: ApiRecord,
-        source_ads: Sequence[Ad],
-        new_ad_creatives: Sequence[AdCreative],
+        config_indexes.append(indexes_by_key[key])
+
+    return configs, config_indexes
+
+def build_mirror_ad_config(
+        source_ad: Ad,
+        ad_creative_id: any,
         under_ad_set_id: TAdSetId,
         ad_name_generator: Callable[[Ad, TAdSetId], str] = None
-):
-
-    new_ad_requests = []
-
-    for index, ad_creative in enumerate(new_ad_creatives):
-        source_ad = source_ads[index]
-        new_ad_name = ad_name_generator(source_ad, under_ad_set_id) if ad_name_generator else source_ad[Ad.Field.name]
-
-        new_ad_requests.append(with_ad_account(api).create_ad(
-            params={
-                Ad.Field.adset_id: under_ad_set_id,
-                Ad.Field.creative: {
-                    'creative_id': ad_creative[AdCreative.Field.id]
-                },
-                Ad.Field.name: new_ad_name,
-                Ad.Field.status: Ad.Status.active
-            },
-            pending=True
-        ))
-
-    return BatchRequest.perform_from_facebook_requests(
-        api,
-        new_ad_requests
-    )
+) -> Mapping[str, any]:
+
+    new_ad_name = ad_name_generator(source_ad, under_ad_set_id) if ad_name_generator else source_ad[Ad.Field.name]
+
+    return {
+        Ad.Field.adset_id: under_ad_set_id,
+        Ad.Field.creative: {
+            'creative_id': ad_creative_id
+        },
+        Ad.Field.name: new_ad_name,
+        Ad.Field.status: Ad.Status.active
+    }
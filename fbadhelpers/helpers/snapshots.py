@@ -0,0 +1,279 @@
+import json as Json
+import os
+import time as Time
+from typing import Iterable, Iterator, Mapping, Sequence
+
+from facebookads.adobjects.ad import Ad
+from facebookads.adobjects.adset import AdSet
+from facebookads.adobjects.campaign import Campaign
+from facebookads.exceptions import FacebookRequestError
+
+from fbadhelpers.records import ApiRecord
+from fbadhelpers.requesters import iterate_pages, iterate_rows, expand_edge, iterate_expanded_edge, \
+    get_after_cursor, is_too_much_data_failure
+from fbadhelpers.types import TAdAccountId
+
+SNAPSHOT_FIELDS = {
+    'campaign': [
+        Campaign.Field.name,
+        Campaign.Field.status,
+        Campaign.Field.effective_status,
+        Campaign.Field.objective,
+        Campaign.Field.updated_time,
+    ],
+    'adset': [
+        AdSet.Field.name,
+        AdSet.Field.status,
+        AdSet.Field.effective_status,
+        AdSet.Field.campaign_id,
+        AdSet.Field.updated_time,
+    ],
+    'ad': [
+        Ad.Field.name,
+        Ad.Field.status,
+        Ad.Field.effective_status,
+        Ad.Field.adset_id,
+        Ad.Field.campaign_id,
+        Ad.Field.updated_time,
+    ],
+}
+
+# Field holding the ID of each type's parent; campaigns hang off the ad account
+SNAPSHOT_PARENT_FIELDS = {
+    'campaign': None,
+    'adset': AdSet.Field.campaign_id,
+    'ad': Ad.Field.adset_id,
+}
+
+SNAPSHOT_EDGES = {
+    'campaign': 'campaigns',
+    'adset': 'adsets',
+    'ad': 'ads',
+}
+
+# Incremental syncs also list deleted and archived objects, which plain listings leave out
+ALL_EFFECTIVE_STATUSES = [
+    'ACTIVE', 'PAUSED', 'DELETED', 'PENDING_REVIEW', 'DISAPPROVED', 'PREAPPROVED',
+    'PENDING_BILLING_INFO', 'CAMPAIGN_PAUSED', 'ARCHIVED', 'ADSET_PAUSED', 'IN_PROCESS', 'WITH_ISSUES',
+]
+
+REMOVED_STATUSES = frozenset(['DELETED'])
+
+DEFAULT_SNAPSHOT_PAGE_LIMIT = 100
+
+# Changes made while a sync is running may not be listed by it, so the next sync
+# looks back this many seconds further
+SYNC_OVERLAP = 300
+
+
+class AccountSnapshot:
+    """
+    An in-memory copy of an ad account's campaign -> ad set -> ad tree with
+    lookups by ID, parent and name. Build or refresh one with
+    sync_account_snapshot; save() and load() keep it on disk between runs.
+    """
+
+    ad_account_id: TAdAccountId
+    synced_at: float
+
+    def __init__(self, ad_account_id: TAdAccountId, synced_at: float = None):
+        self.ad_account_id = ad_account_id
+        self.synced_at = synced_at
+
+        self._objects = {}
+        self._types = {}
+        self._children = {}
+        self._ids_by_name = {}
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, object_id: str):
+        return object_id in self._objects
+
+    def get(self, object_id: str) -> Mapping:
+        return self._objects.get(object_id)
+
+    def get_type(self, object_id: str) -> str:
+        return self._types.get(object_id)
+
+    def children(self, parent_id: str) -> Sequence[Mapping]:
+        return [self._objects[object_id] for object_id in self._children.get(parent_id, ())]
+
+    def find_by_name(self, name: str, object_type: str = None) -> Sequence[Mapping]:
+        return [
+            self._objects[object_id]
+            for object_id in self._ids_by_name.get(name, ())
+            if object_type is None or self._types[object_id] == object_type
+        ]
+
+    def iterate(self, object_type: str = None) -> Iterator[Mapping]:
+        for object_id, data in self._objects.items():
+            if object_type is None or self._types[object_id] == object_type:
+                yield data
+
+    def put(self, object_type: str, data: Mapping):
+        object_id = data['id']
+
+        if object_id in self._objects:
+            self.remove(object_id)
+
+        self._objects[object_id] = data
+        self._types[object_id] = object_type
+        self._children.setdefault(self._parent_id(object_type, data), set()).add(object_id)
+
+        if data.get('name') is not None:
+            self._ids_by_name.setdefault(data['name'], set()).add(object_id)
+
+    def remove(self, object_id: str):
+        data = self._objects.pop(object_id, None)
+
+        if data is None:
+            return
+
+        object_type = self._types.pop(object_id)
+        self._children.get(self._parent_id(object_type, data), set()).discard(object_id)
+        self._ids_by_name.get(data.get('name'), set()).discard(object_id)
+
+    def save(self, path: str):
+        temporary_path = path + '.tmp'
+
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            Json.dump({
+                'ad_account_id': self.ad_account_id,
+                'synced_at': self.synced_at,
+                'objects': [
+                    [self._types[object_id], data]
+                    for object_id, data in self._objects.items()
+                ],
+            }, file)
+
+        # Readers never see a half written snapshot
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'AccountSnapshot':
+        with open(path, encoding='utf-8') as file:
+            saved = Json.load(file)
+
+        snapshot = cls(saved['ad_account_id'], saved['synced_at'])
+
+        for object_type, data in saved['objects']:
+            snapshot.put(object_type, data)
+
+        return snapshot
+
+    def _parent_id(self, object_type: str, data: Mapping) -> str:
+        parent_field = SNAPSHOT_PARENT_FIELDS[object_type]
+        return data.get(parent_field) if parent_field else self.ad_account_id
+
+def sync_account_snapshot(
+        api: ApiRecord,
+        snapshot: AccountSnapshot = None,
+        page_limit: int = DEFAULT_SNAPSHOT_PAGE_LIMIT
+) -> AccountSnapshot:
+    """
+    Pulls the whole tree of a new snapshot with nested field expansion, or
+    fetches just the campaigns, ad sets and ads updated since an existing
+    snapshot's last sync and merges them in. Deleted objects are dropped. Trees
+    too large for Graph to return a page at a time are read with smaller pages.
+    """
+    started_at = Time.time()
+
+    if snapshot is None or snapshot.synced_at is None:
+        snapshot = snapshot or AccountSnapshot(api.ad_account_id)
+        _pull_tree(api, snapshot, page_limit)
+    else:
+        _pull_changes(api, snapshot, page_limit, since=snapshot.synced_at - SYNC_OVERLAP)
+
+    snapshot.synced_at = started_at
+
+    return snapshot
+
+def sync_account_snapshot_file(api: ApiRecord, path: str, page_limit: int = DEFAULT_SNAPSHOT_PAGE_LIMIT) -> AccountSnapshot:
+    snapshot = AccountSnapshot.load(path) if os.path.exists(path) else None
+    snapshot = sync_account_snapshot(api, snapshot, page_limit)
+    snapshot.save(path)
+
+    return snapshot
+
+def _pull_tree(api: ApiRecord, snapshot: AccountSnapshot, page_limit: int):
+    # campaigns{...,adsets.limit(n){...,ads.limit(n){...}}} fetches a page of
+    # the whole tree in one call; edges with more objects than fit are paged separately
+    # Listings leave out archived objects unless asked for every status but the removed ones
+    filtering = [{
+        'field': 'effective_status',
+        'operator': 'IN',
+        'value': [status for status in ALL_EFFECTIVE_STATUSES if status not in REMOVED_STATUSES],
+    }]
+
+    after = None
+
+    while True:
+        try:
+            for page in _iterate_tree_pages(api, page_limit, filtering, after):
+                _put_tree_page(api, snapshot, page)
+                after = get_after_cursor(page)
+
+            return
+        except FacebookRequestError as error:
+            if page_limit == 1 or not is_too_much_data_failure(error.body()):
+                raise
+
+            # A page of trees can be more than Graph will return at once: pages
+            # already merged are kept, and the rest is read with smaller pages
+            page_limit //= 2
+
+def _iterate_tree_pages(api: ApiRecord, page_limit: int, filtering: Sequence[Mapping], after: str = None) -> Iterator[Mapping]:
+    ad_set_fields = [*SNAPSHOT_FIELDS['adset'], expand_edge(SNAPSHOT_EDGES['ad'], SNAPSHOT_FIELDS['ad'], page_limit, filtering)]
+    campaign_fields = [*SNAPSHOT_FIELDS['campaign'], expand_edge(SNAPSHOT_EDGES['adset'], ad_set_fields, page_limit, filtering)]
+
+    return iterate_pages(
+        api=api,
+        next_request_builder=lambda response: {'path': response['paging']['next']},
+        path=[api.ad_account_id, 'campaigns'],
+        params={
+            'fields': ','.join(campaign_fields),
+            'limit': page_limit,
+            'filtering': filtering,
+        },
+        after=after
+    )
+
+def _put_tree_page(api: ApiRecord, snapshot: AccountSnapshot, page: Mapping):
+    for campaign in page['data']:
+        ad_sets = campaign.pop('adsets', None)
+        snapshot.put('campaign', campaign)
+
+        for ad_set in iterate_expanded_edge(api, ad_sets):
+            ads = ad_set.pop('ads', None)
+            ad_set.setdefault(AdSet.Field.campaign_id, campaign['id'])
+            snapshot.put('adset', ad_set)
+
+            for ad in iterate_expanded_edge(api, ads):
+                ad.setdefault(Ad.Field.adset_id, ad_set['id'])
+                ad.setdefault(Ad.Field.campaign_id, campaign['id'])
+                snapshot.put('ad', ad)
+
+def _pull_changes(api: ApiRecord, snapshot: AccountSnapshot, page_limit: int, since: float):
+    # Parents first, so a new ad's ad set is already in place when it's merged
+    for object_type in ('campaign', 'adset', 'ad'):
+        pages = iterate_pages(
+            api=api,
+            next_request_builder=lambda response: {'path': response['paging']['next']},
+            path=[api.ad_account_id, SNAPSHOT_EDGES[object_type]],
+            params={
+                'fields': ','.join(SNAPSHOT_FIELDS[object_type]),
+                'limit': page_limit,
+                'filtering': [
+                    {'field': 'updated_time', 'operator': 'GREATER_THAN', 'value': int(since)},
+                    {'field': 'effective_status', 'operator': 'IN', 'value': ALL_EFFECTIVE_STATUSES},
+                ],
+            }
+        )
+
+        for data in iterate_rows(pages):
+            if data.get('effective_status') in REMOVED_STATUSES:
+                snapshot.remove(data['id'])
+            else:
+                snapshot.put(object_type, data)
@@ -1,18 +1,21 @@
-from typing import Iterable, Mapping, Sequence, Callable
+import json as Json
+from datetime import datetime
+from typing import Iterable, Mapping, Sequence, Callable, Tuple
 from urllib.parse import quote
 
-from facebookads import FacebookAdsApi
-from facebookads.adobjects.ad import Ad
-from facebookads.adobjects.adaccount import AdAccount
-from facebookads.adobjects.adcreative import AdCreative
 from facebookads.adobjects.adset import AdSet
-from facebookads.adobjects.campaign import Campaign
 
-from fbadhelpers.records import ApiRecord
-from fbadhelpers.requesters import BatchRequest, request
+from fbadhelpers.records import ApiRecord, BatchOutcome
+from fbadhelpers.requesters import BatchRequest, DEFAULT_BATCH_CONCURRENCY, request, request_by_ids
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId, \
     TCampaignId, TAdSetId, TAdId, TStoryId
 
+# Keys Graph fills in with defaults when a written mapping leaves them out, by
+# the mapping's field. Live values may have them though a config doesn't.
+GRAPH_DEFAULTED_KEYS = {
+    'targeting': frozenset(['age_min', 'age_max']),
+    'geo_locations': frozenset(['location_types']),
+}
 
 def update_ad_sets_by_ids_from_config(
         api: ApiRecord,
@@ -20,6 +23,11 @@ def update_ad_sets_by_ids_from_config(
         ad_set_config: Mapping[str, any]
 ) -> Sequence[bool]:
 
+    if api.write_queue is not None:
+        # Waits for the queue's next flush, which may carry other callers' updates too
+        futures = api.write_queue.update_many(ad_set_ids, ad_set_config)
+        return [future.result() for future in futures]
+
     requests = []
     for ad_set_id in ad_set_ids:
         ad_set = AdSet(fbid=ad_set_id, api=api.service)
@@ -30,3 +38,159 @@ def update_ad_sets_by_ids_from_config(
 
     return BatchRequest.perform_from_facebook_requests(api, requests)
 
+class UpdateReport:
+    """
+    Per object, the fields whose current value differs from the config as
+    (current, desired) pairs, and the outcome of updating them unless this was
+    a dry run. Objects without changes aren't updated.
+    """
+
+    changes: Mapping[str, Mapping[str, Tuple[any, any]]]
+    outcomes: Mapping[str, BatchOutcome]
+    dry_run: bool
+
+    def __init__(self, changes: Mapping[str, Mapping[str, Tuple[any, any]]], outcomes: Mapping[str, BatchOutcome], dry_run: bool):
+        self.changes = changes
+        self.outcomes = outcomes
+        self.dry_run = dry_run
+
+    @property
+    def changed_ids(self) -> Sequence[str]:
+        return [object_id for object_id, fields in self.changes.items() if fields]
+
+    @property
+    def unchanged_ids(self) -> Sequence[str]:
+        return [object_id for object_id, fields in self.changes.items() if not fields]
+
+    @property
+    def failed_ids(self) -> Sequence[str]:
+        return [object_id for object_id, outcome in self.outcomes.items() if not outcome.success]
+
+    def format(self) -> str:
+        lines = ['%d of %d objects %s' % (
+            len(self.changed_ids),
+            len(self.changes),
+            'would change' if self.dry_run else 'changed',
+        )]
+
+        for object_id in self.changed_ids:
+            for field, (current, desired) in self.changes[object_id].items():
+                lines.append('%s %s: %s -> %s' % (object_id, field, Json.dumps(current), Json.dumps(desired)))
+
+        return '\n'.join(lines)
+
+def update_ad_sets_by_ids_from_config_diff(
+        api: ApiRecord,
+        ad_set_ids: Sequence[TAdSetId],
+        ad_set_config: Mapping[str, any],
+        dry_run: bool = False,
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY
+) -> UpdateReport:
+
+    return update_objects_by_ids_from_config_diff(api, ad_set_ids, ad_set_config, dry_run, max_workers)
+
+def update_objects_by_ids_from_config_diff(
+        api: ApiRecord,
+        object_ids: Sequence[str],
+        config: Mapping[str, any],
+        dry_run: bool = False,
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY
+) -> UpdateReport:
+    """
+    Like update_ad_sets_by_ids_from_config, but reads the configured fields of
+    every object first and only writes the fields that differ, to the objects
+    they differ on. With dry_run nothing is written.
+    """
+    changes = diff_objects_from_config(api, object_ids, config)
+    outcomes = {}
+
+    if not dry_run:
+        batch = BatchRequest(api, max_workers=max_workers)
+        changed_ids = [object_id for object_id, fields in changes.items() if fields]
+
+        for object_id in changed_ids:
+            batch.request(
+                path=[object_id],
+                params={field: config[field] for field in changes[object_id]},
+                method='POST'
+            )
+
+        outcomes = dict(zip(changed_ids, batch.perform_outcomes()))
+
+    return UpdateReport(changes, outcomes, dry_run)
+
+def diff_objects_from_config(
+        api: ApiRecord,
+        object_ids: Sequence[str],
+        config: Mapping[str, any]
+) -> Mapping[str, Mapping[str, Tuple[any, any]]]:
+
+    # Read fresh values rather than cached ones, which may predate other writes
+    object_ids = list(dict.fromkeys(str(object_id) for object_id in object_ids))
+    current_objects = request_by_ids(api, object_ids, list(config))
+
+    return {
+        object_id: {
+            field: (current.get(field), desired)
+            for field, desired in config.items()
+            if not values_match(current.get(field), desired, field)
+        }
+        for object_id, current in zip(object_ids, current_objects)
+    }
+
+def values_match(current: any, desired: any, field: str = '') -> bool:
+    """
+    Compares a value read from Graph with one from a config the way Graph
+    treats them: numbers and numeric strings are equal, times are compared as
+    instants and lists ignore order. Mappings are written whole, so they must
+    have the same keys, except for the GRAPH_DEFAULTED_KEYS of their field.
+    """
+    if isinstance(desired, Mapping):
+        if not isinstance(current, Mapping):
+            return False
+
+        if set(current) - set(desired) - GRAPH_DEFAULTED_KEYS.get(field, frozenset()):
+            return False
+
+        return all(
+            values_match(current.get(key), value, key)
+            for key, value in desired.items()
+        )
+
+    if isinstance(desired, (list, tuple)):
+        if not isinstance(current, (list, tuple)) or len(current) != len(desired):
+            return False
+
+        unmatched = list(current)
+
+        for value in desired:
+            match = next((index for index, item in enumerate(unmatched) if values_match(item, value, field)), None)
+
+            if match is None:
+                return False
+
+            unmatched.pop(match)
+
+        return True
+
+    return _normalize_scalar(current, field) == _normalize_scalar(desired, field)
+
+def _normalize_scalar(value: any, field: str) -> any:
+    if value is None:
+        return None
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    if field.endswith('_time') and isinstance(value, str):
+        try:
+            return datetime.strptime(value.replace('Z', '+0000'), '%Y-%m-%dT%H:%M:%S%z').timestamp()
+        except ValueError:
+            pass
+
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+    return int(number) if number.is_integer() else number
@@ -0,0 +1,192 @@
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Mapping, Sequence
+
+from facebookads.exceptions import FacebookRequestError
+
+from fbadhelpers.assets import AssetIndex, hash_file, get_asset_kind
+from fbadhelpers.records import ApiRecord, UploadedAsset
+from fbadhelpers.requesters import request
+
+# Number of uploads that may be in flight at once for a single upload_assets call
+DEFAULT_UPLOAD_CONCURRENCY = 4
+
+# https://developers.facebook.com/docs/marketing-api/advideo/#chunked-upload
+
+
+def upload_assets(
+        api: ApiRecord,
+        paths: Sequence[str],
+        index: AssetIndex = None,
+        max_workers: int = DEFAULT_UPLOAD_CONCURRENCY
+) -> Sequence[UploadedAsset]:
+    """
+    Uploads images and videos (told apart by extension) to the ad account and
+    returns one UploadedAsset per path, in order. Files with the same content
+    are uploaded once, and with an index, content uploaded to the account
+    before isn't uploaded again.
+    """
+    paths = list(paths)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        hashes = list(executor.map(hash_file, paths))
+
+        # One upload per distinct content, for the first path having it
+        paths_by_hash = {}
+
+        for path, sha256 in zip(paths, hashes):
+            paths_by_hash.setdefault(sha256, path)
+
+        assets_by_hash = dict(zip(paths_by_hash, executor.map(
+            lambda sha256: _upload_asset(api, paths_by_hash[sha256], sha256, index),
+            paths_by_hash
+        )))
+
+    assets = []
+
+    for path, sha256 in zip(paths, hashes):
+        asset = assets_by_hash[sha256]
+
+        if asset.path != path:
+            asset = UploadedAsset(
+                path=path,
+                sha256=sha256,
+                kind=asset.kind,
+                image_hash=asset.image_hash,
+                video_id=asset.video_id,
+                uploaded=False
+            )
+
+        assets.append(asset)
+
+    return assets
+
+def upload_image(api: ApiRecord, path: str, index: AssetIndex = None) -> UploadedAsset:
+    return _upload_asset(api, path, hash_file(path), index, kind='image')
+
+def upload_video(api: ApiRecord, path: str, index: AssetIndex = None, title: str = None) -> UploadedAsset:
+    return _upload_asset(api, path, hash_file(path), index, kind='video', title=title)
+
+def _upload_asset(api: ApiRecord, path: str, sha256: str, index: AssetIndex, kind: str = None, title: str = None) -> UploadedAsset:
+    kind = kind or get_asset_kind(path)
+    handle = index.get(api.ad_account_id, sha256) if index else None
+    uploaded = handle is None
+
+    if handle is None:
+        if kind == 'video':
+            handle = {'video_id': _upload_video_in_chunks(api, path, sha256, index, title)}
+        else:
+            handle = {'image_hash': _upload_image_file(api, path)}
+
+        if index:
+            index.put(api.ad_account_id, sha256, kind, handle)
+
+    return UploadedAsset(
+        path=path,
+        sha256=sha256,
+        kind=kind,
+        image_hash=handle.get('image_hash'),
+        video_id=handle.get('video_id'),
+        uploaded=uploaded
+    )
+
+def _upload_image_file(api: ApiRecord, path: str) -> str:
+    filename = os.path.basename(path)
+
+    with open(path, 'rb') as file:
+        response = request(
+            api,
+            path=[api.ad_account_id, 'adimages'],
+            method='POST',
+            files={filename: (filename, file)}
+        )
+
+    # Images are returned by the name they were uploaded under
+    return next(iter(response['images'].values()))['hash']
+
+def _upload_video_in_chunks(api: ApiRecord, path: str, sha256: str, index: AssetIndex, title: str = None) -> str:
+    """
+    Sends the video in the chunks Graph asks for, mapping the file rather than
+    reading it into memory. With an index, the upload session is saved after
+    every chunk, and an upload interrupted before finishing resumes from the
+    last chunk Graph acknowledged.
+    """
+    # mmap can't map empty files, and Graph rejects empty videos anyway
+    if os.path.getsize(path) == 0:
+        raise ValueError('Cannot upload empty video file', {'path': path})
+
+    session = index.get_video_upload(api.ad_account_id, sha256) if index else None
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        if session is not None:
+            try:
+                session = _transfer_video_chunks(api, path, sha256, index, content, session)
+            except FacebookRequestError:
+                # The saved session may have expired; start a new one
+                session = None
+
+        if session is None:
+            session = _start_video_upload(api, len(content))
+            session = _transfer_video_chunks(api, path, sha256, index, content, session)
+
+    params = {
+        'upload_phase': 'finish',
+        'upload_session_id': session['upload_session_id'],
+    }
+
+    if title:
+        params['title'] = title
+
+    request(api, path=[api.ad_account_id, 'advideos'], params=params, method='POST')
+
+    if index:
+        index.forget_video_upload(api.ad_account_id, sha256)
+
+    return session['video_id']
+
+def _start_video_upload(api: ApiRecord, file_size: int) -> Mapping:
+    response = request(
+        api,
+        path=[api.ad_account_id, 'advideos'],
+        params={
+            'upload_phase': 'start',
+            'file_size': file_size,
+        },
+        method='POST'
+    )
+
+    return {
+        'upload_session_id': response['upload_session_id'],
+        'video_id': response['video_id'],
+        'start_offset': int(response['start_offset']),
+        'end_offset': int(response['end_offset']),
+    }
+
+def _transfer_video_chunks(api: ApiRecord, path: str, sha256: str, index: AssetIndex, content: mmap.mmap, session: Mapping) -> Mapping:
+    filename = os.path.basename(path)
+
+    # Graph answers each chunk with the offsets of the next one, and equal offsets when it has everything
+    while session['start_offset'] < session['end_offset']:
+        if index:
+            index.save_video_upload(api.ad_account_id, sha256, session)
+
+        response = request(
+            api,
+            path=[api.ad_account_id, 'advideos'],
+            params={
+                'upload_phase': 'transfer',
+                'upload_session_id': session['upload_session_id'],
+                'start_offset': session['start_offset'],
+            },
+            method='POST',
+            files={'video_file_chunk': (filename, content[session['start_offset']:session['end_offset']])}
+        )
+
+        session = {
+            **session,
+            'start_offset': int(response['start_offset']),
+            'end_offset': int(response['end_offset']),
+        }
+
+    return session
@@ -0,0 +1,89 @@
+import json as Json
+import sqlite3
+import threading
+import time as Time
+from typing import Mapping, Iterable, Sequence
+
+PLANNED = 'planned'
+COMPLETED = 'completed'
+
+
+class Journal:
+    """
+    Records the operations of long bulk jobs and the responses they got, in a
+    sqlite file, so a rerun of the same job skips what already completed.
+    Operations are identified by a job name and a key stable across runs (e.g.
+    'copy:3'). Operations left planned but never completed were sent when the
+    process died, or were about to be; see pending().
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS operations (
+                    job TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    response TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job, key)
+                )
+            ''')
+
+    def get_completed(self, job: str, keys: Iterable[str]) -> Mapping[str, any]:
+        keys = list(keys)
+        completed = {}
+
+        with self._lock:
+            # Stay below sqlite's limit on bound parameters
+            for offset in range(0, len(keys), 500):
+                chunk = keys[offset:offset + 500]
+
+                rows = self._connection.execute(
+                    'SELECT key, response FROM operations WHERE job = ? AND status = ? AND key IN (%s)' % ','.join('?' * len(chunk)),
+                    (job, COMPLETED, *chunk)
+                ).fetchall()
+
+                completed.update((key, Json.loads(response)) for key, response in rows)
+
+        return completed
+
+    def plan(self, job: str, keys: Iterable[str]):
+        now = Time.time()
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO operations (job, key, status, updated_at) VALUES (?, ?, ?, ?)',
+                [(job, key, PLANNED, now) for key in keys]
+            )
+
+    def complete(self, job: str, responses: Mapping[str, any]):
+        now = Time.time()
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO operations (job, key, status, response, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(job, key, COMPLETED, Json.dumps(response), now) for key, response in responses.items()]
+            )
+
+    def pending(self, job: str) -> Sequence[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key FROM operations WHERE job = ? AND status = ? ORDER BY updated_at',
+                (job, PLANNED)
+            ).fetchall()
+
+        return [key for key, in rows]
+
+    def forget(self, job: str):
+        """
+        Drops everything recorded for `job`, so running it again starts over.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM operations WHERE job = ?', (job,))
+
+    def close(self):
+        self._connection.close()
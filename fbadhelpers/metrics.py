@@ -0,0 +1,168 @@
+import threading
+from bisect import bisect_left
+from typing import Mapping, Sequence
+from urllib.parse import urlparse
+
+from fbadhelpers.records import RequestEvent
+from fbadhelpers.requesters import add_request_hook, remove_request_hook
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    buckets: Sequence[float]
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def observe(self, seconds: float):
+        self._counts[bisect_left(self.buckets, seconds)] += 1
+        self._count += 1
+        self._total += seconds
+        self._max = max(self._max, seconds)
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the given quantile, or the
+        largest observed latency for the overflow bucket.
+        """
+        if not self._count:
+            return None
+
+        rank = quantile * self._count
+        seen = 0
+
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+
+            if seen >= rank:
+                return bound
+
+        return self._max
+
+    def export(self) -> Mapping:
+        return {
+            'count': self._count,
+            'sum': self._total,
+            'max': self._max,
+            'buckets': dict(zip([*self.buckets, float('inf')], self._counts)),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+        }
+
+class MetricsCollector:
+    """
+    Request hook keeping call counters and latency histograms per kind of call
+    ('request', 'batch' or 'page'), endpoint and ad account, along with the
+    latest rate-limit usage reported for each account.
+
+        collector = MetricsCollector().install()
+        ...
+        collector.export()
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+        self._usage = {}
+
+    def __call__(self, event: RequestEvent):
+        if event.phase != 'after':
+            return
+
+        key = (event.kind, endpoint_from_path(event.path), event.api.ad_account_id)
+
+        with self._lock:
+            series = self._series.get(key)
+
+            if series is None:
+                series = self._series[key] = {
+                    'calls': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'operations': 0,
+                    'failed_operations': 0,
+                    'rows': 0,
+                    'request_bytes': 0,
+                    'response_bytes': 0,
+                    'error_codes': {},
+                    'latency': LatencyHistogram(self._buckets),
+                }
+
+            series['calls'] += 1
+            series['retries'] += 1 if (event.attempt or 1) > 1 else 0
+            series['operations'] += event.operations or 0
+            series['failed_operations'] += event.failures or 0
+            series['rows'] += event.rows or 0
+            series['request_bytes'] += event.request_size or 0
+            series['response_bytes'] += event.response_size or 0
+            series['latency'].observe(event.duration)
+
+            if event.error_code is not None or (event.status or 0) >= 400:
+                series['errors'] += 1
+                series['error_codes'][event.error_code] = series['error_codes'].get(event.error_code, 0) + 1
+
+            if event.usage:
+                self._usage[event.api.ad_account_id] = {**self._usage.get(event.api.ad_account_id, {}), **event.usage}
+
+    def install(self) -> 'MetricsCollector':
+        add_request_hook(self)
+        return self
+
+    def uninstall(self):
+        remove_request_hook(self)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._usage.clear()
+
+    def export(self) -> Mapping:
+        """
+        Returns a JSON-serializable snapshot of every series and the latest usage
+        headers per ad account.
+        """
+        with self._lock:
+            return {
+                'series': [
+                    {
+                        'kind': kind,
+                        'endpoint': endpoint,
+                        'ad_account_id': ad_account_id,
+                        **series,
+                        'error_codes': {str(code): count for code, count in series['error_codes'].items()},
+                        'latency': series['latency'].export(),
+                    }
+                    for (kind, endpoint, ad_account_id), series in self._series.items()
+                ],
+                'usage': dict(self._usage),
+            }
+
+def endpoint_from_path(path: any) -> str:
+    """
+    Reduces a Graph path or URL to an endpoint template, e.g.
+    https://graph.facebook.com/v2.11/act_1/campaigns?after=x becomes /{id}/campaigns.
+    """
+    if path is None:
+        return None
+
+    if isinstance(path, str):
+        tokens = urlparse(path).path.strip('/').split('/')
+    else:
+        tokens = [str(token) for token in path]
+
+    # Drop the API version of full URLs
+    if tokens and tokens[0][:1] == 'v' and tokens[0][1:].replace('.', '').isdigit():
+        tokens = tokens[1:]
+
+    return '/' + '/'.join(
+        '{id}' if token.isdigit() or token.startswith('act_') else token
+        for token in tokens
+        if token
+    )
@@ -8,27 +8,45 @@
 #     'timezone',
 #     'namespace',
 # ])
-from facebookads import FacebookAdsApi
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import TYPE_CHECKING, Mapping, Sequence, Tuple
 
+from fbadhelpers.caching import ObjectCache
+from fbadhelpers.coalescing import RequestCoalescer
+from fbadhelpers.throttling import RateGovernor
 from fbadhelpers.types import TAccessToken, TBusinessId, TAdAccountId
 
+if TYPE_CHECKING:
+    from facebookads import FacebookAdsApi
+
+    from fbadhelpers.writers import WriteBehindQueue
+
 
 class ApiRecord:
-    service: FacebookAdsApi
+    service: 'FacebookAdsApi'
     access_token: TAccessToken
     business_id: TBusinessId
     ad_account_id: TAdAccountId
     timezone: str
     namespace: str
+    governor: RateGovernor
+    cache: ObjectCache
+    coalescer: RequestCoalescer
+    write_queue: 'WriteBehindQueue'
 
     def __init__(
             self,
-            service: FacebookAdsApi,
+            service: 'FacebookAdsApi',
             access_token: TAccessToken,
             business_id: TBusinessId,
             ad_account_id: TAdAccountId,
             timezone: str,
-            namespace: str
+            namespace: str,
+            governor: RateGovernor = None,
+            cache: ObjectCache = None,
+            coalescer: RequestCoalescer = None
         ):
 
         self.service = service
@@ -37,3 +55,151 @@ class ApiRecord:
         self.ad_account_id = ad_account_id
         self.timezone = timezone
         self.namespace = namespace
+        self.governor = governor or RateGovernor()
+        self.cache = cache
+        self.coalescer = coalescer
+
+        # Set to a WriteBehindQueue built for this record to batch updates in the background
+        self.write_queue = None
+
+        if service is not None:
+            # Imported here as requesters depends on this module
+            from fbadhelpers.requesters import PacedFacebookAdsApi
+            self.service = PacedFacebookAdsApi(self, service)
+
+class BatchOutcome:
+    success: bool
+    status: int
+    response: any
+    attempts: int
+
+    def __init__(self, success: bool, status: int, response: any, attempts: int):
+        self.success = success
+        self.status = status
+        self.response = response
+        self.attempts = attempts
+
+    @property
+    def error(self) -> Mapping:
+        if self.success or not isinstance(self.response, Mapping):
+            return None
+
+        return self.response.get('error')
+
+    @property
+    def error_code(self) -> int:
+        return (self.error or {}).get('code')
+
+class RequestEvent:
+    """
+    Passed to request hooks before and after each request, batch call and page
+    fetch. Fields that aren't known yet, or don't apply to the kind of call, are None.
+    `error` is the exception a call raised without getting a Graph response.
+    """
+
+    kind: str
+    phase: str
+    api: ApiRecord
+    method: str
+    path: any
+    attempt: int
+    operations: int
+    request_size: int
+    response_size: int
+    rows: int
+    failures: int
+    status: int
+    error_code: int
+    error: BaseException
+    usage: Mapping
+    started_at: float
+    duration: float
+
+    def __init__(
+            self,
+            kind: str,
+            api: ApiRecord,
+            method: str = None,
+            path: any = None,
+            attempt: int = None,
+            operations: int = None,
+            request_size: int = None,
+            started_at: float = None
+        ):
+
+        self.kind = kind
+        self.phase = 'before'
+        self.api = api
+        self.method = method
+        self.path = path
+        self.attempt = attempt
+        self.operations = operations
+        self.request_size = request_size
+        self.response_size = None
+        self.rows = None
+        self.failures = None
+        self.status = None
+        self.error_code = None
+        self.error = None
+        self.usage = None
+        self.started_at = started_at
+        self.duration = None
+
+class FanOutResult:
+    api: ApiRecord
+    value: any
+    error: BaseException
+
+    def __init__(self, api: ApiRecord, value: any = None, error: BaseException = None):
+        self.api = api
+        self.value = value
+        self.error = error
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+class UploadedAsset:
+    """
+    An image or video available to an ad account's creatives. `uploaded` is
+    False when an earlier upload of the same content was reused.
+    """
+
+    path: str
+    sha256: str
+    kind: str
+    image_hash: str
+    video_id: str
+    uploaded: bool
+
+    def __init__(self, path: str, sha256: str, kind: str, image_hash: str = None, video_id: str = None, uploaded: bool = True):
+        self.path = path
+        self.sha256 = sha256
+        self.kind = kind
+        self.image_hash = image_hash
+        self.video_id = video_id
+        self.uploaded = uploaded
+
+    def creative_fields(self) -> Mapping[str, str]:
+        """
+        The field referencing the asset in a creative's link_data or video_data.
+        """
+        if self.kind == 'video':
+            return {'video_id': self.video_id}
+
+        return {'image_hash': self.image_hash}
+
+@lru_cache(maxsize=None)
+def get_projection_type(fields: Tuple[str, ...]) -> type:
+    """
+    Returns a namedtuple type with one attribute per requested field, named
+    after the key Graph returns it under (creative{id} is returned as creative).
+    """
+    return namedtuple('Projection', [projection_key(field) for field in fields], rename=True)
+
+def projection_key(field: str) -> str:
+    return re.split(r'[{.]', field, maxsplit=1)[0]
+
+def project(fields: Sequence[str], data: Mapping) -> tuple:
+    fields = tuple(fields)
+    return get_projection_type(fields)(*[data.get(projection_key(field)) for field in fields])
@@ -1,117 +1,765 @@
+import json as Json
+import re
 import time as Time
-from typing import Mapping, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Mapping, Iterable, Iterator, Sequence, Callable, List, Tuple
+from urllib.parse import unquote
 
-from facebookads.api import FacebookAdsApiBatch, FacebookRequest
+from facebookads.api import FacebookAdsApi, FacebookAdsApiBatch, FacebookRequest, FacebookResponse
+from facebookads.exceptions import FacebookRequestError
 
-from fbadhelpers.records import ApiRecord
+from fbadhelpers.caching import object_id_from_path
+from fbadhelpers.records import ApiRecord, BatchOutcome, RequestEvent
+from fbadhelpers.throttling import parse_usage_headers
 
+_request_hooks = []
 
-def request(api: ApiRecord, path: any = None, params: Mapping = None, method: str = 'GET'):
-    response = api.service.call(method, path or [], params or {})
-    return response.json()
+def add_request_hook(hook: Callable[[RequestEvent], None]):
+    """
+    Registers `hook` to be called with a RequestEvent before and after every
+    request, batch call and page fetch, from whichever thread makes the call.
+    """
+    _request_hooks.append(hook)
+
+def remove_request_hook(hook: Callable[[RequestEvent], None]):
+    _request_hooks.remove(hook)
+
+def start_request_event(kind: str, api: ApiRecord, payload: any = None, **fields) -> RequestEvent:
+    # Events (and payload sizes) are only built when a hook is registered
+    if not _request_hooks:
+        return None
+
+    event = RequestEvent(kind, api, request_size=_payload_size(payload), started_at=Time.monotonic(), **fields)
+    _emit_request_event(event)
+
+    return event
+
+def finish_request_event(event: RequestEvent, headers: any = None, **fields):
+    if event is None:
+        return
+
+    event.phase = 'after'
+    event.duration = Time.monotonic() - event.started_at
+    event.usage = parse_usage_headers(headers) if headers else None
+
+    for name, value in fields.items():
+        setattr(event, name, value)
+
+    _emit_request_event(event)
+
+def _emit_request_event(event: RequestEvent):
+    for hook in list(_request_hooks):
+        hook(event)
+
+def _payload_size(payload: any) -> int:
+    if payload is None:
+        return 0
+
+    if isinstance(payload, (str, bytes)):
+        return len(payload)
+
+    return len(Json.dumps(payload, default=str))
+
+def request(api: ApiRecord, path: any = None, params: Mapping = None, method: str = 'GET', files: Mapping = None):
+    """
+    Makes a single Graph call. `files` are attached as multipart uploads, as
+    name -> open file or (filename, content) tuple.
+    """
+    if method == 'GET' and api.coalescer and not files:
+        # Identical reads made at the same time from other threads share one call
+        key = ('request', api.ad_account_id, api.access_token, Json.dumps([path or [], params or {}], sort_keys=True, default=str))
+        return api.coalescer.single_flight(key, lambda: _request(api, path, params, method))
+
+    return _request(api, path, params, method, files)
+
+def _request(api: ApiRecord, path: any, params: Mapping, method: str, files: Mapping = None):
+    # Pacing, hooks and cache invalidation happen in the record's PacedFacebookAdsApi
+    return api.service.call(method, path or [], params or {}, files=files).json()
+
+class PacedFacebookAdsApi(FacebookAdsApi):
+    """
+    One record's view of a FacebookAdsApi: every call it makes, including the
+    SDK object methods, cursors and batches given it, goes through that record's
+    RateGovernor, request hooks and cache invalidation. Calls are made by the
+    wrapped service, so records built on the same service share its session
+    but are each paced on their own.
+    """
+
+    def __init__(self, api: ApiRecord, service: FacebookAdsApi):
+        # A record built on another record's service wraps the unpaced one
+        service = getattr(service, 'unpaced_service', service)
+
+        super().__init__(service._session, api_version=service._api_version)
+
+        self.unpaced_service = service
+        self._record = api
+
+    def call(self, method, path, params=None, headers=None, files=None, url_override=None, api_version=None):
+        return _paced_call(self._record, self.unpaced_service.call, method, path, params, headers, files, url_override, api_version)
+
+def _paced_call(api: ApiRecord, call: Callable, method: str, path: any, params: Mapping, *args) -> FacebookResponse:
+    # Batch calls report their own 'batch' events and invalidate per operation
+    is_batch = method == 'POST' and not path and 'batch' in (params or {})
+
+    api.governor.wait()
+
+    event = None if is_batch else start_request_event('request', api, payload=params, method=method, path=path or [])
+
+    try:
+        response = call(method, path, params, *args)
+    except FacebookRequestError as error:
+        api.governor.observe(error.http_headers())
+
+        finish_request_event(
+            event,
+            headers=error.http_headers(),
+            status=error.http_status(),
+            error_code=error.api_error_code(),
+            response_size=_payload_size(error.body())
+        )
+        raise
+    except Exception as error:
+        # Connection errors and the like still close the event
+        finish_request_event(event, error=error)
+        raise
+
+    api.governor.observe(response.headers())
+
+    finish_request_event(
+        event,
+        headers=response.headers(),
+        status=response.status(),
+        response_size=_payload_size(response.body())
+    )
+
+    if method != 'GET' and not is_batch and api.cache:
+        api.cache.invalidate(object_id_from_path(path or []))
+
+    return response
+
+# Graph API rejects batch calls containing more than 50 operations
+MAX_BATCH_SIZE = 50
+
+# Number of batch calls that may be in flight at once for a single BatchRequest
+DEFAULT_BATCH_CONCURRENCY = 4
+
+# Graph API may leave some operations of a batch unanswered (null responses),
+# which the SDK hands back as a new batch to retry
+MAX_BATCH_ATTEMPTS = 3
+
+# Names of the operations a batch operation references with {result=<name>:<JSONPath>}
+BATCH_REFERENCE = re.compile(r'{result=([^:}]+):')
+
+# Failed operations that look transient are retried this many times, waiting
+# DEFAULT_RETRY_BACKOFF * 2 ** attempt seconds before each retry
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 1.0
+
+# https://developers.facebook.com/docs/graph-api/using-graph-api/error-handling
+# https://developers.facebook.com/docs/graph-api/overview/rate-limiting
+TRANSIENT_ERROR_CODES = frozenset([
+    1,  # Unknown error, please retry
+    2,  # Service temporarily unavailable
+    4,  # Application request limit reached
+    17,  # User request limit reached
+    32,  # Page request limit reached
+    341,  # Application limit reached
+    613,  # Calls to this API have exceeded the rate limit
+    80000, 80001, 80002, 80003, 80004, 80005, 80006, 80008, 80009, 80014,  # Business use case rate limits
+])
+
+# Graph reports reads asking for too much data with code 1 and a 500 status, but
+# sending the same read again fails the same way: ask for less instead
+TOO_MUCH_DATA_ERROR_MESSAGE = 'reduce the amount of data'
+
+def is_transient_failure(status: int, response: any) -> bool:
+    if is_too_much_data_failure(response):
+        return False
+
+    if status is None or status == 429 or status >= 500:
+        return True
+
+    error = response.get('error') if isinstance(response, Mapping) else None
+
+    if not error:
+        return False
+
+    return bool(error.get('is_transient')) or error.get('code') in TRANSIENT_ERROR_CODES
+
+def is_too_much_data_failure(response: any) -> bool:
+    error = response.get('error') if isinstance(response, Mapping) else None
+
+    return bool(error) and TOO_MUCH_DATA_ERROR_MESSAGE in str(error.get('message', '')).lower()
+
+class _BatchOperation:
+    method: str
+    path: any
+    params: Mapping
+    facebook_request: FacebookRequest
+    name: str
+    chunk: int
+
+    def __init__(
+            self,
+            method: str = None,
+            path: any = None,
+            params: Mapping = None,
+            facebook_request: FacebookRequest = None,
+            name: str = None,
+            chunk: int = 0
+        ):
+
+        self.method = method
+        self.path = path
+        self.params = params
+        self.facebook_request = facebook_request
+        self.name = name
+        self.chunk = chunk
+
+    def add_to_batch(self, batch: FacebookAdsApiBatch, success: Callable, failure: Callable):
+        if self.facebook_request:
+            call = batch.add_request(
+                request=self.facebook_request,
+                success=success,
+                failure=failure
+            )
+        else:
+            call = batch.add(
+                method=self.method,
+                relative_path=self.path,
+                params=self.params,
+                success=success,
+                failure=failure
+            )
+
+        if self.name:
+            # Named operations can be referenced by later operations of the same
+            # batch call with {result=<name>:<JSONPath>}. Graph omits their
+            # responses by default, but callers still want them.
+            call['name'] = self.name
+            call['omit_response_on_success'] = False
+
+        return call
+
+    @property
+    def object_id(self) -> str:
+        if self.facebook_request:
+            return self.facebook_request._node_id
+
+        return object_id_from_path(self.path)
+
+    @property
+    def is_write(self) -> bool:
+        if self.facebook_request:
+            return self.facebook_request._method != 'GET'
+
+        return self.method != 'GET'
+
+    def describe(self):
+        if self.facebook_request:
+            return self.facebook_request
+
+        return {
+            'method': self.method,
+            'path': self.path,
+            'params': self.params,
+        }
 
 class BatchRequest:
     _api: ApiRecord
-    _batch: FacebookAdsApiBatch
-    _success_responses = []
-    _failure_responses = []
+    _operations: List[_BatchOperation]
+    _max_batch_size: int
+    _max_workers: int
+    _max_retries: int
+    _retry_backoff: float
+    _chunk: int
+    _chunk_size: int
+
+    def __init__(
+            self,
+            api: ApiRecord,
+            max_batch_size: int = MAX_BATCH_SIZE,
+            max_workers: int = DEFAULT_BATCH_CONCURRENCY,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+            retry_backoff: float = DEFAULT_RETRY_BACKOFF
+        ):
+
+        assert 0 < max_batch_size <= MAX_BATCH_SIZE, 'Batch size must be between 1 and %d' % MAX_BATCH_SIZE
+        assert max_workers > 0, 'At least one worker is required'
+        assert max_retries >= 0, 'Retries cannot be negative'
 
-    def __init__(self, api: ApiRecord):
         self._api = api
-        self._batch = self._api.service.new_batch()
-
-    def request(self, path: any = None, params: Mapping = None, method: str = 'GET'):
-        self._batch.add(
+        self._operations = []
+        self._max_batch_size = max_batch_size
+        self._max_workers = max_workers
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._chunk = 0
+        self._chunk_size = 0
+
+    def __len__(self):
+        return len(self._operations)
+
+    def request(self, path: any = None, params: Mapping = None, method: str = 'GET', name: str = None):
+        self._add_operation(_BatchOperation(
             method=method,
-            relative_path=path or [],
+            path=path or [],
             params=params or {},
-            success=self._success_handler,
-            failure=self._failure_handler
-        )
+            name=name
+        ))
 
     def add_facebook_request(self, facebook_request: FacebookRequest):
-        self._batch.add_request(
-            request=facebook_request,
-            success=self._success_handler,
-            failure=self._failure_handler
-        )
+        self._add_operation(_BatchOperation(facebook_request=facebook_request))
+
+    def end_chunk(self):
+        """
+        Sends the operations queued from here on in a separate batch call from the
+        ones queued before, e.g. to keep named operations together with the
+        operations referencing them. Only the first attempt honors chunks, so
+        disable retries when operations reference each other.
+        """
+        if self._chunk_size:
+            self._chunk += 1
+            self._chunk_size = 0
 
     def perform(self):
-        if not self._batch:
-            return []
+        operations = self._operations
+        outcomes = self.perform_outcomes()
 
-        self._success_responses = []
-        self._failure_responses = []
+        failures = [outcome for outcome in outcomes if not outcome.success]
 
-        original_batch = self._batch
-        self._batch = self._batch.execute()
-
-        if len(self._failure_responses):
+        if len(failures):
             raise Exception('Failed to execute request fully', {
-                'requests': original_batch._requests,
-                'failures': [response.json() for response in self._failure_responses]
+                'requests': [operation.describe() for operation in operations],
+                'failures': [outcome.response for outcome in failures]
             })
 
-        return self._success_responses
+        return [outcome.response for outcome in outcomes]
+
+    def perform_outcomes(self) -> Sequence[BatchOutcome]:
+        """
+        Performs every queued operation and returns one outcome per operation, in
+        the order they were queued. Transient failures are retried with backoff
+        on just the failed operations; permanent failures are reported as-is.
+        """
+        operations = self._operations
+        self._operations = []
+
+        outcomes = [None] * len(operations)
+        pending = list(range(len(operations)))
+        attempt = 0
+
+        while pending:
+            if attempt:
+                Time.sleep(self._retry_backoff * 2 ** (attempt - 1))
+
+            attempt += 1
+            retry = []
+
+            # Retried operations are packed densely rather than in their original chunks
+            results = self._execute_operations(
+                [operations[index] for index in pending],
+                keep_chunks=attempt == 1,
+                attempt=attempt
+            )
+
+            for index, (is_success, response) in zip(pending, results):
+                status = response.status() if response else None
+                body = response.json() if response else None
+
+                outcomes[index] = BatchOutcome(
+                    success=is_success,
+                    status=status,
+                    response=body,
+                    attempts=attempt
+                )
+
+                if not is_success and attempt <= self._max_retries and is_transient_failure(status, body):
+                    retry.append(index)
+
+            pending = retry
+
+        if self._api.cache:
+            # Objects written through the batch may have changed whether or not the write succeeded
+            self._api.cache.invalidate(*[
+                operation.object_id
+                for operation in operations
+                if operation.is_write
+            ])
+
+        return outcomes
 
     @classmethod
-    def perform_from_facebook_requests(cls, api: ApiRecord, facebook_requests: Iterable[FacebookRequest]):
-        batch = cls(api)
+    def perform_from_facebook_requests(cls, api: ApiRecord, facebook_requests: Iterable[FacebookRequest], **kwargs):
+        batch = cls(api, **kwargs)
 
         for facebook_request in facebook_requests:
             batch.add_facebook_request(facebook_request)
 
         return batch.perform()
 
-    def _success_handler(self, response):
-        self._success_responses.append(response.json())
+    @classmethod
+    def perform_outcomes_from_facebook_requests(cls, api: ApiRecord, facebook_requests: Iterable[FacebookRequest], **kwargs) -> Sequence[BatchOutcome]:
+        batch = cls(api, **kwargs)
 
-    def _failure_handler(self, failure_response):
-        self._failure_responses.append(failure_response)
+        for facebook_request in facebook_requests:
+            batch.add_facebook_request(facebook_request)
+
+        return batch.perform_outcomes()
+
+    def _add_operation(self, operation: _BatchOperation):
+        if self._chunk_size == self._max_batch_size:
+            self.end_chunk()
+
+        operation.chunk = self._chunk
+        self._operations.append(operation)
+        self._chunk_size += 1
+
+    def _execute_operations(
+            self,
+            operations: Sequence[_BatchOperation],
+            keep_chunks: bool = True,
+            attempt: int = 1
+        ) -> List[Tuple[bool, FacebookResponse]]:
+
+        chunks = []
+
+        for operation in operations:
+            if (
+                not chunks
+                or len(chunks[-1]) == self._max_batch_size
+                or (keep_chunks and chunks[-1][-1].chunk != operation.chunk)
+            ):
+                chunks.append([])
+
+            chunks[-1].append(operation)
+
+        if len(chunks) == 1:
+            return self._execute_chunk(chunks[0], attempt)
+
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(chunks))) as executor:
+            # map() yields in submission order, so responses stay aligned with operations
+            return [
+                result
+                for results in executor.map(self._execute_chunk, chunks, [attempt] * len(chunks))
+                for result in results
+            ]
+
+    def _execute_chunk(self, operations: Sequence[_BatchOperation], attempt: int = 1) -> List[Tuple[bool, FacebookResponse]]:
+        # Operations without an answer are reported as failures with no response
+        responses = [(False, None)] * len(operations)
+
+        # Sizes, failures and the latest usage headers of the batch call in flight
+        call_stats = {}
+
+        def handler(index: int, is_success: bool):
+            def handle(response):
+                self._api.governor.observe(response.headers())
+                responses[index] = (is_success, response)
+
+                call_stats['response_size'] = call_stats.get('response_size', 0) + _payload_size(response.body())
+                call_stats['failures'] = call_stats.get('failures', 0) + (not is_success)
+                call_stats['headers'] = response.headers() or call_stats.get('headers')
+
+            return handle
+
+        batch = self._api.service.new_batch()
+
+        for index, operation in enumerate(operations):
+            operation.add_to_batch(
+                batch,
+                success=handler(index, True),
+                failure=handler(index, False)
+            )
+
+        attempts = 0
+        while batch and attempts < MAX_BATCH_ATTEMPTS:
+            call_stats.clear()
+            event = start_request_event(
+                'batch',
+                self._api,
+                payload=batch._batch,
+                method='POST',
+                path=[],
+                attempt=attempt,
+                operations=len(batch)
+            )
+
+            try:
+                batch = _without_orphaned_references(batch.execute())
+            except FacebookRequestError as error:
+                finish_request_event(
+                    event,
+                    headers=error.http_headers(),
+                    status=error.http_status(),
+                    error_code=error.api_error_code(),
+                    response_size=_payload_size(error.body()),
+                    failures=event.operations if event else None
+                )
+
+                # The batch call itself failed, so every unanswered operation shares its error
+                failure_response = FacebookResponse(
+                    body=Json.dumps(error.body()),
+                    http_status=error.http_status(),
+                    headers=error.http_headers()
+                )
+
+                responses = [
+                    (is_success, response or failure_response)
+                    for is_success, response in responses
+                ]
+                break
+            except Exception as error:
+                # Connection errors and the like leave the unanswered operations
+                # failed without a response, which is retried as transient
+                finish_request_event(event, error=error, failures=event.operations if event else None)
+                break
+
+            finish_request_event(
+                event,
+                headers=call_stats.get('headers'),
+                status=200,
+                response_size=call_stats.get('response_size', 0),
+                failures=call_stats.get('failures', 0) + (len(batch) if batch else 0)
+            )
+
+            attempts += 1
+
+        return responses
+
+def _without_orphaned_references(batch: FacebookAdsApiBatch) -> FacebookAdsApiBatch:
+    """
+    The SDK resends the operations of a batch call that got no response, but
+    not the named operations they may reference, which already answered. Those
+    references would fail, so such operations are left out and reported
+    unanswered, for callers to retry with the referenced results filled in.
+    """
+    if not batch:
+        return batch
+
+    names = {call.get('name') for call in batch._batch}
+    kept = [
+        index
+        for index, call in enumerate(batch._batch)
+        if set(BATCH_REFERENCE.findall(unquote(Json.dumps(call, default=str)))) <= names
+    ]
+
+    if len(kept) == len(batch._batch):
+        return batch
+
+    if not kept:
+        return None
+
+    for attribute in ('_batch', '_files', '_success_callbacks', '_failure_callbacks'):
+        setattr(batch, attribute, [getattr(batch, attribute)[index] for index in kept])
+
+    return batch
+
+# Graph API accepts at most 50 IDs per ?ids= request
+MAX_IDS_PER_REQUEST = 50
+
+def request_by_ids(
+        api: ApiRecord,
+        ids: Sequence[str],
+        fields: Iterable[str] = None,
+        max_ids: int = MAX_IDS_PER_REQUEST,
+        max_workers: int = DEFAULT_BATCH_CONCURRENCY
+) -> Sequence[Mapping]:
+    """
+    Fetches many objects with as few GET /?ids=a,b,c calls as possible, each
+    sent as one operation of a (chunked, concurrent) batch. Repeated IDs are
+    fetched once and results come back in the order of `ids`.
+    """
+    assert 0 < max_ids <= MAX_IDS_PER_REQUEST, 'IDs per request must be between 1 and %d' % MAX_IDS_PER_REQUEST
+
+    unique_ids = [str(id) for id in dict.fromkeys(ids)]
+
+    if not unique_ids:
+        return []
+
+    params = {'fields': ','.join(fields)} if fields else {}
+    batch = BatchRequest(api, max_workers=max_workers)
+
+    for offset in range(0, len(unique_ids), max_ids):
+        batch.request(path='', params={
+            **params,
+            'ids': ','.join(unique_ids[offset:offset + max_ids]),
+        })
+
+    objects = {}
+
+    for response in batch.perform():
+        objects.update(response)
+
+    missing_ids = [id for id in unique_ids if id not in objects]
+
+    if missing_ids:
+        raise Exception('Objects missing from response', {'ids': missing_ids})
+
+    return [objects[str(id)] for id in ids]
 
 def request_all_pages(api: ApiRecord, next_request_builder, path: any = None, params: Mapping = None, sleep: float = 0.0, method: str = 'GET'):
-    response = request(api=api, path=path, params=params, method=method)
+    return list(iterate_rows(iterate_pages(
+        api=api,
+        next_request_builder=next_request_builder,
+        path=path,
+        params=params,
+        sleep=sleep,
+        method=method
+    )))
 
-    assert 'data' in response, 'No data available from response'
-    assert 'paging' in response, 'No paging data available from response'
+def request_all_pages_from_response(api: ApiRecord, response: any, sleep: float = 0.0):
+    return list(iterate_rows(iterate_pages_from_response(api=api, response=response, sleep=sleep)))
+
+def iterate_pages(
+        api: ApiRecord,
+        next_request_builder: Callable[[Mapping], Mapping],
+        path: any = None,
+        params: Mapping = None,
+        sleep: float = 0.0,
+        method: str = 'GET',
+        after: str = None,
+        prefetch: bool = False
+) -> Iterator[Mapping]:
+    """
+    Yields each page response as it arrives. Pass the `after` cursor of the last
+    processed page (see get_after_cursor) to resume a walk. With prefetch, the
+    next page is requested while the caller is still processing the current one.
+    """
+    params = dict(params or {})
+
+    if after:
+        params['after'] = after
+
+    def fetch_first():
+        return request(api=api, path=path, params=params, method=method)
+
+    def fetch_next(response):
+        return request(**{
+            'api': api,
+            **next_request_builder(response),
+        })
+
+    return _walk_pages(
+        _observe_page_fetches(api, path, fetch_first),
+        _observe_page_fetches(api, path, fetch_next),
+        sleep,
+        prefetch
+    )
+
+def iterate_pages_from_response(api: ApiRecord, response: any, sleep: float = 0.0, prefetch: bool = False) -> Iterator[Mapping]:
+    next_url = response.get('paging', {}).get('next')
+
+    return _walk_pages(
+        lambda: response,
+        _observe_page_fetches(api, next_url, _fetch_next_page_builder(api)),
+        sleep,
+        prefetch
+    )
+
+def iterate_pages_from_url(api: ApiRecord, url: str, sleep: float = 0.0, prefetch: bool = False) -> Iterator[Mapping]:
+    """
+    Resumes a walk from a saved paging `next` URL.
+    """
+    return _walk_pages(
+        _observe_page_fetches(api, url, lambda: request(api=api, path=url)),
+        _observe_page_fetches(api, url, _fetch_next_page_builder(api)),
+        sleep,
+        prefetch
+    )
+
+def iterate_rows(pages: Iterable[Mapping]) -> Iterator[any]:
+    for page in pages:
+        yield from page['data']
+
+def expand_edge(edge: str, fields: Iterable[str], limit: int = None, filtering: Sequence[Mapping] = None) -> str:
+    """
+    Returns the field reading `edge` of each requested object inline, e.g.
+    adsets.limit(100){name,ads.limit(100){name}}, optionally filtered like the
+    edge's `filtering` parameter. Read the rows of an expanded edge, and any
+    pages past the first, with iterate_expanded_edge.
+    """
+    modifiers = '.limit(%d)' % limit if limit else ''
+
+    if filtering:
+        modifiers += '.filtering(%s)' % Json.dumps(filtering, separators=(',', ':'))
+
+    return '%s%s{%s}' % (edge, modifiers, ','.join(fields))
+
+def iterate_expanded_edge(api: ApiRecord, edge: Mapping) -> Iterator[Mapping]:
+    # Graph leaves out expanded edges that have no objects
+    if not edge:
+        return iter([])
+
+    return iterate_rows(iterate_pages_from_response(api, edge))
+
+def get_after_cursor(page: Mapping) -> str:
+    return page.get('paging', {}).get('cursors', {}).get('after')
+
+def _fetch_next_page_builder(api: ApiRecord):
+    def fetch_next(response):
+        return request(
+            api=api,
+            path=response['paging']['next']
+        )
 
-    data = response['data']
+    return fetch_next
 
-    while 'next' in response['paging']:
-        Time.sleep(sleep)
+def _observe_page_fetches(api: ApiRecord, path: any, fetch: Callable[..., Mapping]) -> Callable[..., Mapping]:
+    def observed_fetch(*args):
+        event = start_request_event('page', api, method='GET', path=path)
 
-        next_request = {
-            'api': api,
-            **next_request_builder(response),
-        }
+        try:
+            page = fetch(*args)
+        except Exception as error:
+            finish_request_event(event, error=error)
+            raise
 
-        response = request(**next_request)
+        finish_request_event(event, rows=len(page.get('data') or []))
 
-        assert 'data' in response, 'No data available from paginated response'
-        assert 'paging' in response, 'No paging data available from paginated response'
+        return page
 
-        data = data + response['data']
+    return observed_fetch
 
-    return data
+def _fetch_page_after_sleep(fetch_next: Callable[[Mapping], Mapping], response: Mapping, sleep: float):
+    Time.sleep(sleep)
+    return fetch_next(response)
+
+def _walk_pages(
+        fetch_first: Callable[[], Mapping],
+        fetch_next: Callable[[Mapping], Mapping],
+        sleep: float,
+        prefetch: bool
+) -> Iterator[Mapping]:
+
+    response = fetch_first()
 
-def request_all_pages_from_response(api: ApiRecord, response: any, sleep: float = 0.0):
     assert 'data' in response, 'No data available from response'
     assert 'paging' in response, 'No paging data available from response'
 
-    data = response['data']
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
 
-    while 'next' in response['paging']:
-        Time.sleep(sleep)
+    try:
+        while True:
+            has_next = 'next' in response['paging']
+            next_response = None
 
-        response = request(
-            api=api,
-            path=response['paging']['next']
-        )
+            if has_next and executor:
+                next_response = executor.submit(_fetch_page_after_sleep, fetch_next, response, sleep)
 
-        assert 'data' in response, 'No data available from paginated response'
-        assert 'paging' in response, 'No paging data available from paginated response'
+            yield response
 
-        data = data + response['data']
+            if not has_next:
+                return
 
-    return data
+            if next_response:
+                response = next_response.result()
+            else:
+                response = _fetch_page_after_sleep(fetch_next, response, sleep)
 
+            assert 'data' in response, 'No data available from paginated response'
+            assert 'paging' in response, 'No paging data available from paginated response'
+    finally:
+        if executor:
+            # Don't block a caller that stops iterating early on an in-flight prefetch
+            executor.shutdown(wait=False)
@@ -0,0 +1,969 @@
+import email.policy
+import hashlib
+import json as Json
+import re
+import socket
+import threading
+import time as Time
+from collections import deque
+from datetime import date, datetime, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Callable, Mapping, Sequence, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, unquote
+
+from facebookads import FacebookAdsApi
+from facebookads.session import FacebookSession
+
+from fbadhelpers.caching import ObjectCache
+from fbadhelpers.coalescing import RequestCoalescer
+from fbadhelpers.records import ApiRecord
+from fbadhelpers.throttling import RateGovernor, AD_ACCOUNT_USAGE_HEADER
+
+DEFAULT_API_VERSION = 'v2.11'
+DEFAULT_PAGE_SIZE = 25
+
+# Bytes the server asks for in each chunk of a video upload
+DEFAULT_VIDEO_CHUNK_SIZE = 1024 * 1024
+
+# Edges an object lists its children under, by the type of the children
+EDGES_BY_TYPE = {
+    'campaign': 'campaigns',
+    'adset': 'adsets',
+    'ad': 'ads',
+    'adcreative': 'adcreatives',
+}
+
+# Fields pointing a created object to its parents besides the ad account
+PARENT_FIELDS = ('campaign_id', 'adset_id')
+
+# Effective statuses listings leave out by default
+HIDDEN_STATUSES = frozenset(['ARCHIVED', 'DELETED'])
+
+# Metrics every object reports for each day of an insights report
+DAILY_INSIGHTS = {
+    'impressions': 100,
+    'clicks': 4,
+    'spend': 1.25,
+    'actions': {'link_click': 3},
+}
+
+
+class FakeGraphError(Exception):
+    def __init__(self, status: int, code: int, message: str, is_transient: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.is_transient = is_transient
+
+    def body(self) -> Mapping:
+        return {
+            'error': {
+                'message': self.message,
+                'type': 'OAuthException',
+                'code': self.code,
+                'is_transient': self.is_transient,
+            }
+        }
+
+class FakeGraphServer:
+    """
+    A local, in-memory stand-in for the parts of the Graph API the helpers use:
+    object reads and updates, paged edges, ?ids= lookups, creating campaigns,
+    ad sets, ads and creatives, ad set copies, image and chunked video uploads,
+    async insights report runs and batch calls with result references. Latency,
+    page size, the batch limit, the objects a read may expand, the days a report
+    run may cover and rate limiting can be configured to simulate realistic conditions.
+
+        with FakeGraphServer(latency=0.05) as server:
+            server.seed_ad_account('act_1', campaigns=10, ad_sets=1000, ads=10000)
+            api = server.create_api('act_1')
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            operation_latency: float = 0.0,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            max_batch_size: int = 50,
+            max_ids: int = 50,
+            max_expanded_objects: int = None,
+            max_report_days: int = None,
+            report_run_polls: int = 1,
+            call_limit: int = None,
+            usage_window: float = 60.0,
+            api_version: str = DEFAULT_API_VERSION,
+            video_chunk_size: int = DEFAULT_VIDEO_CHUNK_SIZE,
+            port: int = 0
+        ):
+
+        self.latency = latency
+        self.operation_latency = operation_latency
+        self.page_size = page_size
+        self.max_batch_size = max_batch_size
+        self.max_ids = max_ids
+        self.max_expanded_objects = max_expanded_objects
+        self.max_report_days = max_report_days
+        self.report_run_polls = report_run_polls
+        self.call_limit = call_limit
+        self.usage_window = usage_window
+        self.api_version = api_version
+        self.video_chunk_size = video_chunk_size
+
+        self.http_calls = 0
+        self.operations = 0
+        self.uploaded_bytes = 0
+
+        self._lock = threading.RLock()
+        self._ids = count(100000000000000)
+        self._objects = {}
+        self._children = {}
+        self._call_times = {}
+        self._video_uploads = {}
+        self._report_runs = {}
+        self._failures = []
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _build_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self) -> 'FakeGraphServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def create_api(
+            self,
+            ad_account_id: str = 'act_1',
+            governor: RateGovernor = None,
+            cache: ObjectCache = None,
+            coalescer: RequestCoalescer = None
+    ) -> ApiRecord:
+
+        session = FacebookSession(access_token='fake-access-token')
+        session.GRAPH = self.url
+
+        return ApiRecord(
+            service=FacebookAdsApi(session, api_version=self.api_version),
+            access_token='fake-access-token',
+            business_id='1',
+            ad_account_id=ad_account_id,
+            timezone='UTC',
+            namespace='fake',
+            governor=governor,
+            cache=cache,
+            coalescer=coalescer
+        )
+
+    def reset_counters(self):
+        with self._lock:
+            self.http_calls = 0
+            self.operations = 0
+            self.uploaded_bytes = 0
+
+    def fail_operations(self, match: Callable[[str, Sequence[str], Mapping], bool], times: int = 1, respond_null: bool = False):
+        """
+        Makes the next `times` operations match(method, path, params) accepts
+        fail with a transient error or, with respond_null, go unanswered in
+        their batch call (a null response), as operations Graph timed out on do.
+        """
+        with self._lock:
+            self._failures.append([match, times, respond_null])
+
+    def add_object(self, object_type: str, fields: Mapping, ad_account_id: str = None) -> str:
+        with self._lock:
+            object_id = str(fields.get('id') or next(self._ids))
+
+            self._objects[object_id] = {
+                'type': object_type,
+                'ad_account_id': ad_account_id,
+                'fields': _touch({**fields, 'id': object_id}, keep_updated_time=True),
+            }
+
+            edge = EDGES_BY_TYPE.get(object_type)
+
+            if edge:
+                parent_ids = [ad_account_id] + [str(fields[name]) for name in PARENT_FIELDS if fields.get(name)]
+
+                for parent_id in parent_ids:
+                    self._children.setdefault((parent_id, edge), []).append(object_id)
+
+            return object_id
+
+    def get_object(self, object_id: str) -> Mapping:
+        with self._lock:
+            stored = self._objects.get(str(object_id))
+            return dict(stored['fields']) if stored else None
+
+    def seed_ad_account(
+            self,
+            ad_account_id: str = 'act_1',
+            campaigns: int = 10,
+            ad_sets: int = 100,
+            ads: int = 1000,
+            ad_creatives: int = 50
+    ) -> Mapping[str, Sequence[str]]:
+        """
+        Fills an ad account with objects spread evenly over their parents and
+        returns their IDs by type.
+        """
+        self.add_object('adaccount', {
+            'id': ad_account_id,
+            'account_id': ad_account_id[len('act_'):],
+            'name': 'Ad account %s' % ad_account_id,
+            'timezone_name': 'UTC',
+        })
+
+        campaign_ids = [
+            self.add_object('campaign', {
+                'name': 'Campaign %d' % index,
+                'status': 'PAUSED',
+                'objective': 'LINK_CLICKS',
+                'account_id': ad_account_id[len('act_'):],
+                'updated_time': '2018-01-01T00:00:00+0000',
+            }, ad_account_id)
+            for index in range(campaigns)
+        ]
+
+        ad_set_ids = [
+            self.add_object('adset', {
+                'name': 'Ad set %d' % index,
+                'status': 'PAUSED',
+                'campaign_id': campaign_ids[index % campaigns],
+                'daily_budget': '1000',
+                'updated_time': '2018-01-01T00:00:00+0000',
+            }, ad_account_id)
+            for index in range(ad_sets)
+        ]
+
+        ad_creative_ids = [
+            self.add_object('adcreative', {
+                'name': 'Creative %d' % index,
+                'object_story_id': '1_%d' % index,
+                'effective_object_story_id': '1_%d' % index,
+            }, ad_account_id)
+            for index in range(ad_creatives)
+        ]
+
+        ad_ids = []
+
+        for index in range(ads):
+            ad_set = self._objects[ad_set_ids[index % ad_sets]]['fields']
+
+            ad_ids.append(self.add_object('ad', {
+                'name': 'Ad %d' % index,
+                'status': 'ACTIVE',
+                'adset_id': ad_set['id'],
+                'campaign_id': ad_set['campaign_id'],
+                'creative': {'id': ad_creative_ids[index % ad_creatives]},
+                'updated_time': '2018-01-01T00:00:00+0000',
+            }, ad_account_id))
+
+        return {
+            'campaigns': campaign_ids,
+            'adsets': ad_set_ids,
+            'ads': ad_ids,
+            'adcreatives': ad_creative_ids,
+        }
+
+    def handle_http(self, method: str, url: str, params: Mapping[str, str], files: Mapping[str, Tuple[str, bytes]] = None) -> Tuple[int, Mapping, any]:
+        with self._lock:
+            self.http_calls += 1
+
+        Time.sleep(self.latency)
+
+        path = self._graph_path(url)
+
+        try:
+            if method == 'POST' and path == [] and 'batch' in params:
+                return 200, self._usage_headers(params), self._handle_batch(Json.loads(params['batch']), params)
+
+            self._count_call(params)
+            self._raise_injected_failure(method, path, params)
+
+            return 200, self._usage_headers(params), self._handle(method, path, params, files or {})
+        except FakeGraphError as error:
+            return error.status, self._usage_headers(params), error.body()
+
+    def _handle_batch(self, operations: Sequence[Mapping], params: Mapping) -> Sequence[Mapping]:
+        if len(operations) > self.max_batch_size:
+            raise FakeGraphError(400, 100, 'Too many requests in batch message. Maximum batch size is %d' % self.max_batch_size)
+
+        named_results = {}
+        responses = []
+
+        for operation in operations:
+            Time.sleep(self.operation_latency)
+
+            try:
+                parsed = urlparse('/' + operation['relative_url'].lstrip('/'))
+                operation_params = {
+                    name: _resolve_references(value, named_results)
+                    for name, value in [*parse_qsl(parsed.query), *parse_qsl(operation.get('body') or '')]
+                }
+
+                operation_path = self._graph_path(_resolve_references(unquote(parsed.path), named_results))
+
+                self._count_call(params)
+
+                if self._raise_injected_failure(operation['method'].upper(), operation_path, operation_params):
+                    responses.append(None)
+                    continue
+
+                status, result = 200, self._handle(
+                    operation['method'].upper(),
+                    operation_path,
+                    {'access_token': params.get('access_token'), **operation_params}
+                )
+            except FakeGraphError as error:
+                status, result = error.status, error.body()
+
+            if operation.get('name') and status == 200:
+                named_results[operation['name']] = result
+
+                # Graph leaves named results out unless asked for them
+                if operation.get('omit_response_on_success', True):
+                    responses.append(None)
+                    continue
+
+            responses.append({
+                'code': status,
+                'headers': [
+                    {'name': name, 'value': value}
+                    for name, value in self._usage_headers(params).items()
+                ],
+                'body': Json.dumps(result),
+            })
+
+        return responses
+
+    def _handle(self, method: str, path: Sequence[str], params: Mapping[str, str], files: Mapping[str, Tuple[str, bytes]] = None) -> any:
+        with self._lock:
+            self.operations += 1
+            self.uploaded_bytes += sum(len(content) for _, content in (files or {}).values())
+
+            if method == 'GET' and not path:
+                return self._get_by_ids(params)
+
+            if method == 'GET' and len(path) == 1:
+                if path[0] in self._report_runs:
+                    self._advance_report_run(path[0])
+
+                return self._render(self._require(path[0]), params.get('fields'))
+
+            if method == 'GET' and len(path) == 2 and path[0] in self._report_runs and path[1] == 'insights':
+                return self._get_report_rows(path[0], params)
+
+            if method == 'GET' and len(path) == 2:
+                return self._check_expanded_objects(self._get_edge(path[0], path[1], params))
+
+            if method == 'POST' and len(path) == 1:
+                stored = self._require(path[0])
+                stored['fields'].update(_decode_params(params))
+                _touch(stored['fields'])
+                return {'success': True}
+
+            if method == 'POST' and len(path) == 2 and path[1] == 'copies':
+                return {'copied_adset_id': self._copy_ad_set(path[0], params)}
+
+            if method == 'POST' and len(path) == 2 and path[1] == 'adimages':
+                return {'images': self._upload_images(path[0], files)}
+
+            if method == 'POST' and len(path) == 2 and path[1] == 'advideos':
+                return self._upload_video(path[0], params, files)
+
+            if method == 'POST' and len(path) == 2 and path[1] == 'insights':
+                return {'report_run_id': self._start_report_run(path[0], params)}
+
+            if method == 'POST' and len(path) == 2 and path[1] in EDGES_BY_TYPE.values():
+                return {'id': self._create(path[0], path[1], params)}
+
+            if method == 'DELETE' and len(path) == 1:
+                self._require(path[0])
+                del self._objects[path[0]]
+                return {'success': True}
+
+        raise FakeGraphError(400, 100, 'Unsupported request: %s /%s' % (method, '/'.join(path)))
+
+    def _get_by_ids(self, params: Mapping[str, str]) -> Mapping:
+        ids = [id for id in params.get('ids', '').split(',') if id]
+
+        if not ids:
+            raise FakeGraphError(400, 100, 'The parameter ids is required')
+
+        if len(ids) > self.max_ids:
+            raise FakeGraphError(400, 100, 'Too many IDs. Maximum: %d' % self.max_ids)
+
+        return self._check_expanded_objects({id: self._render(self._require(id), params.get('fields')) for id in ids})
+
+    def _check_expanded_objects(self, response: Mapping) -> Mapping:
+        if self.max_expanded_objects and _count_objects(response) > self.max_expanded_objects:
+            raise FakeGraphError(500, 1, "Please reduce the amount of data you're asking for, then retry your request")
+
+        return response
+
+    def _get_edge(self, parent_id: str, edge: str, params: Mapping[str, str], limit: int = None) -> Mapping:
+        self._require(parent_id)
+
+        child_ids = [id for id in self._children.get((parent_id, edge), []) if id in self._objects]
+        child_ids = _filter_children([self._objects[id]['fields'] for id in child_ids], params.get('filtering'))
+
+        return self._page(parent_id, edge, child_ids, params, limit, lambda id: self._render(self._objects[id], params.get('fields')))
+
+    def _page(self, parent_id: str, edge: str, items: Sequence, params: Mapping[str, str], limit: int, render: Callable) -> Mapping:
+        offset = int(params.get('after') or 0)
+        limit = limit or int(params.get('limit') or self.page_size)
+        page_items = items[offset:offset + limit]
+
+        page = {
+            'data': [render(item) for item in page_items],
+            'paging': {
+                'cursors': {
+                    'before': str(offset),
+                    'after': str(offset + len(page_items)),
+                },
+            },
+        }
+
+        if offset + limit < len(items):
+            next_params = {
+                name: value
+                for name, value in params.items()
+                if name in ('fields', 'limit', 'filtering')
+            }
+
+            page['paging']['next'] = '%s/%s/%s/%s?%s' % (
+                self.url,
+                self.api_version,
+                parent_id,
+                edge,
+                urlencode({**next_params, 'limit': limit, 'after': offset + limit})
+            )
+
+        return page
+
+    def _render(self, stored: Mapping, fields: str = None) -> Mapping:
+        data = stored['fields']
+
+        if not fields:
+            return {'id': data['id'], 'name': data['name']} if 'name' in data else {'id': data['id']}
+
+        rendered = {'id': data['id']}
+
+        for field, subfields, limit, filtering in _parse_fields(fields):
+            reference = data.get(field)
+
+            if subfields and isinstance(reference, Mapping) and str(reference.get('id')) in self._objects:
+                # Fields referencing another object, like an ad's creative, expand to it
+                rendered[field] = self._render(self._objects[str(reference['id'])], subfields)
+            elif field in data:
+                rendered[field] = data[field]
+            elif (data['id'], field) in self._children:
+                # Edges requested as fields are expanded inline, like Graph's field expansion
+                edge_params = {'fields': subfields or '', 'filtering': filtering} if filtering else {'fields': subfields or ''}
+                rendered[field] = self._get_edge(data['id'], field, edge_params, limit=limit)
+
+        return rendered
+
+    def _create(self, ad_account_id: str, edge: str, params: Mapping[str, str]) -> str:
+        self._require(ad_account_id)
+
+        object_type = next(object_type for object_type, type_edge in EDGES_BY_TYPE.items() if type_edge == edge)
+        fields = _decode_params(params)
+
+        for name in PARENT_FIELDS:
+            if name in fields:
+                self._require(str(fields[name]))
+
+        if object_type == 'ad':
+            creative = fields.get('creative') or {}
+            creative_id = str(creative.get('creative_id') or creative.get('id') or '')
+
+            self._require(creative_id)
+            fields['creative'] = {'id': creative_id}
+            fields.setdefault('campaign_id', self._objects[str(fields['adset_id'])]['fields'].get('campaign_id'))
+
+        return self.add_object(object_type, fields, ad_account_id)
+
+    def _copy_ad_set(self, ad_set_id: str, params: Mapping[str, str]) -> str:
+        source = self._require(ad_set_id)
+        options = _decode_params(params)
+
+        fields = {
+            **{name: value for name, value in source['fields'].items() if name != 'id'},
+            'campaign_id': str(options.get('campaign_id') or source['fields'].get('campaign_id')),
+            'status': options.get('status_option', 'PAUSED'),
+            'effective_status': options.get('status_option', 'PAUSED'),
+            'updated_time': None,
+        }
+
+        copied_ad_set_id = self.add_object('adset', fields, source['ad_account_id'])
+
+        if str(options.get('deep_copy')).lower() == 'true':
+            for ad_id in list(self._children.get((ad_set_id, 'ads'), [])):
+                ad = self._objects.get(ad_id)
+
+                if ad:
+                    self.add_object('ad', {
+                        **{name: value for name, value in ad['fields'].items() if name != 'id'},
+                        'adset_id': copied_ad_set_id,
+                        'campaign_id': fields['campaign_id'],
+                        'updated_time': None,
+                    }, source['ad_account_id'])
+
+        return copied_ad_set_id
+
+    def _upload_images(self, ad_account_id: str, files: Mapping[str, Tuple[str, bytes]]) -> Mapping[str, Mapping]:
+        self._require(ad_account_id)
+
+        if not files:
+            raise FakeGraphError(400, 100, 'No image file was attached')
+
+        images = {}
+
+        for name, (filename, content) in files.items():
+            # Graph's image hashes are the MD5 of the image
+            image_hash = hashlib.md5(content).hexdigest()
+
+            self.add_object('adimage', {
+                'id': '%s:%s' % (ad_account_id[len('act_'):], image_hash),
+                'hash': image_hash,
+                'name': filename,
+            }, ad_account_id)
+
+            images[name] = {'hash': image_hash, 'url': '%s/images/%s' % (self.url, image_hash)}
+
+        return images
+
+    def _upload_video(self, ad_account_id: str, params: Mapping[str, str], files: Mapping[str, Tuple[str, bytes]]) -> Mapping:
+        self._require(ad_account_id)
+        phase = params.get('upload_phase')
+
+        if phase == 'start':
+            upload = {
+                'video_id': str(next(self._ids)),
+                'file_size': int(params['file_size']),
+                'content': bytearray(),
+            }
+
+            upload_session_id = str(next(self._ids))
+            self._video_uploads[upload_session_id] = upload
+
+            return {
+                'upload_session_id': upload_session_id,
+                'video_id': upload['video_id'],
+                **self._next_video_chunk(upload),
+            }
+
+        upload = self._video_uploads.get(params.get('upload_session_id'))
+
+        if upload is None:
+            raise FakeGraphError(400, 6001, 'Upload session not found or expired')
+
+        if phase == 'transfer':
+            if int(params.get('start_offset', -1)) != len(upload['content']):
+                raise FakeGraphError(400, 6001, 'Chunk does not start at offset %d' % len(upload['content']))
+
+            upload['content'] += files['video_file_chunk'][1]
+
+            return self._next_video_chunk(upload)
+
+        if phase == 'finish':
+            if len(upload['content']) != upload['file_size']:
+                raise FakeGraphError(400, 6001, 'Upload is missing %d bytes' % (upload['file_size'] - len(upload['content'])))
+
+            del self._video_uploads[params['upload_session_id']]
+
+            self.add_object('advideo', {
+                'id': upload['video_id'],
+                'title': params.get('title'),
+                'length': len(upload['content']),
+            }, ad_account_id)
+
+            return {'success': True}
+
+        raise FakeGraphError(400, 100, 'Unsupported upload phase: %s' % phase)
+
+    def _next_video_chunk(self, upload: Mapping) -> Mapping[str, str]:
+        start_offset = len(upload['content'])
+        end_offset = min(start_offset + self.video_chunk_size, upload['file_size'])
+
+        return {'start_offset': str(start_offset), 'end_offset': str(end_offset)}
+
+    def _start_report_run(self, ad_account_id: str, params: Mapping[str, str]) -> str:
+        self._require(ad_account_id)
+
+        options = _decode_params(params)
+        time_range = options.get('time_range') or {}
+
+        if not time_range:
+            raise FakeGraphError(400, 100, 'The fake server only runs reports over a time_range')
+
+        report_run_id = self.add_object('adreportrun', {
+            'account_id': ad_account_id[len('act_'):],
+            'async_status': 'Job Not Started',
+            'async_percent_completion': 0,
+            'date_start': time_range['since'],
+            'date_stop': time_range['until'],
+        }, ad_account_id)
+
+        self._report_runs[report_run_id] = {
+            'ad_account_id': ad_account_id,
+            'options': options,
+            'polls': self.report_run_polls,
+        }
+
+        return report_run_id
+
+    def _advance_report_run(self, report_run_id: str):
+        # Each read of a report run moves it along, finishing once it was seen running often enough
+        report_run = self._report_runs[report_run_id]
+        fields = self._objects[report_run_id]['fields']
+
+        if fields['async_status'] not in ('Job Not Started', 'Job Running'):
+            return
+
+        if report_run['polls']:
+            report_run['polls'] -= 1
+            fields.update({'async_status': 'Job Running', 'async_percent_completion': 50})
+        elif self.max_report_days is not None and _days_between(fields['date_start'], fields['date_stop']) > self.max_report_days:
+            fields.update({'async_status': 'Job Failed', 'async_percent_completion': 50})
+        else:
+            fields.update({'async_status': 'Job Completed', 'async_percent_completion': 100})
+
+    def _get_report_rows(self, report_run_id: str, params: Mapping[str, str]) -> Mapping:
+        report_run = self._report_runs[report_run_id]
+        fields = self._objects[report_run_id]['fields']
+
+        if fields['async_status'] != 'Job Completed':
+            raise FakeGraphError(400, 100, 'Report run %s has not completed' % report_run_id)
+
+        rows = _insights_rows(
+            [self._objects[report_run['ad_account_id']]] + [
+                stored
+                for stored in self._objects.values()
+                if stored['ad_account_id'] == report_run['ad_account_id']
+            ],
+            report_run['options'],
+            date.fromisoformat(fields['date_start']),
+            date.fromisoformat(fields['date_stop'])
+        )
+
+        return self._page(report_run_id, 'insights', rows, params, None, lambda row: row)
+
+    def _raise_injected_failure(self, method: str, path: Sequence[str], params: Mapping) -> bool:
+        # Returns whether the operation should go unanswered instead
+        with self._lock:
+            for failure in self._failures:
+                match, times, respond_null = failure
+
+                if times and match(method, path, params):
+                    failure[1] -= 1
+                    break
+            else:
+                return False
+
+        if respond_null:
+            return True
+
+        raise FakeGraphError(500, 2, 'An unexpected error has occurred. Please retry your request later.', is_transient=True)
+
+    def _require(self, object_id: str) -> Mapping:
+        stored = self._objects.get(str(object_id))
+
+        if stored is None:
+            raise FakeGraphError(400, 100, 'Object with ID \'%s\' does not exist' % object_id)
+
+        return stored
+
+    def _count_call(self, params: Mapping):
+        if not self.call_limit:
+            return
+
+        token = params.get('access_token')
+        now = Time.monotonic()
+
+        with self._lock:
+            calls = self._call_times.setdefault(token, deque())
+
+            while calls and now - calls[0] > self.usage_window:
+                calls.popleft()
+
+            if len(calls) >= self.call_limit:
+                raise FakeGraphError(400, 17, 'User request limit reached', is_transient=True)
+
+            calls.append(now)
+
+    def _usage_headers(self, params: Mapping) -> Mapping[str, str]:
+        if not self.call_limit:
+            return {}
+
+        with self._lock:
+            calls = len(self._call_times.get(params.get('access_token')) or [])
+
+        usage = min(100, int(100 * calls / self.call_limit))
+
+        return {
+            AD_ACCOUNT_USAGE_HEADER: Json.dumps({
+                'acc_id_util_pct': usage,
+                'reset_time_duration': int(self.usage_window) if usage >= 100 else 0,
+            }),
+        }
+
+    def _graph_path(self, url: str) -> Sequence[str]:
+        tokens = [token for token in urlparse(url).path.split('/') if token]
+
+        if tokens and tokens[0] == self.api_version:
+            tokens = tokens[1:]
+
+        return tokens
+
+def _build_handler(server: FakeGraphServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+
+            # Headers and body are written separately, which Nagle's algorithm would delay
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            self._respond('GET', {})
+
+        def do_DELETE(self):
+            self._respond('DELETE', {})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            content_type = self.headers.get('Content-Type') or ''
+
+            if content_type.startswith('multipart/form-data'):
+                self._respond('POST', *_parse_multipart(content_type, body))
+            else:
+                self._respond('POST', dict(parse_qsl(body.decode('utf-8'))))
+
+        def _respond(self, method: str, body_params: Mapping[str, str], files: Mapping[str, Tuple[str, bytes]] = None):
+            params = {**dict(parse_qsl(urlparse(self.path).query)), **body_params}
+            status, headers, body = server.handle_http(method, self.path, params, files)
+            payload = Json.dumps(body).encode('utf-8')
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+
+            for name, value in headers.items():
+                self.send_header(name, value)
+
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def _parse_multipart(content_type: str, body: bytes) -> Tuple[Mapping[str, str], Mapping[str, Tuple[str, bytes]]]:
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+    )
+
+    params = {}
+    files = {}
+
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        content = part.get_payload(decode=True)
+
+        if part.get_filename() is not None:
+            files[name] = (part.get_filename(), content)
+        else:
+            params[name] = content.decode('utf-8')
+
+    return params, files
+
+def _decode_params(params: Mapping[str, str]) -> Mapping[str, any]:
+    decoded = {}
+
+    for name, value in params.items():
+        if name in ('access_token', 'appsecret_proof', 'method'):
+            continue
+
+        try:
+            decoded[name] = Json.loads(value) if value[:1] in '{["' else value
+        except ValueError:
+            decoded[name] = value
+
+    return decoded
+
+def _parse_fields(fields: str) -> Sequence[Tuple[str, str, int, str]]:
+    # Splits "a,b.limit(5).filtering([...]){c,d{e}}" into (field, subfields, limit, filtering)
+    # at the top level only
+    parsed = []
+    depth = 0
+    current = ''
+
+    for character in fields + ',':
+        if character == ',' and depth == 0:
+            if current:
+                match = re.match(r'^(\w+)((?:\.\w+\([^()]*\))*)(?:\{(.*)\})?$', current.strip(), re.DOTALL)
+
+                if match:
+                    modifiers = dict(re.findall(r'\.(\w+)\(([^()]*)\)', match.group(2)))
+                    limit = int(modifiers['limit']) if 'limit' in modifiers else None
+
+                    parsed.append((match.group(1), match.group(3), limit, modifiers.get('filtering')))
+
+            current = ''
+            continue
+
+        depth += character in '{(['
+        depth -= character in '})]'
+        current += character
+
+    return parsed
+
+def _insights_rows(objects: Sequence[Mapping], options: Mapping, since: date, until: date) -> Sequence[Mapping]:
+    # One row per object of the report's level, per day with time_increment=1 or
+    # for the whole range otherwise, with every object reporting DAILY_INSIGHTS
+    level = options.get('level') or 'account'
+    object_type = 'adaccount' if level == 'account' else level
+    fields = options.get('fields') or list(DAILY_INSIGHTS)
+
+    if isinstance(fields, str):
+        fields = fields.split(',')
+
+    if str(options.get('time_increment')) == '1':
+        ranges = [(since + timedelta(days=day),) * 2 for day in range(_days_between(since.isoformat(), until.isoformat()))]
+    else:
+        ranges = [(since, until)]
+
+    rows = []
+
+    for stored in objects:
+        if stored['type'] != object_type or stored['fields'].get('effective_status') in HIDDEN_STATUSES:
+            continue
+
+        data = stored['fields']
+
+        for range_since, range_until in ranges:
+            days = (range_until - range_since).days + 1
+
+            row = {
+                '%s_id' % level: data.get('account_id') if level == 'account' else data['id'],
+                '%s_name' % level: data.get('name'),
+                'date_start': range_since.isoformat(),
+                'date_stop': range_until.isoformat(),
+            }
+
+            for field in fields:
+                value = DAILY_INSIGHTS.get(field)
+
+                if isinstance(value, Mapping):
+                    row[field] = [{'action_type': name, 'value': str(count * days)} for name, count in value.items()]
+                elif value is not None:
+                    row[field] = str(round(value * days, 2))
+
+            rows.append(row)
+
+    return rows
+
+def _days_between(since: str, until: str) -> int:
+    # Days in an inclusive date range
+    return (date.fromisoformat(until) - date.fromisoformat(since)).days + 1
+
+def _count_objects(value: any) -> int:
+    # Objects rendered in a response, including ones expanded inline
+    if isinstance(value, Mapping):
+        return ('id' in value) + sum(_count_objects(item) for item in value.values())
+
+    if isinstance(value, list):
+        return sum(_count_objects(item) for item in value)
+
+    return 0
+
+def _touch(fields: Mapping, keep_updated_time: bool = False) -> Mapping:
+    if 'status' in fields:
+        fields.setdefault('effective_status', fields['status'])
+
+        if not keep_updated_time:
+            fields['effective_status'] = fields['status']
+
+    if not (keep_updated_time and fields.get('updated_time')):
+        fields['updated_time'] = Time.strftime('%Y-%m-%dT%H:%M:%S+0000', Time.gmtime())
+
+    return fields
+
+def _comparable(value: any) -> any:
+    # Times are filtered on as unix timestamps
+    if isinstance(value, str) and re.match(r'^\d{4}-\d\d-\d\dT', value):
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z').timestamp()
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def _filter_children(children: Sequence[Mapping], filtering: str = None) -> Sequence[str]:
+    filters = Json.loads(filtering) if filtering else []
+
+    # Like Graph, listings leave out archived and deleted objects unless filtered on effective_status
+    if not any(condition['field'] == 'effective_status' for condition in filters):
+        filters = [*filters, {'field': 'effective_status', 'operator': 'NOT_IN', 'value': list(HIDDEN_STATUSES)}]
+
+    def matches(fields: Mapping) -> bool:
+        for condition in filters:
+            value = fields.get(condition['field'])
+            expected = condition['value']
+            operator = condition['operator']
+
+            if operator == 'GREATER_THAN' and not (value is not None and _comparable(value) > _comparable(expected)):
+                return False
+            if operator == 'EQUAL' and str(value) != str(expected):
+                return False
+            if operator == 'IN' and value not in expected:
+                return False
+            if operator == 'NOT_IN' and value in expected:
+                return False
+
+        return True
+
+    return [fields['id'] for fields in children if matches(fields)]
+
+def _resolve_references(text: str, named_results: Mapping[str, any]) -> str:
+    def resolve(match) -> str:
+        name, json_path = match.group(1), match.group(2)
+
+        if name not in named_results:
+            raise FakeGraphError(400, 100, 'Unknown batch result reference: %s' % name)
+
+        values = [named_results[name]]
+
+        for key in json_path.lstrip('$.').split('.'):
+            if key == '*':
+                values = [item for value in values for item in value]
+            else:
+                values = [value[key] for value in values]
+
+        return ','.join(str(value) for value in values)
+
+    return re.sub(r'\{result=(\w+):(\$[\w.*]*)\}', resolve, text)
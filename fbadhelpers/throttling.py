@@ -0,0 +1,168 @@
+import json as Json
+import threading
+import time as Time
+from typing import Mapping
+
+# https://developers.facebook.com/docs/graph-api/overview/rate-limiting
+BUSINESS_USE_CASE_USAGE_HEADER = 'x-business-use-case-usage'
+AD_ACCOUNT_USAGE_HEADER = 'x-ad-account-usage'
+APP_USAGE_HEADER = 'x-app-usage'
+
+
+class RateGovernor:
+    """
+    Paces calls made with an ApiRecord based on the usage headers Facebook
+    returns. Below low_usage percent calls are not delayed at all; between
+    low_usage and high_usage the spacing between calls grows towards max_delay;
+    once Facebook reports an estimated time to regain access, calls are held
+    until then.
+    """
+
+    low_usage: float
+    high_usage: float
+    max_delay: float
+    usage_ttl: float
+
+    def __init__(self, low_usage: float = 50.0, high_usage: float = 95.0, max_delay: float = 5.0, usage_ttl: float = 60.0):
+        assert 0 <= low_usage < high_usage, 'Low usage threshold must be below the high usage threshold'
+
+        self.low_usage = low_usage
+        self.high_usage = high_usage
+        self.max_delay = max_delay
+        self.usage_ttl = usage_ttl
+
+        self._lock = threading.Lock()
+        self._usage = 0.0
+        self._observed_at = 0.0
+        self._blocked_until = 0.0
+        self._next_call_at = 0.0
+
+    @property
+    def usage(self) -> float:
+        with self._lock:
+            return self._current_usage(Time.monotonic())
+
+    def delay(self) -> float:
+        """
+        Reserves the next call slot and returns how many seconds the caller has to
+        wait before making its call.
+        """
+        with self._lock:
+            now = Time.monotonic()
+            slot = max(now, self._next_call_at, self._blocked_until)
+            self._next_call_at = slot + self._spacing(self._current_usage(now))
+
+            return slot - now
+
+    def ready_in(self) -> float:
+        """
+        Returns how many seconds until a call would be allowed, without reserving it.
+        """
+        with self._lock:
+            return max(0.0, self._next_call_at - Time.monotonic(), self._blocked_until - Time.monotonic())
+
+    def wait(self):
+        delay = self.delay()
+
+        if delay > 0:
+            Time.sleep(delay)
+
+    def observe(self, headers: any):
+        headers = _normalize_headers(headers)
+
+        usage = None
+        regain_seconds = 0.0
+
+        for business_usages in _parse_header(headers, BUSINESS_USE_CASE_USAGE_HEADER).values():
+            for business_usage in business_usages or []:
+                usage = max(usage or 0.0, _usage_percent(business_usage))
+                regain_seconds = max(
+                    regain_seconds,
+                    float(business_usage.get('estimated_time_to_regain_access') or 0) * 60
+                )
+
+        ad_account_usage = _parse_header(headers, AD_ACCOUNT_USAGE_HEADER)
+        if 'acc_id_util_pct' in ad_account_usage:
+            account_usage = float(ad_account_usage['acc_id_util_pct'])
+            usage = max(usage or 0.0, account_usage)
+
+            if account_usage >= 100:
+                regain_seconds = max(regain_seconds, float(ad_account_usage.get('reset_time_duration') or 0))
+
+        app_usage = _parse_header(headers, APP_USAGE_HEADER)
+        if app_usage:
+            usage = max(usage or 0.0, _usage_percent(app_usage))
+
+        if usage is None:
+            return
+
+        with self._lock:
+            now = Time.monotonic()
+            self._usage = usage
+            self._observed_at = now
+
+            if regain_seconds:
+                self._blocked_until = max(self._blocked_until, now + regain_seconds)
+
+    def _current_usage(self, now: float) -> float:
+        # Usage that hasn't been reported for a while has most likely recovered
+        if now - self._observed_at > self.usage_ttl:
+            return 0.0
+
+        return self._usage
+
+    def _spacing(self, usage: float) -> float:
+        if usage <= self.low_usage:
+            return 0.0
+
+        if usage >= self.high_usage:
+            return self.max_delay
+
+        # Back off slowly at first, then sharply as usage approaches the limit
+        ratio = (usage - self.low_usage) / (self.high_usage - self.low_usage)
+        return self.max_delay * ratio * ratio
+
+def parse_usage_headers(headers: any) -> Mapping[str, Mapping]:
+    """
+    Returns the parsed rate-limit usage headers present in `headers`, by header name.
+    """
+    headers = _normalize_headers(headers)
+
+    return {
+        name: usage
+        for name, usage in (
+            (name, _parse_header(headers, name))
+            for name in (BUSINESS_USE_CASE_USAGE_HEADER, AD_ACCOUNT_USAGE_HEADER, APP_USAGE_HEADER)
+        )
+        if usage
+    }
+
+def _normalize_headers(headers: any) -> Mapping[str, str]:
+    if not headers:
+        return {}
+
+    # Batch responses carry their headers as a list of {name, value} pairs
+    if isinstance(headers, list):
+        return {header['name'].lower(): header['value'] for header in headers if 'name' in header}
+
+    return {str(name).lower(): value for name, value in headers.items()}
+
+def _parse_header(headers: Mapping[str, str], name: str) -> Mapping:
+    value = headers.get(name)
+
+    if not value:
+        return {}
+
+    try:
+        parsed = Json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+
+    return parsed if isinstance(parsed, Mapping) else {}
+
+def _usage_percent(usage: Mapping) -> float:
+    return float(max(
+        usage.get('call_count') or 0,
+        usage.get('total_cputime') or 0,
+        usage.get('total_time') or 0,
+    ))
@@ -0,0 +1,143 @@
+import json as Json
+import threading
+from collections import deque
+from typing import Mapping, Tuple
+from urllib.parse import urlparse, parse_qsl
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from fbadhelpers.records import ApiRecord
+
+# Credentials are never written to cassettes nor used to match requests
+SECRET_PARAMS = frozenset(['access_token', 'appsecret_proof'])
+
+
+class RecordingTransport:
+    """
+    Passes requests through to another transport (a requests.Session or the
+    transport an ApiRecord already uses) and appends every exchange to a
+    cassette file, one JSON object per line, for ReplayTransport to serve later.
+    """
+
+    def __init__(self, transport: any, path: str):
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def request(self, method: str, url: str, params: Mapping = None, data: Mapping = None, **kwargs):
+        response = self._transport.request(method, url, params=params, data=data, **kwargs)
+
+        exchange = {
+            'request': {
+                'method': method,
+                'path': _graph_path(url),
+                'params': _public_params(url, params, data),
+            },
+            'response': {
+                'status': response.status_code,
+                'headers': dict(response.headers),
+                'body': response.text,
+            },
+        }
+
+        with self._lock:
+            self._file.write(Json.dumps(exchange) + '\n')
+            self._file.flush()
+
+        return response
+
+    def close(self):
+        self._file.close()
+
+class ReplayTransport:
+    """
+    Answers requests from a cassette written by RecordingTransport without any
+    network access. Requests are matched on method, Graph path and params
+    (ignoring the host, API version and credentials); identical requests are
+    answered in the order they were recorded. Unmatched requests raise KeyError.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._exchanges = {}
+
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+
+                exchange = Json.loads(line)
+                recorded = exchange['request']
+
+                key = _request_key(recorded['method'], recorded['path'], recorded['params'])
+                self._exchanges.setdefault(key, deque()).append(exchange['response'])
+
+    def request(self, method: str, url: str, params: Mapping = None, data: Mapping = None, **kwargs):
+        key = _request_key(method, _graph_path(url), _public_params(url, params, data))
+
+        with self._lock:
+            responses = self._exchanges.get(key)
+
+            if not responses:
+                raise KeyError('No recorded response for request', {'method': method, 'url': url})
+
+            # The last recording of a request keeps answering once the others are used up
+            recorded = responses.popleft() if len(responses) > 1 else responses[0]
+
+        response = Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response._content = recorded['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = url
+
+        return response
+
+    def close(self):
+        pass
+
+def use_transport(api: ApiRecord, transport: any) -> ApiRecord:
+    """
+    Sends every call made through `api` (requests, batches, SDK objects) via
+    `transport`, any object with requests.Session's request() signature.
+    """
+    api.service._session.requests = transport
+    return api
+
+def record_api(api: ApiRecord, path: str) -> RecordingTransport:
+    transport = RecordingTransport(api.service._session.requests, path)
+    use_transport(api, transport)
+
+    return transport
+
+def replay_api(api: ApiRecord, path: str) -> ReplayTransport:
+    transport = ReplayTransport(path)
+    use_transport(api, transport)
+
+    return transport
+
+def _graph_path(url: str) -> str:
+    tokens = urlparse(url).path.strip('/').split('/')
+
+    if tokens and tokens[0][:1] == 'v' and tokens[0][1:].replace('.', '').isdigit():
+        tokens = tokens[1:]
+
+    return '/' + '/'.join(tokens)
+
+def _public_params(url: str, params: Mapping, data: Mapping) -> Mapping[str, str]:
+    merged = dict(parse_qsl(urlparse(url).query))
+    merged.update(params or {})
+
+    # File uploads are posted as multipart data rather than a mapping
+    if isinstance(data, Mapping):
+        merged.update(data)
+
+    return {
+        str(name): value if isinstance(value, str) else Json.dumps(value, sort_keys=True)
+        for name, value in merged.items()
+        if name not in SECRET_PARAMS
+    }
+
+def _request_key(method: str, path: str, params: Mapping[str, str]) -> Tuple:
+    return method.upper(), path, tuple(sorted(params.items()))
@@ -0,0 +1,172 @@
+import threading
+import time as Time
+from concurrent.futures import Future
+from typing import Mapping, Sequence, List
+
+from fbadhelpers.records import ApiRecord
+from fbadhelpers.requesters import BatchRequest, MAX_BATCH_SIZE, DEFAULT_BATCH_CONCURRENCY
+
+# Objects with pending updates that trigger a flush: one full batch call per worker
+DEFAULT_MAX_PENDING = MAX_BATCH_SIZE * DEFAULT_BATCH_CONCURRENCY
+
+# Seconds an update may wait for others to join it before it's sent
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class _PendingUpdate:
+    fields: dict
+    futures: List[Future]
+
+    def __init__(self):
+        self.fields = {}
+        self.futures = []
+
+class WriteBehindQueue:
+    """
+    Collects field updates and sends them as batched POSTs in the background.
+    Updates to the same object are merged, later values winning per field, so
+    each object is written once per flush however many times it was updated.
+    A flush happens once `max_pending` objects have updates waiting, or
+    `flush_interval` seconds after the oldest waiting update.
+
+    Assign one to `api.write_queue` to have update_ad_sets_by_ids_from_config
+    go through it. close() sends whatever is still waiting.
+    """
+
+    api: ApiRecord
+    max_pending: int
+    flush_interval: float
+    max_workers: int
+
+    def __init__(
+            self,
+            api: ApiRecord,
+            max_pending: int = DEFAULT_MAX_PENDING,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            max_workers: int = DEFAULT_BATCH_CONCURRENCY
+    ):
+
+        assert max_pending > 0, 'At least one pending object is required'
+
+        self.api = api
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_workers = max_workers
+
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._oldest_at = None
+        self._closed = False
+
+        # Flushes go out one at a time, so a later update can't overtake an earlier one
+        self._flush_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, name='fbadhelpers-write-behind', daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, object_id: str, fields: Mapping[str, any]) -> Future:
+        """
+        Queues `fields` to be written to the object. The returned future
+        resolves to the Graph response of the write that included them, or
+        raises if that write failed.
+        """
+        future = Future()
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Write-behind queue is closed')
+
+            pending = self._pending.setdefault(str(object_id), _PendingUpdate())
+            pending.fields.update(fields)
+            pending.futures.append(future)
+
+            if self._oldest_at is None:
+                self._oldest_at = Time.monotonic()
+
+            self._condition.notify()
+
+        return future
+
+    def update_many(self, object_ids: Sequence[str], fields: Mapping[str, any]) -> Sequence[Future]:
+        return [self.update(object_id, fields) for object_id in object_ids]
+
+    def flush(self):
+        """
+        Sends every waiting update now and returns once they're answered.
+        """
+        with self._flush_lock:
+            with self._condition:
+                pending = self._pending
+                self._pending = {}
+                self._oldest_at = None
+
+            if pending:
+                self._send(pending)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._is_due():
+                    self._condition.wait(self._seconds_until_due())
+
+                if self._closed:
+                    return
+
+            self.flush()
+
+    def _is_due(self) -> bool:
+        if not self._pending:
+            return False
+
+        return len(self._pending) >= self.max_pending or self._seconds_until_due() <= 0
+
+    def _seconds_until_due(self) -> float:
+        if self._oldest_at is None:
+            return None
+
+        return self._oldest_at + self.flush_interval - Time.monotonic()
+
+    def _send(self, pending: Mapping[str, _PendingUpdate]):
+        object_ids = list(pending)
+        batch = BatchRequest(self.api, max_workers=self.max_workers)
+
+        for object_id in object_ids:
+            batch.request(path=[object_id], params=pending[object_id].fields, method='POST')
+
+        try:
+            outcomes = batch.perform_outcomes()
+        except BaseException as error:
+            for update in pending.values():
+                for future in update.futures:
+                    future.set_exception(error)
+
+            return
+
+        for object_id, outcome in zip(object_ids, outcomes):
+            for future in pending[object_id].futures:
+                if outcome.success:
+                    future.set_result(outcome.response)
+                else:
+                    future.set_exception(Exception('Failed to update object', {
+                        'id': object_id,
+                        'params': pending[object_id].fields,
+                        'failure': outcome.response,
+                    }))
@@ -11,5 +11,10 @@ setup(
     description='Helper utilities to simplify working with the Facebook Marketing API',
     install_requires=[
         'facebookads',
-    ]
+    ],
+    extras_require={
+        'async': [
+            'aiohttp',
+        ],
+    }
 )
@@ -0,0 +1,32 @@
+import copy
+
+import pytest
+
+from fbadhelpers.requesters import add_request_hook, remove_request_hook
+from fbadhelpers.testing import FakeGraphServer
+
+
+@pytest.fixture
+def server():
+    with FakeGraphServer() as server:
+        yield server
+
+@pytest.fixture
+def ids(server):
+    return server.seed_ad_account('act_1', campaigns=4, ad_sets=20, ads=100, ad_creatives=5)
+
+@pytest.fixture
+def api(server, ids):
+    return server.create_api('act_1')
+
+@pytest.fixture
+def events():
+    # A copy of every request event as hooks saw it, as events are updated in place
+    seen = []
+
+    def hook(event):
+        seen.append(copy.copy(event))
+
+    add_request_hook(hook)
+    yield seen
+    remove_request_hook(hook)
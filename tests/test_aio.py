@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+from facebookads.exceptions import FacebookRequestError
+
+from fbadhelpers.aio.clients import AsyncClient
+from fbadhelpers.aio.executors import fan_out
+from fbadhelpers.aio.helpers import get_ad_sets_by_campaign_id
+from fbadhelpers.aio.requesters import AsyncBatchRequest, request, request_by_ids, iterate_pages, iterate_rows
+from fbadhelpers.requesters import request as sync_request
+
+
+@pytest.fixture
+def run(server):
+    # Runs `main` with an AsyncClient for the fake server, which has to be used
+    # inside the event loop that created it
+    def run(main):
+        async def run_main():
+            async with AsyncClient(graph_url=server.url, api_version=server.api_version) as client:
+                return await main(client)
+
+        return asyncio.run(run_main())
+
+    return run
+
+def test_requests_return_objects_and_raise_errors(run, api, ids, events):
+    async def main(client):
+        async_api = client.bind(api)
+        ad = await request(async_api, [ids['ads'][0]], {'fields': 'name'})
+
+        with pytest.raises(FacebookRequestError):
+            await request(async_api, ['999999'])
+
+        return ad
+
+    assert run(main) == {'id': ids['ads'][0], 'name': 'Ad 0'}
+    assert [(event.kind, event.phase, event.status) for event in events] == [
+        ('request', 'before', None),
+        ('request', 'after', 200),
+        ('request', 'before', None),
+        ('request', 'after', 400),
+    ]
+
+def test_request_by_ids_returns_objects_in_order_of_ids(server, run, api, ids):
+    ad_ids = ids['ads'][:60] + ids['ads'][:5]
+
+    server.reset_counters()
+    objects = run(lambda client: request_by_ids(client.bind(api), ad_ids, ['name']))
+
+    assert [data['id'] for data in objects] == ad_ids
+    assert server.operations == 2
+
+def test_batches_retry_transient_failures_only(server, run, api, ids):
+    server.fail_operations(lambda method, path, params: path == [ids['ads'][3]], times=2)
+
+    async def main(client):
+        batch = AsyncBatchRequest(client.bind(api), max_batch_size=2, retry_backoff=0.01)
+
+        for ad_id in ids['ads'][:5]:
+            batch.request(path=[ad_id], params={'fields': 'name'})
+
+        batch.request(path=['999999'], params={'fields': 'name'})
+
+        return await batch.perform_outcomes()
+
+    outcomes = run(main)
+
+    assert [outcome.success for outcome in outcomes] == [True] * 5 + [False]
+    assert [outcome.attempts for outcome in outcomes] == [1, 1, 1, 3, 1, 1]
+    assert outcomes[3].response['id'] == ids['ads'][3]
+    assert outcomes[5].error_code == 100
+
+def test_batch_calls_that_raise_fail_their_operations(run, api, ids, events):
+    async def main(client):
+        async def unreachable(*args):
+            raise asyncio.TimeoutError()
+
+        client.call = unreachable
+
+        batch = AsyncBatchRequest(client.bind(api), max_retries=1, retry_backoff=0)
+        batch.request(path=[ids['ads'][0]])
+
+        return await batch.perform_outcomes()
+
+    outcome, = run(main)
+
+    assert (outcome.success, outcome.status, outcome.attempts) == (False, None, 2)
+    assert [(event.phase, event.attempt) for event in events] == [('before', 1), ('after', 1), ('before', 2), ('after', 2)]
+    assert isinstance(events[-1].error, asyncio.TimeoutError)
+
+def test_page_walkers_follow_paging(server, run, api, ids, events):
+    server.page_size = 40
+
+    async def main(client):
+        pages = iterate_pages(
+            api=client.bind(api),
+            next_request_builder=lambda response: {'path': response['paging']['next']},
+            path=[api.ad_account_id, 'ads'],
+            params={'fields': 'name'},
+            prefetch=True
+        )
+
+        return [ad['id'] async for ad in iterate_rows(pages)]
+
+    assert run(main) == ids['ads']
+    assert [event.rows for event in events if event.kind == 'page' and event.phase == 'after'] == [40, 40, 20]
+
+def test_helpers_read_through_the_client(run, api, ids):
+    ad_sets = run(lambda client: get_ad_sets_by_campaign_id(client.bind(api), ids['campaigns'][0]))
+
+    assert [ad_set['id'] for ad_set in ad_sets] == ids['adsets'][0::4]
+
+def test_fan_out_collects_results_per_account(server, run):
+    for index in range(2, 5):
+        server.seed_ad_account('act_%d' % index, campaigns=index, ad_sets=0, ads=0, ad_creatives=0)
+
+    apis = [server.create_api('act_%d' % index) for index in range(2, 5)]
+
+    async def count_campaigns(api):
+        if api.ad_account_id == 'act_3':
+            raise ValueError('Failed for act_3')
+
+        return len((await request(api, [api.ad_account_id, 'campaigns']))['data'])
+
+    async def main(client):
+        async_apis = [client.bind(api) for api in apis]
+
+        with pytest.raises(AssertionError, match='act_2'):
+            await fan_out([*async_apis, client.bind(apis[0])], count_campaigns)
+
+        return await fan_out(async_apis, count_campaigns, max_concurrency=2)
+
+    results = run(main)
+
+    assert {ad_account_id: result.value for ad_account_id, result in results.items()} == {
+        'act_2': 2, 'act_3': None, 'act_4': 4,
+    }
+    assert isinstance(results['act_3'].error, ValueError)
+
+def test_binding_leaves_the_bound_record_paced_on_its_own(run, api, ids, events):
+    async_apis = []
+    run(lambda client: asyncio.sleep(0, async_apis.append(client.bind(api))))
+
+    sync_request(api, [ids['ads'][0]])
+
+    assert async_apis[0].governor is api.governor
+    assert async_apis[0].service is not api.service
+    assert [event.api for event in events] == [api, api]
@@ -0,0 +1,106 @@
+from fbadhelpers.batch_graphs import BatchGraph, resolve_json_path
+from fbadhelpers.journals import Journal
+
+
+def create_renamed_campaign(graph, api, name):
+    campaign = graph.request(
+        path=[api.ad_account_id, 'campaigns'],
+        params={'name': 'Unnamed', 'objective': 'LINK_CLICKS', 'status': 'PAUSED'},
+        method='POST'
+    )
+
+    rename = graph.request(path=[campaign.ref()], params={'name': name}, method='POST')
+
+    return campaign, rename
+
+def test_references_are_sent_in_the_same_batch_call(server, api):
+    graph = BatchGraph(api)
+    campaign, rename = create_renamed_campaign(graph, api, 'Renamed')
+
+    server.reset_counters()
+    responses = graph.perform()
+
+    assert server.http_calls == 1
+    assert server.get_object(responses[campaign.index]['id'])['name'] == 'Renamed'
+
+def test_references_across_batch_calls_are_filled_in(server, api):
+    graph = BatchGraph(api, max_batch_size=1)
+    campaign, rename = create_renamed_campaign(graph, api, 'Renamed')
+
+    server.reset_counters()
+    responses = graph.perform()
+
+    assert server.http_calls == 2
+    assert server.get_object(responses[campaign.index]['id'])['name'] == 'Renamed'
+
+def test_transient_failures_are_retried_with_references_filled_in(server, api):
+    server.fail_operations(lambda method, path, params: params.get('name') == 'Renamed')
+
+    graph = BatchGraph(api, retry_backoff=0.01)
+    campaign, rename = create_renamed_campaign(graph, api, 'Renamed')
+    outcomes = graph.perform_outcomes()
+
+    assert [outcome.success for outcome in outcomes] == [True, True]
+    assert [outcome.attempts for outcome in outcomes] == [1, 2]
+    assert server.get_object(outcomes[campaign.index].response['id'])['name'] == 'Renamed'
+
+def test_dependents_of_retried_requests_are_retried_with_them(server, api):
+    server.fail_operations(lambda method, path, params: path == [api.ad_account_id, 'campaigns'])
+
+    graph = BatchGraph(api, retry_backoff=0.01)
+    campaign, rename = create_renamed_campaign(graph, api, 'Renamed')
+    outcomes = graph.perform_outcomes()
+
+    assert [outcome.success for outcome in outcomes] == [True, True]
+    assert server.get_object(outcomes[campaign.index].response['id'])['name'] == 'Renamed'
+
+def test_unanswered_dependents_are_not_resent_without_their_reference(server, api):
+    server.fail_operations(lambda method, path, params: params.get('name') == 'Renamed', respond_null=True)
+
+    graph = BatchGraph(api, retry_backoff=0.01)
+    campaign, rename = create_renamed_campaign(graph, api, 'Renamed')
+    outcomes = graph.perform_outcomes()
+
+    assert [outcome.success for outcome in outcomes] == [True, True]
+    assert server.get_object(outcomes[campaign.index].response['id'])['name'] == 'Renamed'
+
+def test_dependents_of_permanent_failures_fail_without_being_sent(server, api):
+    graph = BatchGraph(api, max_batch_size=1, retry_backoff=0.01)
+    update = graph.request(path=['999999'], params={'name': 'Missing'}, method='POST')
+    dependent = graph.request(path=[update.ref('$.id')], params={'name': 'Dependent'}, method='POST')
+
+    server.reset_counters()
+    outcomes = graph.perform_outcomes()
+
+    assert server.http_calls == 1
+    assert outcomes[update.index].error_code == 100
+    assert outcomes[dependent.index].error['dependencies'] == [update.name]
+
+def test_journaled_requests_are_not_sent_again(server, api, tmp_path):
+    journal = Journal(str(tmp_path / 'journal.db'))
+
+    def perform():
+        graph = BatchGraph(api, journal=journal, job='test')
+        campaign = graph.request(
+            path=[api.ad_account_id, 'campaigns'],
+            params={'name': 'Journaled', 'objective': 'LINK_CLICKS', 'status': 'PAUSED'},
+            method='POST',
+            key='campaign'
+        )
+        graph.request(path=[campaign.ref()], params={'name': 'Journaled'}, method='POST', key='rename')
+
+        return graph.perform()
+
+    first = perform()
+    server.reset_counters()
+
+    assert perform() == first
+    assert server.http_calls == 0
+
+def test_resolve_json_path():
+    document = {'data': [{'id': '1'}, {'id': '2'}], 'id': '3'}
+
+    assert resolve_json_path(document, '$.id') == '3'
+    assert resolve_json_path(document, '$.data.1.id') == '2'
+    assert resolve_json_path(document, '$.data[0].id') == '1'
+    assert resolve_json_path(document, '$.data.*.id') == '1,2'
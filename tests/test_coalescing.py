@@ -0,0 +1,70 @@
+import time as Time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from facebookads.exceptions import FacebookRequestError
+
+from fbadhelpers.coalescing import RequestCoalescer
+from fbadhelpers.helpers.getters import get_campaign_by_id
+from fbadhelpers.requesters import request
+
+
+@pytest.fixture
+def coalesced_api(server, ids):
+    return server.create_api('act_1', coalescer=RequestCoalescer())
+
+def test_concurrent_reads_by_id_are_fetched_together(server, ids):
+    # Enough latency for reads to arrive while another fetch is running
+    server.latency = 0.02
+    api = server.create_api('act_1', coalescer=RequestCoalescer())
+    campaign_ids = [ids['campaigns'][index % 4] for index in range(64)]
+
+    server.reset_counters()
+
+    with ThreadPoolExecutor(16) as executor:
+        campaigns = list(executor.map(lambda campaign_id: get_campaign_by_id(api, campaign_id, ['name']), campaign_ids))
+
+    assert [campaign['id'] for campaign in campaigns] == campaign_ids
+    assert server.http_calls < len(campaign_ids) / 2
+
+def test_lone_reads_are_not_delayed(server, ids):
+    api = server.create_api('act_1', coalescer=RequestCoalescer(window=1.0))
+    started_at = Time.monotonic()
+
+    for campaign_id in ids['campaigns']:
+        get_campaign_by_id(api, campaign_id, ['name'])
+
+    assert Time.monotonic() - started_at < 1.0
+
+def test_missing_objects_raise_their_own_error(coalesced_api, ids):
+    def read(campaign_id):
+        try:
+            return get_campaign_by_id(coalesced_api, campaign_id, ['name'])['id']
+        except FacebookRequestError as error:
+            return error.api_error_code()
+
+    campaign_ids = [ids['campaigns'][0], '999999'] * 8
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(read, campaign_ids))
+
+    assert results == [ids['campaigns'][0], 100] * 8
+
+def test_identical_requests_share_one_fetch(server, ids):
+    server.latency = 0.02
+    api = server.create_api('act_1', coalescer=RequestCoalescer())
+
+    server.reset_counters()
+
+    with ThreadPoolExecutor(16) as executor:
+        responses = list(executor.map(lambda _: request(api, [ids['campaigns'][0]], {'fields': 'name'}), range(32)))
+
+    assert all(response == responses[0] for response in responses)
+    assert server.http_calls < 32
+
+def test_single_flight_hands_out_copies():
+    coalescer = RequestCoalescer()
+    result = coalescer.single_flight('key', lambda: {'data': [1]})
+    result['data'].append(2)
+
+    assert coalescer.single_flight('key', lambda: {'data': [1]}) == {'data': [1]}
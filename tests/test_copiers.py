@@ -0,0 +1,71 @@
+import pytest
+
+from fbadhelpers.helpers.copiers import copy_ad_set, copy_campaign_trees, read_campaign_trees
+from fbadhelpers.journals import Journal
+
+
+@pytest.fixture
+def target_apis(server):
+    for ad_account_id in ('act_2', 'act_3'):
+        server.seed_ad_account(ad_account_id, campaigns=0, ad_sets=0, ads=0, ad_creatives=0)
+
+    return [server.create_api('act_2'), server.create_api('act_3')]
+
+def test_trees_are_read_with_nested_edges(server, api, ids):
+    server.page_size = 2
+    trees = read_campaign_trees(api, ids['campaigns'][:2], page_limit=2)
+
+    assert [campaign['id'] for campaign in trees] == ids['campaigns'][:2]
+    assert [ad_set['id'] for ad_set in trees[0]['adsets']] == ids['adsets'][0::4]
+    assert [ad['id'] for ad in trees[0]['adsets'][0]['ads']] == ids['ads'][0::20]
+    assert trees[0]['adsets'][0]['ads'][0]['creative']['name'] == 'Creative 0'
+
+def test_trees_too_large_to_read_together_are_read_in_smaller_groups(server, api, ids, events):
+    # Each campaign's tree is 1 campaign, 5 ad sets, 25 ads and their 25 creatives
+    server.max_expanded_objects = 100
+    trees = read_campaign_trees(api, ids['campaigns'])
+
+    assert [campaign['id'] for campaign in trees] == ids['campaigns']
+    assert sum(len(ad_set['ads']) for campaign in trees for ad_set in campaign['adsets']) == 100
+
+    # Groups are split on their first failure rather than resent as they are:
+    # 4 campaigns, then 2 and 2, then 1 each
+    batch_events = [event for event in events if event.kind == 'batch' and event.phase == 'after']
+
+    assert [event.attempt for event in batch_events] == [1, 1, 1]
+    assert [event.operations for event in batch_events] == [1, 2, 4]
+
+def test_trees_are_copied_into_every_target(server, api, ids, target_apis):
+    results = copy_campaign_trees(api, ids['campaigns'][:1], target_apis, name_templates={'campaign': '{name} copy'})
+
+    assert list(results) == ['act_2', 'act_3']
+
+    for ad_account_id, result in results.items():
+        tree_copy = result.value
+
+        assert result.success and tree_copy.success
+        assert len(tree_copy.id_map) == 1 + 5 + 25 + 5
+
+        copied = server.get_object(tree_copy.id_map[ids['campaigns'][0]])
+        copied_ad = server.get_object(tree_copy.id_map[ids['ads'][0]])
+
+        assert copied['name'] == 'Campaign 0 copy'
+        assert copied['status'] == 'PAUSED'
+        assert copied_ad['adset_id'] == tree_copy.id_map[ids['adsets'][0]]
+        assert copied_ad['creative']['id'] == tree_copy.id_map[ids['adcreatives'][0]]
+
+def test_journaled_tree_copies_are_not_made_again(server, api, ids, target_apis, tmp_path):
+    journal = Journal(str(tmp_path / 'journal.db'))
+    first = copy_campaign_trees(api, ids['campaigns'][:1], target_apis[:1], journal=journal)
+
+    server.reset_counters()
+    second = copy_campaign_trees(api, ids['campaigns'][:1], target_apis[:1], journal=journal)
+
+    assert second['act_2'].value.id_map == first['act_2'].value.id_map
+    assert server.operations == 1
+
+def test_ad_set_copies_are_renamed(server, api, ids):
+    copied_ids = copy_ad_set(api, ids['adsets'][0], ids['campaigns'][1], copies=3, ad_set_name_generator=lambda copy: 'Copy %d' % copy)
+
+    assert [server.get_object(ad_set_id)['name'] for ad_set_id in copied_ids] == ['Copy 0', 'Copy 1', 'Copy 2']
+    assert all(server.get_object(ad_set_id)['campaign_id'] == ids['campaigns'][1] for ad_set_id in copied_ids)
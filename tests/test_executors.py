@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from fbadhelpers.executors import FanOutExecutor, fan_out
+from fbadhelpers.helpers.getters import get_recent_campaigns
+
+
+@pytest.fixture
+def apis(server):
+    for index in range(2, 6):
+        server.seed_ad_account('act_%d' % index, campaigns=index, ad_sets=0, ads=0, ad_creatives=0)
+
+    return [server.create_api('act_%d' % index) for index in range(2, 6)]
+
+def test_results_and_errors_are_collected_per_account(apis):
+    def helper(api):
+        if api.ad_account_id == 'act_3':
+            raise ValueError('Failed for act_3')
+
+        return len(get_recent_campaigns(api))
+
+    results = fan_out(apis, helper)
+
+    assert {ad_account_id: result.value for ad_account_id, result in results.items()} == {
+        'act_2': 2, 'act_3': None, 'act_4': 4, 'act_5': 5,
+    }
+    assert isinstance(results['act_3'].error, ValueError)
+
+def test_accounts_may_only_appear_once(server, apis):
+    with pytest.raises(AssertionError, match='act_2'):
+        fan_out([*apis, server.create_api('act_2')], lambda api: None)
+
+def test_accounts_stay_within_their_concurrency(apis):
+    lock = threading.Lock()
+    running = {}
+    most_running = {}
+
+    def helper(api):
+        with lock:
+            running[api.ad_account_id] = running.get(api.ad_account_id, 0) + 1
+            most_running[api.ad_account_id] = max(most_running.get(api.ad_account_id, 0), running[api.ad_account_id])
+
+        get_recent_campaigns(api)
+
+        with lock:
+            running[api.ad_account_id] -= 1
+
+    with FanOutExecutor(max_workers=8, per_account_concurrency=2) as executor:
+        futures = [executor.submit(api, helper) for api in apis for _ in range(6)]
+
+        for future in futures:
+            future.result()
+
+    assert max(most_running.values()) <= 2
@@ -0,0 +1,95 @@
+import math
+from array import array
+from datetime import date
+
+import pytest
+
+from fbadhelpers.helpers.insights import collect_insights, ColumnarRows, InsightsSlice, flatten_insights_row, get_numeric_insights_fields
+
+
+def test_metrics_are_stored_as_numbers_and_dimensions_as_returned():
+    rows = ColumnarRows()
+    rows.extend([
+        {'campaign_name': '2019', 'date_start': '2024-01-01', 'spend': '1.50', 'actions.link_click': '3'},
+        {'campaign_name': 'Spring', 'date_start': '2024-01-02', 'impressions': '10'},
+    ])
+
+    assert isinstance(rows.column('spend'), array)
+    assert isinstance(rows.column('actions.link_click'), array)
+    assert rows.column('campaign_name') == ['2019', 'Spring']
+    assert list(rows) == [
+        {'campaign_name': '2019', 'date_start': '2024-01-01', 'spend': 1.5, 'actions.link_click': 3.0},
+        {'campaign_name': 'Spring', 'date_start': '2024-01-02', 'impressions': 10.0},
+    ]
+
+def test_stored_values_are_never_rewritten():
+    rows = ColumnarRows()
+    rows.append({'spend': '1.50', 'campaign_id': '120000000000000001'})
+    rows.append({'spend': 'n/a', 'campaign_id': 'abc'})
+
+    assert rows.row(0) == {'spend': 1.5, 'campaign_id': '120000000000000001'}
+    assert rows.row(1) == {'spend': 'n/a', 'campaign_id': 'abc'}
+    assert math.isnan(rows.column('spend')[1])
+
+def test_requested_metrics_are_numeric_but_breakdowns_are_not():
+    numeric_fields = get_numeric_insights_fields({
+        'fields': 'campaign_id,campaign_name,new_metric,age,date_start',
+        'breakdowns': ['age'],
+    })
+
+    assert 'new_metric' in numeric_fields
+    assert 'spend' in numeric_fields
+    assert not {'campaign_id', 'campaign_name', 'age', 'date_start'} & numeric_fields
+
+def test_flatten_insights_row():
+    assert flatten_insights_row({
+        'spend': '2',
+        'actions': [{'action_type': 'link_click', 'value': '4'}, {'action_type': 'like', 'value': '1'}],
+        'video_play_curve_actions': {'value': '7'},
+    }) == {
+        'spend': '2',
+        'actions.link_click': '4',
+        'actions.like': '1',
+        'video_play_curve_actions.value': '7',
+    }
+
+def test_slices_split_in_half():
+    insights_slice = InsightsSlice(None, date(2024, 1, 1), date(2024, 1, 10))
+
+    assert [(half.since.day, half.until.day) for half in insights_slice.split()] == [(1, 5), (6, 10)]
+
+def test_reports_are_submitted_polled_and_collected(server, api, ids, events):
+    rows = collect_insights([api], {
+        'fields': 'campaign_id,campaign_name,impressions,spend,actions',
+        'level': 'campaign',
+        'time_increment': 1,
+    }, date(2024, 1, 1), date(2024, 1, 4), slice_days=2, poll_interval=0.01)
+
+    assert len(rows) == 4 * 4
+    assert sorted({row['campaign_id'] for row in rows}) == sorted(ids['campaigns'])
+    assert sorted({row['date_start'] for row in rows}) == ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04']
+    assert sum(rows.column('spend')) == 16 * 1.25
+    assert sum(rows.column('actions.link_click')) == 16 * 3
+
+    # Running reports are polled together through batch calls
+    assert [event.operations for event in events if event.kind == 'batch' and event.phase == 'after'] == [2, 2]
+
+def test_slices_whose_reports_fail_are_split_and_rerun(server, api):
+    server.max_report_days = 2
+
+    rows = collect_insights([api], {'fields': 'impressions,spend'}, date(2024, 1, 1), date(2024, 1, 8), poll_interval=0.01)
+
+    # 8 days failed, then 4 and 4, and the 2 day halves of those completed
+    assert sorted((row['date_start'], row['date_stop']) for row in rows) == [
+        ('2024-01-01', '2024-01-02'),
+        ('2024-01-03', '2024-01-04'),
+        ('2024-01-05', '2024-01-06'),
+        ('2024-01-07', '2024-01-08'),
+    ]
+    assert sum(rows.column('impressions')) == 8 * 100
+
+def test_reports_failing_for_a_single_day_raise(server, api):
+    server.max_report_days = 0
+
+    with pytest.raises(Exception, match='Insights report failed'):
+        collect_insights([api], {'fields': 'impressions'}, date(2024, 1, 1), date(2024, 1, 2), poll_interval=0.01)
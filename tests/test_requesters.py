@@ -0,0 +1,151 @@
+import pytest
+from facebookads.exceptions import FacebookRequestError
+
+from fbadhelpers.helpers.creators import create_campaign
+from fbadhelpers.helpers.getters import get_ad_sets_by_campaign_id
+from fbadhelpers.records import ApiRecord
+from fbadhelpers.requesters import BatchRequest, request, request_by_ids, iterate_pages, iterate_rows
+
+
+def test_batch_responses_keep_the_order_operations_were_queued_in(server, api, ids):
+    batch = BatchRequest(api, max_batch_size=7, max_workers=4)
+
+    for ad_id in ids['ads']:
+        batch.request(path=[ad_id], params={'fields': 'name'})
+
+    server.reset_counters()
+    responses = batch.perform()
+
+    assert [response['id'] for response in responses] == ids['ads']
+    assert server.http_calls == 15
+
+def test_batch_retries_transient_failures_only(server, api, ids):
+    server.fail_operations(lambda method, path, params: path == [ids['ads'][3]], times=2)
+
+    batch = BatchRequest(api, retry_backoff=0.01)
+
+    for ad_id in ids['ads'][:5]:
+        batch.request(path=[ad_id], params={'fields': 'name'})
+
+    batch.request(path=['999999'], params={'fields': 'name'})
+    outcomes = batch.perform_outcomes()
+
+    assert [outcome.success for outcome in outcomes] == [True] * 5 + [False]
+    assert outcomes[3].attempts == 3
+    assert outcomes[3].response['id'] == ids['ads'][3]
+    assert outcomes[5].attempts == 1
+    assert outcomes[5].error_code == 100
+
+def test_batch_gives_up_after_max_retries(server, api, ids):
+    server.fail_operations(lambda method, path, params: path == [ids['ads'][0]], times=10)
+
+    batch = BatchRequest(api, max_retries=2, retry_backoff=0.01)
+    batch.request(path=[ids['ads'][0]])
+    outcome, = batch.perform_outcomes()
+
+    assert not outcome.success
+    assert outcome.attempts == 3
+
+def test_unanswered_operations_are_resent(server, api, ids):
+    server.fail_operations(lambda method, path, params: path == [ids['ads'][1]], respond_null=True)
+
+    batch = BatchRequest(api)
+
+    for ad_id in ids['ads'][:3]:
+        batch.request(path=[ad_id])
+
+    assert [response['id'] for response in batch.perform()] == ids['ads'][:3]
+
+def test_request_by_ids_returns_objects_in_order_of_ids(server, api, ids):
+    ad_ids = ids['ads'][:60] + ids['ads'][:5]
+
+    server.reset_counters()
+    objects = request_by_ids(api, ad_ids, ['name'])
+
+    assert [data['id'] for data in objects] == ad_ids
+    assert server.operations == 2
+
+def test_iterate_pages_follows_paging(server, api, ids):
+    pages = iterate_pages(
+        api=api,
+        next_request_builder=lambda response: {'path': response['paging']['next']},
+        path=[api.ad_account_id, 'ads'],
+        params={'fields': 'name', 'limit': 30}
+    )
+
+    assert [ad['id'] for ad in iterate_rows(pages)] == ids['ads']
+
+def test_sdk_object_calls_are_paced_and_observed(api, ids, events):
+    waits = []
+    wait = api.governor.wait
+    api.governor.wait = lambda: (waits.append(True), wait())
+
+    create_campaign(api, 'Paced', 'LINK_CLICKS')
+    get_ad_sets_by_campaign_id(api, ids['campaigns'][0])
+
+    assert len(waits) == 2
+    assert [(event.kind, event.phase, event.method) for event in events] == [
+        ('request', 'before', 'POST'),
+        ('request', 'after', 'POST'),
+        ('request', 'before', 'GET'),
+        ('request', 'after', 'GET'),
+    ]
+
+def test_records_sharing_a_service_are_paced_on_their_own(api, ids, events):
+    other_api = ApiRecord(
+        service=api.service,
+        access_token=api.access_token,
+        business_id=api.business_id,
+        ad_account_id=api.ad_account_id,
+        timezone=api.timezone,
+        namespace=api.namespace
+    )
+
+    get_ad_sets_by_campaign_id(api, ids['campaigns'][0])
+    get_ad_sets_by_campaign_id(other_api, ids['campaigns'][0])
+
+    assert other_api.service.unpaced_service is api.service.unpaced_service
+    assert other_api.governor is not api.governor
+    assert [event.api for event in events if event.phase == 'after'] == [api, other_api]
+
+def test_failed_requests_finish_their_events(api, events):
+    with pytest.raises(FacebookRequestError):
+        request(api, ['999999'])
+
+    def unreachable(*args, **kwargs):
+        raise ConnectionError('Graph is unreachable')
+
+    api.service._session.requests.request = unreachable
+
+    with pytest.raises(ConnectionError):
+        request(api, ['999999'])
+
+    assert [(event.kind, event.phase, event.status) for event in events] == [
+        ('request', 'before', None),
+        ('request', 'after', 400),
+        ('request', 'before', None),
+        ('request', 'after', None),
+    ]
+    assert isinstance(events[-1].error, ConnectionError)
+
+def test_unreachable_batch_calls_fail_their_operations(api, ids, events):
+    def unreachable(*args, **kwargs):
+        raise ConnectionError('Graph is unreachable')
+
+    api.service._session.requests.request = unreachable
+
+    batch = BatchRequest(api, max_retries=1, retry_backoff=0)
+
+    for ad_id in ids['ads'][:3]:
+        batch.request(path=[ad_id])
+
+    outcomes = batch.perform_outcomes()
+
+    assert [(outcome.success, outcome.status, outcome.attempts) for outcome in outcomes] == [(False, None, 2)] * 3
+    assert [(event.phase, event.attempt, event.failures) for event in events] == [
+        ('before', 1, None),
+        ('after', 1, 3),
+        ('before', 2, None),
+        ('after', 2, 3),
+    ]
+    assert isinstance(events[-1].error, ConnectionError)
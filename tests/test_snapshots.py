@@ -0,0 +1,65 @@
+from fbadhelpers.helpers.snapshots import AccountSnapshot, sync_account_snapshot, sync_account_snapshot_file
+from fbadhelpers.requesters import request
+
+
+def test_full_sync_reads_the_whole_tree(server, api, ids):
+    server.page_size = 3
+    snapshot = sync_account_snapshot(api, page_limit=2)
+
+    assert len(snapshot) == 4 + 20 + 100
+    assert {ad_set['id'] for ad_set in snapshot.children(ids['campaigns'][0])} == set(ids['adsets'][0::4])
+    assert [ad['id'] for ad in snapshot.find_by_name('Ad 7', 'ad')] == [ids['ads'][7]]
+    assert snapshot.get(ids['ads'][7])['campaign_id'] == ids['campaigns'][3]
+
+def test_full_sync_reads_smaller_pages_when_asking_for_too_much(server, api, ids, events):
+    # Each campaign's tree is 1 campaign, 5 ad sets and 25 ads
+    server.max_expanded_objects = 40
+    snapshot = sync_account_snapshot(api, page_limit=4)
+
+    assert len(snapshot) == 4 + 20 + 100
+    assert snapshot.get(ids['ads'][99])['adset_id'] == ids['adsets'][19]
+
+    # The first tree page failed once, and was read again with halved limits
+    first_pages = [event for event in events if event.kind == 'request' and event.phase == 'after'][:2]
+
+    assert [event.status for event in first_pages] == [500, 200]
+    assert [event.path for event in first_pages] == [[api.ad_account_id, 'campaigns']] * 2
+
+def test_full_sync_keeps_archived_objects(api, ids):
+    archived_ids = [ids['campaigns'][0], ids['adsets'][1], ids['ads'][2]]
+
+    for object_id in archived_ids:
+        request(api, [object_id], {'status': 'ARCHIVED'}, 'POST')
+
+    request(api, [ids['ads'][3]], {'status': 'DELETED'}, 'POST')
+    snapshot = sync_account_snapshot(api)
+
+    assert all(snapshot.get(object_id)['effective_status'] == 'ARCHIVED' for object_id in archived_ids)
+    assert ids['ads'][3] not in snapshot
+
+def test_incremental_sync_merges_changes_only(server, api, ids):
+    snapshot = sync_account_snapshot(api)
+
+    request(api, [ids['adsets'][0]], {'name': 'Renamed'}, 'POST')
+    request(api, [ids['ads'][0]], {'status': 'DELETED'}, 'POST')
+    request(api, [ids['ads'][1]], {'status': 'ARCHIVED'}, 'POST')
+
+    server.reset_counters()
+    snapshot = sync_account_snapshot(api, snapshot)
+
+    assert server.http_calls == 3
+    assert snapshot.get(ids['adsets'][0])['name'] == 'Renamed'
+    assert ids['ads'][0] not in snapshot
+    assert snapshot.get(ids['ads'][1])['effective_status'] == 'ARCHIVED'
+    assert len(snapshot) == 4 + 20 + 99
+
+def test_snapshot_files_are_synced_incrementally(server, api, tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    first = sync_account_snapshot_file(api, path)
+
+    server.reset_counters()
+    second = sync_account_snapshot_file(api, path)
+
+    assert server.http_calls == 3
+    assert second.synced_at > first.synced_at
+    assert len(AccountSnapshot.load(path)) == len(first)
@@ -0,0 +1,48 @@
+import pytest
+
+from fbadhelpers.helpers.getters import get_recent_campaigns
+from fbadhelpers.requesters import request, request_by_ids
+from fbadhelpers.transports import record_api, replay_api
+
+
+def read_account(api, ids):
+    return (
+        [campaign['id'] for campaign in get_recent_campaigns(api)],
+        request(api, [ids['adsets'][0]], {'fields': 'name,daily_budget'}),
+        request_by_ids(api, ids['ads'][:10], ['name']),
+    )
+
+def test_recorded_runs_are_replayed_without_graph(server, api, ids, tmp_path):
+    cassette = str(tmp_path / 'cassette.jsonl')
+
+    recorder = record_api(api, cassette)
+    recorded = read_account(api, ids)
+    recorder.close()
+
+    assert 'fake-access-token' not in open(cassette).read()
+
+    replayed_api = server.create_api('act_1')
+    replay_api(replayed_api, cassette)
+
+    server.reset_counters()
+
+    assert read_account(replayed_api, ids) == recorded
+    assert server.http_calls == 0
+
+def test_requests_missing_from_the_recording_are_rejected(server, api, ids, tmp_path):
+    cassette = str(tmp_path / 'cassette.jsonl')
+
+    recorder = record_api(api, cassette)
+    request(api, [ids['ads'][0]], {'fields': 'name'})
+    recorder.close()
+
+    replay_api(api, cassette)
+
+    # The last recording of a request keeps answering it
+    assert request(api, [ids['ads'][0]], {'fields': 'name'}) == request(api, [ids['ads'][0]], {'fields': 'name'})
+
+    with pytest.raises(KeyError, match='No recorded response'):
+        request(api, [ids['ads'][0]], {'fields': 'name,status'})
+
+    with pytest.raises(KeyError, match='No recorded response'):
+        request(api, [ids['ads'][1]], {'fields': 'name'})
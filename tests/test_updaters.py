@@ -0,0 +1,53 @@
+from fbadhelpers.helpers.updaters import update_ad_sets_by_ids_from_config_diff, values_match
+from fbadhelpers.requesters import request
+
+
+def test_only_differing_fields_are_written(server, api, ids):
+    config = {'daily_budget': 1000, 'name': 'Ad set 0'}
+
+    server.reset_counters()
+    report = update_ad_sets_by_ids_from_config_diff(api, ids['adsets'][:5], config)
+
+    # Seeded ad sets all have a daily budget of "1000"; only the first is named "Ad set 0"
+    assert report.changed_ids == ids['adsets'][1:5]
+    assert report.unchanged_ids == ids['adsets'][:1]
+    assert report.changes[ids['adsets'][1]] == {'name': ('Ad set 1', 'Ad set 0')}
+    assert not report.failed_ids
+    assert server.operations == 1 + 4
+    assert server.get_object(ids['adsets'][4])['name'] == 'Ad set 0'
+
+def test_dry_runs_write_nothing(server, api, ids):
+    report = update_ad_sets_by_ids_from_config_diff(api, ids['adsets'][:3], {'daily_budget': 2000}, dry_run=True)
+
+    assert report.changed_ids == ids['adsets'][:3]
+    assert report.outcomes == {}
+    assert report.format().splitlines()[:2] == [
+        '3 of 3 objects would change',
+        '%s daily_budget: "1000" -> 2000' % ids['adsets'][0],
+    ]
+    assert str(server.get_object(ids['adsets'][0])['daily_budget']) == '1000'
+
+def test_values_match_graph_representations():
+    assert values_match('1000', 1000, 'daily_budget')
+    assert values_match(['b', 'a'], ['a', 'b'])
+    assert values_match('2024-01-01T00:00:00+0000', '2024-01-01T01:00:00+0100', 'start_time')
+    assert not values_match('PAUSED', 'ACTIVE', 'status')
+
+def test_mappings_match_only_with_the_same_keys_or_graph_defaults():
+    targeting = {'geo_locations': {'countries': ['US']}}
+
+    assert values_match({'geo_locations': {'countries': ['US'], 'location_types': ['home']}, 'age_min': 18, 'age_max': 65}, targeting, 'targeting')
+    assert not values_match({'geo_locations': {'countries': ['US']}, 'interests': [{'id': '1'}]}, targeting, 'targeting')
+    assert not values_match({'geo_locations': {'countries': ['US'], 'regions': [{'key': '1'}]}}, targeting, 'targeting')
+    assert not values_match({'page_id': '1', 'pixel_id': '2'}, {'page_id': '1'}, 'promoted_object')
+
+def test_targeting_with_keys_the_config_leaves_out_is_replaced(server, api, ids):
+    targeting = {'geo_locations': {'countries': ['US']}}
+
+    request(api, [ids['adsets'][0]], {'targeting': {**targeting, 'age_min': 18, 'age_max': 65}}, 'POST')
+    request(api, [ids['adsets'][1]], {'targeting': {**targeting, 'interests': [{'id': '1'}]}}, 'POST')
+
+    report = update_ad_sets_by_ids_from_config_diff(api, ids['adsets'][:2], {'targeting': targeting})
+
+    assert report.changed_ids == ids['adsets'][1:2]
+    assert server.get_object(ids['adsets'][1])['targeting'] == targeting
@@ -0,0 +1,55 @@
+import pytest
+
+from fbadhelpers.assets import AssetIndex
+from fbadhelpers.helpers.uploaders import upload_assets, upload_video
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = AssetIndex(str(tmp_path / 'assets.db'))
+    yield index
+    index.close()
+
+def write_file(path, content: bytes) -> str:
+    path.write_bytes(content)
+    return str(path)
+
+def test_identical_content_is_uploaded_once(server, api, index, tmp_path):
+    paths = [
+        write_file(tmp_path / 'a.png', b'image a'),
+        write_file(tmp_path / 'b.png', b'image a'),
+        write_file(tmp_path / 'c.jpg', b'image c'),
+    ]
+
+    assets = upload_assets(api, paths, index)
+
+    assert [asset.uploaded for asset in assets] == [True, False, True]
+    assert assets[0].image_hash == assets[1].image_hash != assets[2].image_hash
+
+    server.reset_counters()
+    assets = upload_assets(api, paths, index)
+
+    assert server.http_calls == 0
+    assert not any(asset.uploaded for asset in assets)
+
+def test_videos_are_uploaded_in_chunks(server, api, index, tmp_path):
+    server.video_chunk_size = 1000
+    path = write_file(tmp_path / 'video.mp4', bytes(range(256)) * 10)
+
+    server.reset_counters()
+    asset = upload_video(api, path, index, title='Video')
+
+    assert asset.kind == 'video'
+    assert asset.creative_fields() == {'video_id': asset.video_id}
+    assert server.uploaded_bytes == 2560
+    assert server.http_calls == 1 + 3 + 1
+
+def test_empty_videos_are_rejected_before_uploading(server, api, tmp_path):
+    path = write_file(tmp_path / 'empty.mp4', b'')
+
+    server.reset_counters()
+
+    with pytest.raises(ValueError, match='empty video'):
+        upload_video(api, path)
+
+    assert server.http_calls == 0
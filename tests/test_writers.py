@@ -0,0 +1,64 @@
+import pytest
+
+from fbadhelpers.helpers.updaters import update_ad_sets_by_ids_from_config
+from fbadhelpers.writers import WriteBehindQueue
+
+
+def test_updates_to_an_object_are_merged(server, api, ids):
+    ad_set_id = ids['adsets'][0]
+
+    with WriteBehindQueue(api, flush_interval=60) as queue:
+        first = queue.update(ad_set_id, {'name': 'First', 'daily_budget': 2000})
+        second = queue.update(ad_set_id, {'name': 'Second'})
+
+        server.reset_counters()
+        queue.flush()
+
+    assert server.operations == 1
+    assert first.result() == second.result() == {'success': True}
+    assert server.get_object(ad_set_id)['name'] == 'Second'
+    assert str(server.get_object(ad_set_id)['daily_budget']) == '2000'
+
+def test_updates_are_flushed_in_batches_once_enough_are_pending(server, api, ids):
+    server.reset_counters()
+
+    with WriteBehindQueue(api, max_pending=10, flush_interval=60) as queue:
+        futures = queue.update_many(ids['adsets'], {'name': 'Queued'})
+
+        assert [future.result(timeout=10) for future in futures] == [{'success': True}] * 20
+
+    # However the updates were split, none waited for the flush interval
+    assert server.http_calls <= 2
+    assert all(server.get_object(ad_set_id)['name'] == 'Queued' for ad_set_id in ids['adsets'])
+
+def test_updates_are_flushed_after_the_interval(api, ids):
+    with WriteBehindQueue(api, flush_interval=0.05) as queue:
+        assert queue.update(ids['adsets'][0], {'name': 'Soon'}).result(timeout=10) == {'success': True}
+        assert len(queue) == 0
+
+def test_failed_updates_fail_their_own_futures(api, ids):
+    with WriteBehindQueue(api, flush_interval=60) as queue:
+        failing = queue.update('999999', {'name': 'Missing'})
+        succeeding = queue.update(ids['adsets'][0], {'name': 'Present'})
+
+    assert succeeding.result() == {'success': True}
+
+    with pytest.raises(Exception, match='Failed to update object'):
+        failing.result()
+
+def test_closed_queues_refuse_updates(api, ids):
+    queue = WriteBehindQueue(api)
+    queue.close()
+
+    with pytest.raises(RuntimeError):
+        queue.update(ids['adsets'][0], {'name': 'Late'})
+
+def test_ad_set_updates_go_through_the_records_queue(server, api, ids):
+    api.write_queue = WriteBehindQueue(api, flush_interval=0.01)
+
+    try:
+        assert update_ad_sets_by_ids_from_config(api, ids['adsets'][:3], {'name': 'Through queue'}) == [{'success': True}] * 3
+    finally:
+        api.write_queue.close()
+
+    assert server.get_object(ids['adsets'][2])['name'] == 'Through queue'